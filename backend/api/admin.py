@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, Skill, Resume, SkillMatch
+from .models import UserProfile, Skill, DesiredSkill, Resume, ResumeJob, SkillMatch
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -12,12 +12,23 @@ class SkillAdmin(admin.ModelAdmin):
     list_filter = ('proficiency_level', 'created_at')
     search_fields = ('name', 'user__username', 'description')
 
+@admin.register(DesiredSkill)
+class DesiredSkillAdmin(admin.ModelAdmin):
+    list_display = ('name', 'user', 'created_at')
+    search_fields = ('name', 'user__username')
+
 @admin.register(Resume)
 class ResumeAdmin(admin.ModelAdmin):
     list_display = ('user', 'processed', 'created_at')
     list_filter = ('processed', 'created_at')
     search_fields = ('user__username',)
 
+@admin.register(ResumeJob)
+class ResumeJobAdmin(admin.ModelAdmin):
+    list_display = ('user', 'status', 'created_at', 'updated_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('user__username',)
+
 @admin.register(SkillMatch)
 class SkillMatchAdmin(admin.ModelAdmin):
     list_display = ('seeker', 'provider', 'desired_skill', 'similarity_score', 'created_at')
@@ -0,0 +1,219 @@
+"""
+Approximate nearest-neighbour search over Skill embeddings.
+
+`IVFIndex` is an inverted-file index built with NumPy only: skills are
+clustered with spherical k-means and a query only scans the `nprobe` clusters
+whose centroids are closest to it, so the cost of a search grows with the
+cluster size rather than with the whole corpus.
+
+The index is built offline with `python manage.py build_skill_index` and is
+loaded lazily by `get_skill_index()` when `SKILL_MATCH_MODE = 'approximate'`.
+For corpora whose vectors don't fit in memory, SKILL_INDEX_TYPE = 'pq' uses the
+product-quantized variant in api.pq_index instead. An index records the
+embedding model it was built for and is ignored once that model changes.
+"""
+import os
+import threading
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_backends import embedding_model_id
+from .matching import SkillMatrix, normalize_rows
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind='stable')
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class IVFIndex:
+    """Inverted-file index over a SkillMatrix.
+
+    Rows of `matrix` are stored grouped by cluster: the rows of cluster c are
+    `list_rows[list_offsets[c]:list_offsets[c + 1]]`.
+    """
+    # Embedding model of the indexed vectors, set by build_skill_index()
+    model_id = ''
+
+    def __init__(self, matrix: SkillMatrix, skill_ids, centroids: np.ndarray,
+                 list_rows: np.ndarray, list_offsets: np.ndarray):
+        self.matrix = matrix
+        self.skill_ids = np.asarray(skill_ids, dtype=np.int64)
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def bytes_per_vector(self) -> float:
+        """Resident bytes per skill: its vector and list entry, not counting the
+        per-skill metadata every index keeps."""
+        if not len(self):
+            return 0.0
+        shared = self.centroids.nbytes + self.list_offsets.nbytes
+        return (self.matrix.vectors.nbytes + self.list_rows.nbytes + shared) / len(self)
+
+    @classmethod
+    def build(cls, matrix: SkillMatrix, skill_ids, nlist: Optional[int] = None,
+              iterations: int = 10, seed: int = 0) -> 'IVFIndex':
+        """Cluster the rows of `matrix` into `nlist` lists (default ~sqrt(n))."""
+        n = len(matrix)
+        if n == 0:
+            return cls(matrix, skill_ids, matrix.vectors[:0].copy(),
+                       np.empty(0, dtype=np.int64), np.zeros(1, dtype=np.int64))
+        if nlist is None:
+            nlist = int(np.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample; assigning every row is cheap compared to k-means.
+        sample_size = min(n, 256 * nlist)
+        sample = matrix.vectors[rng.choice(n, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = ~sums.any(axis=1)
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        labels = assign_lists(matrix.vectors, centroids)
+        list_rows = np.argsort(labels, kind='stable')
+        counts = np.bincount(labels, minlength=nlist)
+        list_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        return cls(matrix, skill_ids, centroids, list_rows, list_offsets)
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int,
+               row_mask: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Return, for each normalized query row, up to k candidate row indices.
+
+        Candidates are ordered by similarity, best first. Rows where
+        `row_mask` is False are dropped from the probed lists before scoring.
+        """
+        if not len(self):
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        nprobe = max(1, min(nprobe, self.nlist))
+        results = []
+        for query, centroid_sims in zip(queries, queries @ self.centroids.T):
+            probes = _top_k(centroid_sims, nprobe)
+            rows = np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+            ])
+            if row_mask is not None:
+                rows = rows[row_mask[rows]]
+            scores = self.matrix.vectors[rows] @ query
+            results.append(rows[_top_k(scores, k)])
+        return results
+
+    def save(self, path) -> None:
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            vectors=self.matrix.vectors,
+            user_ids=self.matrix.user_ids,
+            names=np.array(self.matrix.names, dtype=str),
+            levels=self.matrix.levels if self.matrix.levels is not None else np.empty(0, dtype=np.int8),
+            skill_ids=self.skill_ids,
+            centroids=self.centroids,
+            list_rows=self.list_rows,
+            list_offsets=self.list_offsets,
+            model_id=np.array(self.model_id),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path) -> 'IVFIndex':
+        with np.load(path) as data:
+            levels = data['levels'] if 'levels' in data.files and len(data['levels']) else None
+            matrix = SkillMatrix(data['user_ids'], data['names'].tolist(), data['vectors'], levels)
+            index = cls(matrix, data['skill_ids'], data['centroids'],
+                        data['list_rows'], data['list_offsets'])
+            index.model_id = str(data['model_id']) if 'model_id' in data.files else ''
+            return index
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Nearest centroid for every row, computed in chunks to bound memory."""
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = vectors[start:start + chunk_size]
+        labels[start:start + chunk_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+def build_skill_index(nlist: Optional[int] = None, index_type: Optional[str] = None):
+    """Build an index over every Skill embedded by the current model: an
+    IVFIndex, or a PQIndex (api.pq_index) when `index_type` (default
+    SKILL_INDEX_TYPE) is 'pq'."""
+    from .embeddings import embedding_rows
+    from .match_filters import proficiency_rank
+    from .models import Skill
+
+    rows = [row for row in embedding_rows(Skill.objects.all(), 'id', 'user_id', 'name', 'proficiency_level')
+            if row[4]]
+    matrix = SkillMatrix.from_rows([(row[1], row[2], row[4]) for row in rows])
+    matrix.levels = np.array([proficiency_rank(row[3]) for row in rows], dtype=np.int8)
+    if (index_type or settings.SKILL_INDEX_TYPE) == 'pq':
+        from .pq_index import PQIndex
+        index = PQIndex.build(matrix, [row[0] for row in rows], nlist=nlist, m=settings.SKILL_PQ_SUBSPACES)
+    else:
+        index = IVFIndex.build(matrix, [row[0] for row in rows], nlist=nlist)
+    index.model_id = embedding_model_id()
+    return index
+
+
+def skill_index_path(index_type: Optional[str] = None):
+    """Where the index of the given type (default SKILL_INDEX_TYPE) is saved."""
+    if (index_type or settings.SKILL_INDEX_TYPE) == 'pq':
+        return settings.SKILL_PQ_INDEX_PATH
+    return settings.SKILL_INDEX_PATH
+
+
+def load_skill_index(index_type: Optional[str] = None):
+    """Load the saved index of the given type (default SKILL_INDEX_TYPE)."""
+    path = skill_index_path(index_type)
+    if (index_type or settings.SKILL_INDEX_TYPE) == 'pq':
+        from .pq_index import PQIndex
+        return PQIndex.load(path, rerank=settings.SKILL_PQ_RERANK)
+    return IVFIndex.load(path)
+
+
+_index = None
+_index_mtime = None
+_index_lock = threading.Lock()
+
+
+def get_skill_index():
+    """Return the on-disk skill index of type SKILL_INDEX_TYPE, reloading it
+    when the file changes.
+
+    Returns None when no index has been built yet, or it was built for
+    another embedding model.
+    """
+    global _index, _index_mtime
+    path = skill_index_path()
+    try:
+        mtime = (str(path), os.stat(path).st_mtime)
+    except OSError:
+        return None
+    if mtime != _index_mtime:
+        with _index_lock:
+            if mtime != _index_mtime:
+                _index = load_skill_index()
+                _index_mtime = mtime
+                if _index.model_id != embedding_model_id():
+                    print(f"Warning: skill index {path} was built for model {_index.model_id!r}, "
+                          f"not {embedding_model_id()!r}; rebuild it")
+                    _index = None
+    return _index
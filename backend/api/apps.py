@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+
+    def ready(self):
+        from django.conf import settings
+        if settings.SKILL_MODEL_PRELOAD:
+            # Load the model in the background; /api/health/ready/ reports
+            # 503 until it is warm.
+            from .utils_safe import start_model_warm_up
+            start_model_warm_up()
@@ -0,0 +1,159 @@
+"""
+Pluggable backends that turn skill texts into embeddings.
+
+`get_model()` returns the backend selected by SKILL_EMBEDDING_BACKEND; every
+backend exposes `encode(texts, batch_size=...)` returning a (len(texts), dim)
+float32 array, so callers don't care how inference runs.
+
+- 'fp32': the SentenceTransformer model in full precision (the default).
+- 'int8': the same model with its Linear layers dynamically quantized to int8
+  by PyTorch, for CPU-only web nodes. It is loaded from a local model
+  directory (SKILL_EMBEDDING_MODEL_DIR, written by
+  `manage.py prepare_models --save-dir`), so nothing is downloaded at start.
+- 'hashing': no model at all. Hashed character n-grams are projected to
+  SKILL_EMBEDDING_DIM with a fixed random matrix, so texts that share
+  n-grams get similar vectors. Deterministic and dependency-free, for offline
+  CI, benchmarks and load tests; not for production matching.
+
+Embeddings of different backends are not comparable, except fp32 and int8
+(the same model), so stored and cached embeddings are tagged with
+`embedding_model_id()`.
+
+`manage.py check_embedding_backend` reports how closely a backend agrees
+with fp32 on the COMMON_SKILLS vocabulary.
+"""
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Type
+
+import numpy as np
+from django.conf import settings
+
+
+class EmbeddingBackend(ABC):
+    """Base class. Subclasses load their model in __init__."""
+    name = ''
+
+    @abstractmethod
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings."""
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """Full-precision SentenceTransformer inference."""
+    name = 'fp32'
+
+    def __init__(self, model_name_or_path: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name_or_path)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=batch_size, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class QuantizedSentenceTransformerBackend(SentenceTransformerBackend):
+    """SentenceTransformer with int8 dynamically quantized Linear layers, on CPU."""
+    name = 'int8'
+
+    def __init__(self, model_path: str):
+        if not model_path or not os.path.isdir(model_path):
+            raise FileNotFoundError(
+                f'int8 embedding backend needs a local model directory, got {model_path!r} '
+                '(see `manage.py prepare_models --save-dir`)'
+            )
+        import torch
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_path, device='cpu')
+        model.eval()
+        self.model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """Character n-gram feature hashing followed by a fixed random projection.
+
+    Every n-gram (n in `ngram_range`, over the lower-cased text padded with
+    spaces) is hashed with CRC32 into one of `buckets` counters; the counts
+    are projected to `dim` by a Gaussian matrix drawn from `seed`. The same
+    text always gets the same vector, in any process.
+    """
+    name = 'hashing'
+
+    def __init__(self, dim: int, ngram_range=(3, 5), buckets: int = 1 << 13, seed: int = 0):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.buckets = buckets
+        rng = np.random.default_rng(seed)
+        self.projection = (rng.standard_normal((buckets, dim)) / np.sqrt(dim)).astype(np.float32)
+
+    @staticmethod
+    def make_model_id(dim: int, ngram_range=(3, 5), buckets: int = 1 << 13) -> str:
+        low, high = ngram_range
+        return f'hashing-{low}-{high}-{buckets}-{dim}'
+
+    @property
+    def model_id(self) -> str:
+        return self.make_model_id(self.dim, self.ngram_range, self.buckets)
+
+    def _features(self, text: str) -> List[int]:
+        padded = f' {" ".join(str(text).lower().split())} '
+        if not padded.strip():
+            return []
+        low, high = self.ngram_range
+        grams = [padded[i:i + n] for n in range(low, high + 1) for i in range(max(1, len(padded) - n + 1))]
+        return [zlib.crc32(gram.encode('utf-8')) % self.buckets for gram in grams]
+
+    def encode(self, texts: List[str], batch_size: int = 1024) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            features = [self._features(text) for text in texts[start:start + batch_size]]
+            rows = np.repeat(np.arange(len(features)), [len(f) for f in features])
+            buckets = np.fromiter((b for f in features for b in f), dtype=np.int64, count=len(rows))
+            # n-gram counts per text, projected with one matrix product
+            counts = np.bincount(rows * self.buckets + buckets, minlength=len(features) * self.buckets)
+            counts = counts.reshape(len(features), self.buckets).astype(np.float32)
+            vectors[start:start + len(features)] = counts @ self.projection
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+
+EMBEDDING_BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    QuantizedSentenceTransformerBackend.name: QuantizedSentenceTransformerBackend,
+    HashingEmbeddingBackend.name: HashingEmbeddingBackend,
+}
+
+
+def embedding_model_id(name: Optional[str] = None) -> str:
+    """Id stored next to embeddings of the named backend (default:
+    SKILL_EMBEDDING_BACKEND); vectors with different ids don't compare."""
+    name = name or settings.SKILL_EMBEDDING_BACKEND
+    if name == HashingEmbeddingBackend.name:
+        return HashingEmbeddingBackend.make_model_id(settings.SKILL_EMBEDDING_DIM,
+                                                     buckets=settings.SKILL_HASHING_BUCKETS)
+    return settings.SKILL_EMBEDDING_MODEL
+
+
+def create_embedding_backend(name: Optional[str] = None) -> EmbeddingBackend:
+    """Load the named backend (default: SKILL_EMBEDDING_BACKEND).
+
+    The fp32 backend prefers the local model directory when it exists and
+    falls back to the model name, which may download it.
+    """
+    name = name or settings.SKILL_EMBEDDING_BACKEND
+    try:
+        backend_class = EMBEDDING_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f'Unknown embedding backend {name!r}; choose from {", ".join(EMBEDDING_BACKENDS)}')
+
+    if backend_class is HashingEmbeddingBackend:
+        return backend_class(settings.SKILL_EMBEDDING_DIM, buckets=settings.SKILL_HASHING_BUCKETS)
+    model_dir = settings.SKILL_EMBEDDING_MODEL_DIR
+    if backend_class is QuantizedSentenceTransformerBackend:
+        return backend_class(model_dir)
+    if model_dir and os.path.isdir(model_dir):
+        return backend_class(model_dir)
+    return backend_class(settings.SKILL_EMBEDDING_MODEL)
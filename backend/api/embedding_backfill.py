@@ -0,0 +1,224 @@
+"""
+Bulk (re-)embedding of stored skills.
+
+A Skill needs an embedding when it has none (it was created while the model
+could not load), when its vector has the wrong dimension, or when it was
+produced by another model than the current `embedding_model_id()`.
+Such rows read as missing to the matchers until they are re-embedded.
+
+`backfill_embeddings()` first re-embeds the skills people search for most
+(api.skill_searches), so after a model switch popular queries recover
+first, then walks the remaining rows in id order with keyset pagination
+(`id > last_id`, never OFFSET). Each page's distinct names are encoded in
+batches - across a process pool when `workers > 1` - and written back with
+bulk_update, logging SkillChange rows so running workers pick the new
+vectors up. Progress is checkpointed after every page, so an interrupted
+run resumes where it stopped (`python manage.py backfill_embeddings`).
+"""
+import json
+import multiprocessing
+import os
+import time
+from typing import Iterator, List, Optional
+
+from django.conf import settings
+from django.db.models import Q
+
+from .embedding_backends import embedding_model_id
+
+
+# Searched texts whose skills are looked up per query of the priority pass
+PRIORITY_TEXTS = 500
+
+
+def stale_embedding_filter() -> Q:
+    """Skills whose embedding is missing or was not produced by the current model."""
+    return (
+        Q(embedding__isnull=True)
+        | ~Q(embedding_dim=settings.SKILL_EMBEDDING_DIM)
+        | ~Q(embedding_model=embedding_model_id())
+    )
+
+
+def read_checkpoint(path=None) -> Optional[dict]:
+    try:
+        with open(path or settings.SKILL_BACKFILL_CHECKPOINT) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_checkpoint(state: Optional[dict], path=None) -> None:
+    """Save `state` atomically, or remove the checkpoint when it is None."""
+    path = str(path or settings.SKILL_BACKFILL_CHECKPOINT)
+    if state is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def _encode_with(backend, texts: List[str]) -> List[List[float]]:
+    try:
+        return [vector.tolist() for vector in backend.encode(texts, batch_size=len(texts))]
+    except Exception as e:
+        print(f"Warning: failed to encode {len(texts)} skills: {e}")
+        return [[] for _ in texts]
+
+
+# Backend of a pool worker, loaded once per process by the initializer
+_worker_backend = None
+
+
+def _init_worker() -> None:
+    global _worker_backend
+    from .embedding_backends import create_embedding_backend
+    _worker_backend = create_embedding_backend()
+
+
+def _encode_batch(texts: List[str]) -> List[List[float]]:
+    return _encode_with(_worker_backend, texts)
+
+
+class BatchEncoder:
+    """Encode texts in batches of `batch_size`, in this process or across a
+    pool of `workers` processes that each load the backend once."""
+
+    def __init__(self, workers: int = 1, batch_size: int = 256):
+        self.batch_size = batch_size
+        self.pool = None
+        if workers > 1:
+            from django.db import connections
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            self.pool = multiprocessing.get_context('fork').Pool(workers, initializer=_init_worker)
+
+    def __call__(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if self.pool is None:
+            from .utils_safe import get_model
+            model = get_model()
+            if model is None:
+                return [[] for _ in texts]
+            parts = (_encode_with(model, batch) for batch in batches)
+        else:
+            parts = self.pool.imap(_encode_batch, batches)
+        return [vector for part in parts for vector in part]
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+def _searched_texts(offset: int, count: int) -> List[str]:
+    """`count` searched skill texts, most searched first, from `offset`."""
+    from .models import SkillSearch
+    return list(SkillSearch.objects.order_by('-count', 'id').values_list('text', flat=True)[offset:offset + count])
+
+
+def backfill_embeddings(queryset=None, workers: int = 1, batch_size: int = 256, page_size: int = 5000,
+                        limit: Optional[int] = None, restart: bool = False, priority: bool = True,
+                        checkpoint_path=None) -> Iterator[dict]:
+    """Re-embed the Skill or DesiredSkill rows of `queryset` (default: every
+    Skill) that match `stale_embedding_filter()`, one page at a time.
+
+    With `priority`, rows named like the most searched skill texts
+    (SkillSearch, PRIORITY_TEXTS texts at a time) go first; the id-ordered
+    pass then picks up the rest. Re-embedded rows get a new `updated_at`
+    and Skills are also logged as SkillChanges, so workers and snapshot
+    builds see them.
+
+    Yields a progress dict after every page: the checkpointed totals {model,
+    table, priority_done, priority_offset, priority_last_id, last_id, pages,
+    scanned, updated, failed} plus this run's `phase` ('priority' or 'id'),
+    `run_scanned` and `seconds`. The checkpoint is removed once every page
+    is done.
+    """
+    from django.db import transaction
+    from django.db.models.functions import Lower
+    from django.utils import timezone
+
+    from .embeddings import embedding_cache, embedding_fields
+    from .models import Skill, SkillChange
+
+    queryset = queryset if queryset is not None else Skill.objects.all()
+    is_skill = queryset.model is Skill
+    model_id = embedding_model_id()
+    table = queryset.model._meta.label_lower
+    state = None if restart else read_checkpoint(checkpoint_path)
+    if state is None or state.get('model') != model_id or state.get('table') != table:
+        state = {'model': model_id, 'table': table, 'priority_done': not priority, 'priority_offset': 0,
+                 'priority_last_id': 0, 'last_id': 0, 'pages': 0, 'scanned': 0, 'updated': 0, 'failed': 0}
+    queryset = queryset.filter(stale_embedding_filter())
+
+    encoder = BatchEncoder(workers=workers, batch_size=batch_size)
+    start = time.perf_counter()
+    processed = 0
+    try:
+        while limit is None or processed < limit:
+            size = page_size if limit is None else min(page_size, limit - processed)
+            in_priority = not state['priority_done']
+            if in_priority:
+                texts = _searched_texts(state['priority_offset'], PRIORITY_TEXTS)
+                if not texts:
+                    state['priority_done'] = True
+                    continue
+                page = queryset.annotate(search_text=Lower('name')).filter(
+                    search_text__in=texts, id__gt=state['priority_last_id']
+                )
+            else:
+                page = queryset.filter(id__gt=state['last_id'])
+            rows = list(page.order_by('id').values_list('id', 'user_id', 'name')[:size])
+            if not rows and in_priority:
+                state['priority_offset'] += len(texts)
+                state['priority_last_id'] = 0
+                continue
+            if not rows:
+                write_checkpoint(None, checkpoint_path)
+                return
+
+            # Shared names are encoded once, through the embedding cache
+            names = list(dict.fromkeys(name for _, _, name in rows))
+            vectors = dict(zip(names, embedding_cache.get_many_or_compute(names, encoder)))
+            now = timezone.now()
+            updates = []
+            for row_id, _, name in rows:
+                fields = embedding_fields(vectors[name])
+                if fields['embedding'] is None:
+                    state['failed'] += 1
+                    continue
+                # bulk_update skips auto_now; snapshot builds and workers rely on updated_at
+                updates.append(queryset.model(id=row_id, updated_at=now, **fields))
+            with transaction.atomic():
+                queryset.model.objects.bulk_update(
+                    updates, ['embedding', 'embedding_dim', 'embedding_model', 'updated_at'], batch_size=1000
+                )
+                if is_skill:
+                    user_of = {row_id: user_id for row_id, user_id, _ in rows}
+                    SkillChange.objects.bulk_create([
+                        SkillChange(skill_id=skill.id, user_id=user_of[skill.id], action='upsert')
+                        for skill in updates
+                    ])
+
+            if in_priority:
+                if len(rows) < size:
+                    # Every stale row named like this batch of texts is done
+                    state['priority_offset'] += len(texts)
+                    state['priority_last_id'] = 0
+                else:
+                    state['priority_last_id'] = rows[-1][0]
+            else:
+                state['last_id'] = rows[-1][0]
+            processed += len(rows)
+            state['pages'] += 1
+            state['scanned'] += len(rows)
+            state['updated'] += len(updates)
+            write_checkpoint(state, checkpoint_path)
+            yield dict(state, phase='priority' if in_priority else 'id', run_scanned=processed,
+                       seconds=time.perf_counter() - start)
+    finally:
+        encoder.close()
@@ -0,0 +1,217 @@
+"""
+Local embedding service shared by all web workers on a host.
+
+`python manage.py run_embedding_server` loads one copy of the model and
+serves encode requests over a Unix socket. Requests that arrive within
+SKILL_EMBEDDING_BATCH_WINDOW_MS of each other are encoded together in one
+model call (up to SKILL_EMBEDDING_MAX_BATCH texts), so N workers share one
+model and the model sees batches instead of single strings.
+
+Wire format, in both directions: a 4-byte big-endian length, then the
+payload. A request payload is a JSON list of texts; a response payload is
+the server's model id (a big-endian uint16 length, then UTF-8), two
+big-endian uint32s (count, dim), then count * dim little-endian float32
+values. dim == 0 means the server could not encode the texts. Clients
+discard vectors of a model other than their own `embedding_model_id()`, so
+a server left running across a model switch can't mix embedding spaces.
+"""
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_backends import embedding_model_id
+
+_LENGTH = struct.Struct('>I')
+_SHAPE = struct.Struct('>II')
+_MODEL_LENGTH = struct.Struct('>H')
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        buffer += chunk
+    return bytes(buffer)
+
+
+def send_frame(sock, payload: bytes) -> None:
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+
+def recv_frame(sock) -> bytes:
+    (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    return _recv_exact(sock, size)
+
+
+class MicroBatcher:
+    """Merges concurrent encode requests into batches for a single model.
+
+    The first queued request opens a batch; requests arriving within
+    `window` seconds join it until `max_batch` texts are collected.
+    """
+
+    def __init__(self, encode_many: Callable[[List[str]], np.ndarray], max_batch: int = 64,
+                 window: float = 0.005):
+        self.encode_many = encode_many
+        self.max_batch = max_batch
+        self.window = window
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name='embedding-batcher', daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = self.encode_many(texts)
+            except Exception as e:
+                print(f"Warning: embedding server failed to encode {len(texts)} texts: {e}")
+                vectors = None
+            self.batches += 1
+            self.texts += len(texts)
+
+            offset = 0
+            for item_texts, future in batch:
+                future.set_result(None if vectors is None else vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class _EncodeHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                texts = json.loads(recv_frame(self.request))
+            except (ConnectionError, OSError):
+                return
+            vectors = self.server.batcher.submit(texts).result()
+            if vectors is None:
+                response = self.server.model_header + _SHAPE.pack(len(texts), 0)
+            else:
+                vectors = np.ascontiguousarray(vectors, dtype='<f4')
+                response = self.server.model_header + _SHAPE.pack(*vectors.shape) + vectors.tobytes()
+            try:
+                send_frame(self.request, response)
+            except OSError:
+                return
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server answering encode requests through a MicroBatcher."""
+    daemon_threads = True
+    # Every thread of every web worker may hold a connection.
+    request_queue_size = 128
+
+    def __init__(self, socket_path: str, batcher: MicroBatcher, model_id: Optional[str] = None):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, _EncodeHandler)
+        self.batcher = batcher
+        self.model_id = model_id or embedding_model_id()
+        encoded = self.model_id.encode('utf-8')
+        self.model_header = _MODEL_LENGTH.pack(len(encoded)) + encoded
+
+
+class EmbeddingClient:
+    """Client for EmbeddingServer. Keeps one connection per thread.
+
+    After a connection failure, or an answer from a server running another
+    model than `model_id` (default: the current `embedding_model_id()`), the
+    server is considered down for `retry_after` seconds, during which
+    `encode` returns None immediately.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = 10.0, retry_after: float = 5.0,
+                 model_id: Optional[str] = None):
+        self.socket_path = socket_path
+        self.model_id = model_id
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    def _connection(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def encode(self, texts: List[str]) -> Optional[np.ndarray]:
+        """(len(texts), dim) float32 array, or None if the server can't answer."""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            sock = self._connection()
+            send_frame(sock, json.dumps(list(texts)).encode('utf-8'))
+            payload = recv_frame(sock)
+        except OSError:
+            self._disconnect()
+            self._down_until = time.monotonic() + self.retry_after
+            return None
+        (length,) = _MODEL_LENGTH.unpack_from(payload)
+        offset = _MODEL_LENGTH.size + length
+        server_model = payload[_MODEL_LENGTH.size:offset].decode('utf-8')
+        expected = self.model_id or embedding_model_id()
+        if server_model != expected:
+            print(f"Warning: embedding server runs {server_model!r}, not {expected!r}; encoding in-process")
+            self._down_until = time.monotonic() + self.retry_after
+            return None
+        count, dim = _SHAPE.unpack_from(payload, offset)
+        if dim == 0:
+            return None
+        return np.frombuffer(payload, dtype='<f4', offset=offset + _SHAPE.size).reshape(count, dim)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_embedding_client() -> Optional[EmbeddingClient]:
+    """Client for the configured embedding server, or None if none is configured."""
+    global _client
+    if not settings.SKILL_EMBEDDING_SERVER_SOCKET:
+        return None
+    with _client_lock:
+        if _client is None or _client.socket_path != settings.SKILL_EMBEDDING_SERVER_SOCKET:
+            _client = EmbeddingClient(settings.SKILL_EMBEDDING_SERVER_SOCKET)
+        return _client
@@ -0,0 +1,225 @@
+"""
+Memory-mapped snapshot of every Skill embedding, shared by all workers.
+
+A snapshot is a directory of .npy files - the L2-normalized float32 embedding
+matrix plus parallel user_id / skill_id / name / proficiency arrays - that workers open with
+`mmap_mode='r'`, so every process on a host reads the same page-cached copy
+instead of decoding the Skill table on each request.
+
+Snapshots are numbered by generation. `<SKILL_SNAPSHOT_DIR>/CURRENT` names the
+live generation and is replaced atomically, so a worker only has to stat that
+one file to notice a new snapshot. `build_embedding_snapshot()` is
+incremental: rows of the previous generation are reused, and only skills
+created or updated since then (by `updated_at`) are read from the database.
+It is run by `python manage.py build_embedding_snapshot`. Between builds,
+workers replay the SkillChange log on top of the snapshot (api.skill_changes).
+A build prunes the log only up to the change both those workers and the last
+match refresh have applied.
+
+A snapshot only holds vectors of the model it was built for, recorded in
+CURRENT: skills still embedded by another model are zero rows, and workers
+ignore a snapshot of another model. After switching models, build a new
+snapshot and run `manage.py backfill_embeddings`; re-embedded skills reach
+workers through the SkillChange log as they are written.
+"""
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_backends import embedding_model_id
+from .matching import SkillMatrix, normalize_rows, stack_embeddings
+
+CURRENT_FILE = 'CURRENT'
+ARRAYS = ('vectors', 'user_ids', 'skill_ids', 'names', 'levels')
+
+
+class EmbeddingSnapshot:
+    """One generation of the snapshot, opened read-only."""
+
+    def __init__(self, generation: int, watermark: Optional[str], vectors: np.ndarray,
+                 user_ids: np.ndarray, skill_ids: np.ndarray, names: np.ndarray, levels: np.ndarray,
+                 change_id: int = 0):
+        self.generation = generation
+        self.watermark = watermark
+        # Last SkillChange already reflected in this generation
+        self.change_id = change_id
+        self.vectors = vectors
+        self.user_ids = user_ids
+        self.skill_ids = skill_ids
+        self.names = names
+        self.levels = levels
+        self.matrix = SkillMatrix(user_ids, names.tolist(), vectors, levels)
+
+    def __len__(self) -> int:
+        return len(self.skill_ids)
+
+    @classmethod
+    def open(cls, directory, generation: int, watermark: Optional[str] = None,
+             change_id: int = 0) -> 'EmbeddingSnapshot':
+        path = os.path.join(directory, str(generation))
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        return cls(generation, watermark, change_id=change_id, **arrays)
+
+
+def read_current(directory) -> Optional[dict]:
+    """Contents of CURRENT ({generation, watermark, change_id, model, count}), or None if there is no snapshot."""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_generation(directory, generation: int, watermark: Optional[str], change_id: int, model_id: str,
+                      **arrays) -> None:
+    path = os.path.join(directory, str(generation))
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name in ARRAYS:
+        np.save(os.path.join(tmp_path, f'{name}.npy'), arrays[name])
+    os.replace(tmp_path, path)
+
+    current = os.path.join(directory, CURRENT_FILE)
+    with open(f'{current}.tmp', 'w') as f:
+        json.dump({'generation': generation, 'watermark': watermark, 'change_id': change_id,
+                   'model': model_id, 'count': len(arrays['skill_ids'])}, f)
+    os.replace(f'{current}.tmp', current)
+
+    # Keep the previous generation: workers may still be reading it.
+    for entry in os.listdir(directory):
+        if entry.isdigit() and int(entry) < generation - 1:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+def fetch_skill_arrays(queryset):
+    """(skill_ids, user_ids, names, normalized vectors, proficiency ranks) for a
+    Skill queryset, ordered by id. Embeddings of another model are zero rows."""
+    from .embeddings import embedding_rows
+    from .match_filters import proficiency_rank
+
+    rows = embedding_rows(queryset.order_by('id'), 'id', 'user_id', 'name', 'proficiency_level')
+    vectors = normalize_rows(stack_embeddings([row[4] for row in rows], dim=settings.SKILL_EMBEDDING_DIM))
+    return (
+        np.array([row[0] for row in rows], dtype=np.int64),
+        np.array([row[1] for row in rows], dtype=np.int64),
+        np.array([row[2] for row in rows], dtype=str),
+        vectors,
+        np.array([proficiency_rank(row[3]) for row in rows], dtype=np.int8),
+    )
+
+
+def build_embedding_snapshot(directory=None, full: bool = False) -> dict:
+    """Write a new snapshot generation if the Skill table changed.
+
+    Returns a summary: {generation, count, reused, fetched, removed, changed}.
+    """
+    from django.db.models import Count, Max
+
+    from .models import Skill, SkillChange
+
+    directory = directory or settings.SKILL_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    current = read_current(directory)
+    # Changes logged after this point are replayed on top of the snapshot
+    change_id = SkillChange.objects.aggregate(last=Max('id'))['last'] or 0
+    stats = Skill.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+    watermark = stats['latest'].isoformat() if stats['latest'] else None
+
+    model_id = embedding_model_id()
+    previous = None
+    # Rows of a snapshot built for another model can't be reused
+    if current and not full and current.get('model') == model_id:
+        try:
+            previous = EmbeddingSnapshot.open(directory, current['generation'], current['watermark'])
+        except OSError:
+            previous = None
+    if previous is not None and previous.watermark == watermark and len(previous) == stats['count']:
+        return {'generation': previous.generation, 'count': len(previous), 'reused': len(previous),
+                'fetched': 0, 'removed': 0, 'changed': False}
+
+    if previous is None or previous.vectors.shape[1] != settings.SKILL_EMBEDDING_DIM:
+        skill_ids, user_ids, names, vectors, levels = fetch_skill_arrays(Skill.objects.all())
+        reused = removed = 0
+        fetched = len(skill_ids)
+    else:
+        live_ids = np.fromiter(Skill.objects.order_by('id').values_list('id', flat=True).iterator(), dtype=np.int64)
+        updated = Skill.objects.filter(id__in=live_ids[~np.isin(live_ids, previous.skill_ids)].tolist())
+        if previous.watermark:
+            updated = updated | Skill.objects.filter(updated_at__gte=datetime.fromisoformat(previous.watermark))
+        new_ids, new_users, new_names, new_vectors, new_levels = fetch_skill_arrays(updated)
+
+        keep = np.isin(previous.skill_ids, live_ids) & ~np.isin(previous.skill_ids, new_ids)
+        removed = int(np.count_nonzero(~np.isin(previous.skill_ids, live_ids)))
+        reused = int(np.count_nonzero(keep))
+        fetched = len(new_ids)
+
+        # Merge and keep rows ordered by skill id, like a fresh build
+        skill_ids = np.concatenate((previous.skill_ids[keep], new_ids))
+        order = np.argsort(skill_ids, kind='stable')
+        skill_ids = skill_ids[order]
+        user_ids = np.concatenate((previous.user_ids[keep], new_users))[order]
+        names = np.concatenate((previous.names[keep].astype(str), new_names))[order]
+        vectors = np.concatenate((previous.vectors[keep], new_vectors))[order]
+        levels = np.concatenate((previous.levels[keep], new_levels))[order]
+
+    generation = (current['generation'] + 1) if current else 1
+    _write_generation(directory, generation, watermark, change_id, model_id,
+                      vectors=vectors.astype(np.float32, copy=False),
+                      user_ids=user_ids, skill_ids=skill_ids, names=names, levels=levels)
+    if current:
+        # Changes folded into the previous generation are no longer replayed
+        # by workers, which have already applied them. The match refresh
+        # (api.match_recommendations) reads the log too: keep what it hasn't
+        # applied yet.
+        from .match_recommendations import read_refresh_state
+
+        prune_to = current.get('change_id', 0)
+        refresh_state = read_refresh_state()
+        if refresh_state is not None:
+            prune_to = min(prune_to, refresh_state['change_id'])
+        SkillChange.objects.filter(id__lte=prune_to).delete()
+    return {'generation': generation, 'count': len(skill_ids), 'reused': reused,
+            'fetched': fetched, 'removed': removed, 'changed': True}
+
+
+_snapshot = None
+_snapshot_mtime = None
+_snapshot_lock = threading.Lock()
+
+
+def get_embedding_snapshot() -> Optional[EmbeddingSnapshot]:
+    """The live snapshot, reopened when CURRENT changes; None if there is none
+    or it was built for another embedding model.
+
+    Checking for a new generation costs one stat() call.
+    """
+    global _snapshot, _snapshot_mtime
+    directory = settings.SKILL_SNAPSHOT_DIR
+    try:
+        mtime = os.stat(os.path.join(directory, CURRENT_FILE)).st_mtime_ns
+    except OSError:
+        return None
+    if mtime != _snapshot_mtime:
+        with _snapshot_lock:
+            if mtime != _snapshot_mtime:
+                current = read_current(directory)
+                if current and current.get('model') != embedding_model_id():
+                    print(f"Warning: embedding snapshot in {directory} was built for model "
+                          f"{current.get('model')!r}, not {embedding_model_id()!r}; rebuild it")
+                    _snapshot, _snapshot_mtime = None, mtime
+                    return None
+                try:
+                    _snapshot = EmbeddingSnapshot.open(directory, current['generation'], current['watermark'],
+                                                       current.get('change_id', 0))
+                except (OSError, TypeError, KeyError) as e:
+                    print(f"Warning: could not open embedding snapshot in {directory}: {e}")
+                    return _snapshot
+                _snapshot_mtime = mtime
+    return _snapshot
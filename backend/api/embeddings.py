@@ -0,0 +1,141 @@
+"""
+Storage format and caching for skill embeddings.
+
+Embeddings are stored in `Skill.embedding` as raw little-endian float32 bytes,
+next to their dimension and the id of the model that produced them
+(`embedding_model_id()`). Decoding
+is a zero-copy `np.frombuffer` view over the column value. Vectors of
+different models live in different spaces, so `embedding_rows()` only hands
+out embeddings of the current model; rows of an older one read as missing
+until `manage.py backfill_embeddings` re-embeds them.
+
+`embedding_cache` keeps the embedding of every skill text ever encoded, keyed
+by normalized text and model id: an in-process LRU sits in front of the
+`CachedEmbedding` table, so repeated skills never reach the model.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_backends import embedding_model_id
+
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+
+def encode_embedding(values: Optional[Sequence[float]]) -> Optional[bytes]:
+    """Serialize an embedding for storage. Missing embeddings are stored as NULL."""
+    if values is None or len(values) == 0:
+        return None
+    return np.asarray(values, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def decode_embedding(blob) -> np.ndarray:
+    """Read-only float32 view over a stored embedding (empty when missing)."""
+    if not blob:
+        return np.empty(0, dtype=EMBEDDING_DTYPE)
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def embedding_fields(values: Optional[Sequence[float]]) -> dict:
+    """Model field values for storing `values` on a Skill."""
+    blob = encode_embedding(values)
+    return {
+        'embedding': blob,
+        'embedding_dim': len(values) if blob else 0,
+        'embedding_model': embedding_model_id() if blob else '',
+    }
+
+
+def embedding_rows(queryset, *fields) -> list:
+    """`fields` of every row of a Skill or DesiredSkill queryset, followed by
+    its stored embedding - or None when another model produced it."""
+    current = embedding_model_id()
+    return [
+        row[:-2] + (row[-2] if row[-1] == current else None,)
+        for row in queryset.values_list(*fields, 'embedding', 'embedding_model').iterator()
+    ]
+
+
+def normalize_skill_text(text: str) -> str:
+    """Cache key for a skill text: lower-cased with collapsed whitespace."""
+    return ' '.join(str(text).lower().split())
+
+
+class EmbeddingCache:
+    """In-process LRU in front of the persistent CachedEmbedding table."""
+
+    # Longest text that is persisted; longer queries are only cached in memory.
+    MAX_TEXT_LENGTH = 255
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, vector: np.ndarray) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _recall(self, key) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+            return vector
+
+    def get_many_or_compute(self, texts: Sequence[str],
+                            compute_many: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        """Embeddings for `texts`, in order.
+
+        Texts missing from both cache levels are passed to `compute_many` in a
+        single call, so a batch costs at most one lookup query, one model
+        call and one insert. Empty results (model unavailable) are returned
+        but never cached.
+        """
+        from .models import CachedEmbedding
+
+        model_id = embedding_model_id()
+        normalized = [normalize_skill_text(text) for text in texts]
+        found = {}
+        for text in normalized:
+            vector = self._recall((model_id, text))
+            if vector is not None:
+                found[text] = vector
+
+        missing = [text for text in dict.fromkeys(normalized) if text not in found]
+        persistable = [text for text in missing if len(text) <= self.MAX_TEXT_LENGTH]
+        if persistable:
+            stored = CachedEmbedding.objects.filter(model=model_id, text__in=persistable).values_list(
+                'text', 'embedding'
+            )
+            for text, blob in stored:
+                found[text] = decode_embedding(blob)
+                self._remember((model_id, text), found[text])
+            missing = [text for text in missing if text not in found]
+
+        if missing:
+            new_rows = []
+            for text, values in zip(missing, compute_many(missing)):
+                if not values:
+                    continue
+                found[text] = np.asarray(values, dtype=EMBEDDING_DTYPE)
+                self._remember((model_id, text), found[text])
+                if len(text) <= self.MAX_TEXT_LENGTH:
+                    new_rows.append(CachedEmbedding(text=text, model=model_id, embedding=found[text].tobytes()))
+            CachedEmbedding.objects.bulk_create(new_rows, ignore_conflicts=True)
+
+        return [found[text].tolist() if text in found else [] for text in normalized]
+
+    def clear(self) -> None:
+        """Drop the in-process entries (the table is left untouched)."""
+        with self._lock:
+            self._entries.clear()
+
+
+embedding_cache = EmbeddingCache(settings.SKILL_EMBEDDING_CACHE_SIZE)
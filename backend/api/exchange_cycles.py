@@ -0,0 +1,298 @@
+"""
+Multi-party skill exchanges: A teaches B, B teaches C, C teaches A.
+
+Cycles are found offline by `python manage.py find_exchange_cycles`:
+
+1. Build a directed "can teach" graph. There is an edge teacher -> learner when
+   one of the teacher's skills has a similarity of at least `threshold` to one
+   of the learner's desired skills. Only the `max_teachers` best skills per
+   desired skill are considered, and each teacher keeps their `max_out_degree`
+   strongest edges, which bounds the search below. On large corpora the
+   candidate skills come from an IVF index (api.ann_index) instead of a
+   quadratic scan.
+2. Enumerate cycles of length 3 and 4 with NumPy: paths are expanded edge by
+   edge from the smallest user id of the cycle (so every cycle is found once,
+   and only through larger ids), and closed by an edge lookup.
+3. A cycle is as good as its weakest edge. Each user keeps their
+   `cycles_per_user` best cycles; `store_exchange_cycles()` replaces the stored
+   ExchangeCycle rows with them so /api/exchange_cycles/ is a simple lookup.
+"""
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from .matching import SkillMatrix, normalize_rows, stack_embeddings
+
+
+@dataclass
+class TeachGraph:
+    """Edges teacher -> learner over compact user indices 0..len(user_ids)-1."""
+    user_ids: np.ndarray
+    teachers: np.ndarray
+    learners: np.ndarray
+    weights: np.ndarray
+    skill_rows: np.ndarray
+    desire_rows: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.teachers)
+
+
+@dataclass
+class Cycles:
+    """Cycles as rows of user indices (-1 padded to length 4), best first."""
+    members: np.ndarray
+    edges: np.ndarray
+    scores: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+def _rank_within_groups(groups: np.ndarray) -> np.ndarray:
+    """Position of each element within its run of equal values (input sorted by group)."""
+    if not len(groups):
+        return np.empty(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], groups[1:] != groups[:-1])))
+    counts = np.diff(np.concatenate((starts, [len(groups)])))
+    return np.arange(len(groups)) - np.repeat(starts, counts)
+
+
+def _top_per_desire(skill_rows, desire_rows, sims, k: int):
+    """Keep the k most similar skills of each desired skill."""
+    order = np.lexsort((-sims, desire_rows))
+    keep = order[_rank_within_groups(desire_rows[order]) < k]
+    return skill_rows[keep], desire_rows[keep], sims[keep]
+
+
+def _similar_pairs_exact(skills: SkillMatrix, desires: SkillMatrix, threshold: float, k: int,
+                         chunk_size: int):
+    """(skill_rows, desire_rows, similarities) of the k most similar skills of
+    each desired skill, among those above `threshold`, scanning the whole corpus."""
+    parts = []
+    for start in range(0, len(desires), chunk_size):
+        sims = desires.vectors[start:start + chunk_size] @ skills.vectors.T
+        rows, cols = np.nonzero(sims >= threshold)
+        parts.append(_top_per_desire(cols, start + rows, sims[rows, cols], k))
+    return parts
+
+
+def _similar_pairs_ivf(skills: SkillMatrix, desires: SkillMatrix, threshold: float, k: int,
+                       nprobe: int):
+    """Like _similar_pairs_exact, but each desired skill is only scored against
+    the `nprobe` IVF lists (api.ann_index) closest to it. Desired skills are
+    grouped by list, so each list is scored with one matrix product."""
+    from .ann_index import IVFIndex
+
+    index = IVFIndex.build(skills, np.arange(len(skills)))
+    nprobe = max(1, min(nprobe, index.nlist))
+    probes = np.empty((len(desires), nprobe), dtype=np.int64)
+    for start in range(0, len(desires), 4096):
+        centroid_sims = desires.vectors[start:start + 4096] @ index.centroids.T
+        probes[start:start + 4096] = np.argpartition(-centroid_sims, nprobe - 1, axis=1)[:, :nprobe] \
+            if nprobe < index.nlist else np.arange(index.nlist)
+
+    probe_desires = np.repeat(np.arange(len(desires)), nprobe)
+    probe_lists = probes.ravel()
+    order = np.argsort(probe_lists, kind='stable')
+    probe_desires, probe_lists = probe_desires[order], probe_lists[order]
+    bounds = np.searchsorted(probe_lists, np.arange(index.nlist + 1))
+
+    parts = []
+    for c in range(index.nlist):
+        desire_rows = probe_desires[bounds[c]:bounds[c + 1]]
+        skill_rows = index.list_rows[index.list_offsets[c]:index.list_offsets[c + 1]]
+        if not len(desire_rows) or not len(skill_rows):
+            continue
+        sims = desires.vectors[desire_rows] @ skills.vectors[skill_rows].T
+        rows, cols = np.nonzero(sims >= threshold)
+        parts.append((skill_rows[cols], desire_rows[rows], sims[rows, cols]))
+    return parts
+
+
+def build_teach_graph(skills: SkillMatrix, desires: SkillMatrix, threshold: float = 0.6,
+                      max_teachers: int = 50, max_out_degree: int = 10,
+                      nprobe: Optional[int] = None, chunk_size: int = 128) -> TeachGraph:
+    """Thresholded "can teach" graph between the users of `skills` and `desires`.
+
+    With `nprobe`, candidate skills come from an IVF index instead of an exact
+    scan; set it for large corpora, where the exact scan is quadratic.
+    """
+    user_ids = np.union1d(skills.user_ids, desires.user_ids)
+    skill_users = np.searchsorted(user_ids, skills.user_ids)
+    desire_users = np.searchsorted(user_ids, desires.user_ids)
+
+    if not len(skills) or not len(desires):
+        parts = []
+    elif nprobe:
+        parts = _similar_pairs_ivf(skills, desires, threshold, max_teachers, nprobe)
+    else:
+        parts = _similar_pairs_exact(skills, desires, threshold, max_teachers, chunk_size)
+    if parts:
+        skill_rows, desire_rows, weights = (np.concatenate(p) for p in zip(*parts))
+        skill_rows, desire_rows, weights = _top_per_desire(skill_rows, desire_rows, weights, max_teachers)
+    else:
+        skill_rows = desire_rows = np.empty(0, dtype=np.int64)
+        weights = np.empty(0, dtype=np.float32)
+    teachers, learners = skill_users[skill_rows], desire_users[desire_rows]
+    not_self = teachers != learners
+    teachers, learners, weights = teachers[not_self], learners[not_self], weights[not_self]
+    skill_rows, desire_rows = skill_rows[not_self], desire_rows[not_self]
+
+    # One edge per (teacher, learner), the strongest; then each teacher keeps
+    # its strongest `max_out_degree` edges
+    order = np.lexsort((-weights, learners, teachers))
+    teachers, learners, weights = teachers[order], learners[order], weights[order]
+    skill_rows, desire_rows = skill_rows[order], desire_rows[order]
+    first = np.concatenate(([True], (teachers[1:] != teachers[:-1]) | (learners[1:] != learners[:-1]))) \
+        if len(teachers) else np.empty(0, dtype=bool)
+    teachers, learners, weights = teachers[first], learners[first], weights[first]
+    skill_rows, desire_rows = skill_rows[first], desire_rows[first]
+
+    order = np.lexsort((-weights, teachers))
+    keep = order[_rank_within_groups(teachers[order]) < max_out_degree]
+    keep.sort()
+    return TeachGraph(user_ids, teachers[keep], learners[keep], weights[keep].astype(np.float32),
+                      skill_rows[keep], desire_rows[keep])
+
+
+def _select_per_user(cycles: Cycles, per_user: int) -> Cycles:
+    """Keep the cycles that are among the `per_user` best of at least one member."""
+    if not len(cycles):
+        return cycles
+    order = np.argsort(-cycles.scores, kind='stable')
+    members = cycles.members[order]
+    flat_users = members.ravel()
+    flat_cycles = np.repeat(np.arange(len(order)), members.shape[1])
+    valid = flat_users >= 0
+    flat_users, flat_cycles = flat_users[valid], flat_cycles[valid]
+    by_user = np.lexsort((flat_cycles, flat_users))
+    ranks = _rank_within_groups(flat_users[by_user])
+    selected = np.unique(flat_cycles[by_user][ranks < per_user])
+    chosen = order[selected]
+    return Cycles(cycles.members[chosen], cycles.edges[chosen], cycles.scores[chosen])
+
+
+def find_cycles(graph: TeachGraph, max_length: int = 4, cycles_per_user: int = 5,
+                start_chunk: int = 2048) -> Cycles:
+    """Exchange cycles of length 3..max_length in `graph`, best per user."""
+    n = len(graph.user_ids)
+    indptr = np.concatenate(([0], np.cumsum(np.bincount(graph.teachers, minlength=n)))).astype(np.int64)
+    edge_keys = graph.teachers.astype(np.int64) * n + graph.learners
+
+    def expand(paths, path_edges):
+        """Extend each path by every out-edge of its last node to a node > its start."""
+        last = paths[:, -1]
+        counts = indptr[last + 1] - indptr[last]
+        path_index = np.repeat(np.arange(len(paths)), counts)
+        offsets = np.arange(len(path_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+        edges = indptr[last][path_index] + offsets
+        nxt = graph.learners[edges]
+        ok = nxt > paths[path_index, 0]
+        for column in range(1, paths.shape[1]):
+            ok &= nxt != paths[path_index, column]
+        path_index, edges, nxt = path_index[ok], edges[ok], nxt[ok]
+        return (np.column_stack((paths[path_index], nxt)),
+                np.column_stack((path_edges[path_index], edges)))
+
+    def close(paths, path_edges):
+        """Paths whose last node teaches their first, with the closing edge."""
+        keys = paths[:, -1].astype(np.int64) * n + paths[:, 0]
+        position = np.searchsorted(edge_keys, keys)
+        position[position == len(edge_keys)] = 0
+        found = edge_keys[position] == keys if len(edge_keys) else np.zeros(len(keys), dtype=bool)
+        return paths[found], np.column_stack((path_edges[found], position[found]))
+
+    found = Cycles(np.empty((0, 4), dtype=np.int64), np.empty((0, 4), dtype=np.int64),
+                   np.empty(0, dtype=np.float32))
+    for chunk_start in range(0, n, start_chunk):
+        # First edges a -> b where a starts the cycle, i.e. b > a
+        first = np.flatnonzero((graph.teachers >= chunk_start) & (graph.teachers < chunk_start + start_chunk)
+                               & (graph.learners > graph.teachers))
+        paths = np.column_stack((graph.teachers[first], graph.learners[first]))
+        path_edges = first[:, None]
+        parts = []
+        for length in range(3, max_length + 1):
+            paths, path_edges = expand(paths, path_edges)
+            members, edges = close(paths, path_edges)
+            pad = 4 - length
+            parts.append((
+                np.pad(members, ((0, 0), (0, pad)), constant_values=-1),
+                np.pad(edges, ((0, 0), (0, pad)), constant_values=-1),
+                graph.weights[edges].min(axis=1) if len(edges) else np.empty(0, dtype=np.float32),
+            ))
+        members, edges, scores = (np.concatenate(p) for p in zip(*parts))
+        found = _select_per_user(Cycles(
+            np.concatenate((found.members, members)),
+            np.concatenate((found.edges, edges)),
+            np.concatenate((found.scores, scores)),
+        ), cycles_per_user)
+
+    order = np.argsort(-found.scores, kind='stable')
+    return Cycles(found.members[order], found.edges[order], found.scores[order])
+
+
+def load_matching_corpus():
+    """(skills, desires) SkillMatrix pair for the whole database, with the
+    skills read from the embedding snapshot when one exists."""
+    from django.conf import settings
+
+    from .embedding_snapshot import fetch_skill_arrays, get_embedding_snapshot
+    from .embeddings import embedding_rows
+    from .models import DesiredSkill, Skill
+
+    snapshot = get_embedding_snapshot()
+    if snapshot is not None and snapshot.vectors.shape[1] == settings.SKILL_EMBEDDING_DIM:
+        skills = snapshot.matrix
+    else:
+        _, user_ids, names, vectors, levels = fetch_skill_arrays(Skill.objects.all())
+        skills = SkillMatrix(user_ids, names.tolist(), vectors, levels)
+
+    rows = embedding_rows(DesiredSkill.objects.all(), 'user_id', 'name')
+    desires = SkillMatrix(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        normalize_rows(stack_embeddings([row[2] for row in rows], dim=settings.SKILL_EMBEDDING_DIM)),
+    )
+    return skills, desires
+
+
+def cycle_steps(graph: TeachGraph, skills: SkillMatrix, desires: SkillMatrix, edges) -> List[dict]:
+    """Describe a cycle's edges: who teaches whom which skill."""
+    steps = []
+    for edge in edges:
+        if edge < 0:
+            continue
+        steps.append({
+            'teacher_id': int(graph.user_ids[graph.teachers[edge]]),
+            'learner_id': int(graph.user_ids[graph.learners[edge]]),
+            'skill': skills.names[graph.skill_rows[edge]],
+            'desired_skill': desires.names[graph.desire_rows[edge]],
+            'similarity': round(float(graph.weights[edge]), 4),
+        })
+    return steps
+
+
+def store_exchange_cycles(graph: TeachGraph, cycles: Cycles, skills: SkillMatrix, desires: SkillMatrix) -> int:
+    """Replace the stored cycles with `cycles`. Returns the number stored."""
+    from django.db import transaction
+
+    from .models import ExchangeCycle, ExchangeCycleMember
+
+    with transaction.atomic():
+        ExchangeCycle.objects.all().delete()
+        stored = ExchangeCycle.objects.bulk_create([
+            ExchangeCycle(
+                length=int(np.count_nonzero(members >= 0)),
+                score=float(score),
+                steps=cycle_steps(graph, skills, desires, edges),
+            )
+            for members, edges, score in zip(cycles.members, cycles.edges, cycles.scores)
+        ], batch_size=1000)
+        ExchangeCycleMember.objects.bulk_create([
+            ExchangeCycleMember(cycle=cycle, user_id=int(graph.user_ids[member]), score=cycle.score)
+            for cycle, members in zip(stored, cycles.members)
+            for member in members if member >= 0
+        ], batch_size=1000)
+    return len(stored)
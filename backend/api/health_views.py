@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from .utils_safe import get_model_state, start_model_warm_up
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def readiness(request):
+    """Readiness probe for load balancers.
+
+    When the model is preloaded at start-up (SKILL_MODEL_PRELOAD), the worker
+    reports 503 until the model is loaded and warm; while it is not, each probe
+    retries a failed warm-up in the background once MODEL_RETRY_SECONDS have
+    passed. Otherwise the model loads lazily and the worker is always ready.
+    """
+    if settings.SKILL_MODEL_PRELOAD:
+        start_model_warm_up()
+    model = get_model_state()
+    ready = model['warm'] or not settings.SKILL_MODEL_PRELOAD
+    return Response(
+        {'status': 'ready' if ready else 'starting', 'model': model},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,65 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.embedding_backfill import backfill_embeddings, read_checkpoint
+from api.embedding_backends import embedding_model_id
+from api.models import DesiredSkill, Skill
+
+
+class Command(BaseCommand):
+    help = (
+        'Embed skills whose embedding is missing or from another model, most searched '
+        'first and then in id order, resuming from the last checkpoint after an interruption'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Encoding processes, each loading the embedding backend once')
+        parser.add_argument('--batch-size', type=int, default=256, help='Texts per encode call')
+        parser.add_argument('--page-size', type=int, default=5000, help='Skills read and written per page')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many skills')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first skill')
+        parser.add_argument('--no-priority', action='store_true',
+                            help='Skip the pass over the most searched skills and go in id order only')
+        parser.add_argument('--desired', action='store_true',
+                            help='Embed desired skills instead of skills; run refresh_skill_matches --full after')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1 or options['page_size'] < 1:
+            raise CommandError('--workers, --batch-size and --page-size must be positive')
+        queryset = (DesiredSkill if options['desired'] else Skill).objects.all()
+        checkpoint = None if options['restart'] else read_checkpoint()
+        if (checkpoint and checkpoint.get('model') == embedding_model_id()
+                and checkpoint.get('table') == queryset.model._meta.label_lower):
+            self.stdout.write(f'Resuming from the checkpoint ({checkpoint["scanned"]} already scanned)')
+
+        progress = None
+        for progress in backfill_embeddings(
+            queryset=queryset,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            page_size=options['page_size'],
+            limit=options['limit'],
+            restart=options['restart'],
+            priority=not options['no_priority'],
+        ):
+            rate = progress['run_scanned'] / progress['seconds'] if progress['seconds'] else 0.0
+            where = (f'Most searched ({progress["priority_offset"]} texts done)' if progress['phase'] == 'priority'
+                     else f'Up to id {progress["last_id"]}')
+            self.stdout.write(
+                f'{where}: {progress["scanned"]} scanned, {progress["updated"]} embedded, '
+                f'{progress["failed"]} failed ({rate:.0f} skills/s)'
+            )
+
+        if progress is None:
+            self.stdout.write(self.style.SUCCESS(f'Every row is embedded with {embedding_model_id()}'))
+        elif os.path.exists(settings.SKILL_BACKFILL_CHECKPOINT):
+            self.stdout.write('Stopped; run again to resume')
+        else:
+            rate = progress['run_scanned'] / progress['seconds'] if progress['seconds'] else 0.0
+            self.stdout.write(self.style.SUCCESS(
+                f'Backfill complete: {progress["updated"]} rows embedded with {embedding_model_id()}, '
+                f'{progress["failed"]} failed, {rate:.0f} skills/s'
+            ))
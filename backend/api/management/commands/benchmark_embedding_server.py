@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.embedding_backends import create_embedding_backend
+from api.embedding_server import EmbeddingClient, EmbeddingServer, MicroBatcher
+from api.skills_data import COMMON_SKILLS
+from api.utils_safe import get_model
+
+
+def _run_worker(mode, socket_path, requests, concurrency, ready, results):
+    """One simulated web worker: `concurrency` threads each encoding single
+    skill texts back to back. Waits on `ready` once set up, then puts the
+    per-request latencies on `results`."""
+    texts = sorted(COMMON_SKILLS)
+    if mode == 'server':
+        client = EmbeddingClient(socket_path)
+        encode = client.encode
+    else:
+        # Loaded after the fork, like a web worker loading its own model; the
+        # parent's copy-on-write model would not be a per-process baseline
+        encode = create_embedding_backend().encode
+    ready.wait()
+
+    latencies = []
+    lock = threading.Lock()
+
+    def run(thread_index):
+        local = []
+        for i in range(requests // concurrency):
+            text = f'{texts[(thread_index * 31 + i) % len(texts)]} {i}'
+            start = time.perf_counter()
+            if encode([text]) is None:
+                raise RuntimeError('embedding server did not answer')
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=run, args=(t,)) for t in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put(latencies)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure embedding throughput and latency for 1 vs N web workers, each '
+        'loading its own model after it starts (in-process) or sharing the micro-batching server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', default='1,4', help='Comma-separated worker counts to compare')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per worker')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent requests per worker')
+        parser.add_argument('--window-ms', type=float, default=5)
+        parser.add_argument('--max-batch', type=int, default=64)
+        parser.add_argument('--skip-in-process', action='store_true',
+                            help='Only benchmark the shared server (each in-process worker loads its own model)')
+
+    def _measure(self, mode, workers, socket_path, options):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        # Timing starts once every worker has its model or connection
+        ready = context.Barrier(workers + 1)
+        processes = [
+            context.Process(target=_run_worker,
+                            args=(mode, socket_path, options['requests'], options['concurrency'], ready, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        ready.wait()
+        start = time.perf_counter()
+        latencies = []
+        for _ in processes:
+            latencies.extend(results.get())
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+        latencies = np.array(latencies) * 1000
+        self.stdout.write(
+            f'{mode:>10} x{workers:<3} {len(latencies) / elapsed:9.1f} req/s   '
+            f'p50 {np.percentile(latencies, 50):7.2f} ms   p99 {np.percentile(latencies, 99):7.2f} ms'
+        )
+
+    def handle(self, *args, **options):
+        model = get_model()
+        if model is None:
+            raise CommandError('The embedding model is not available')
+        worker_counts = [int(n) for n in options['workers'].split(',')]
+
+        socket_path = os.path.join(tempfile.mkdtemp(), 'embeddings.sock')
+        batcher = MicroBatcher(
+            lambda texts: model.encode(texts, batch_size=len(texts)),
+            max_batch=options['max_batch'],
+            window=options['window_ms'] / 1000,
+        )
+        server = EmbeddingServer(socket_path, batcher)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        try:
+            for workers in worker_counts:
+                if not options['skip_in_process']:
+                    self._measure('in-process', workers, socket_path, options)
+                batches, texts = batcher.batches, batcher.texts
+                self._measure('server', workers, socket_path, options)
+                self.stdout.write(
+                    f'{"":>15}mean server batch: {(batcher.texts - texts) / max(1, batcher.batches - batches):.1f} texts'
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.unlink(socket_path)
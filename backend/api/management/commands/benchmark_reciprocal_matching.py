@@ -0,0 +1,117 @@
+import statistics
+import time
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.matching import ReciprocalScores, SkillMatrix, UserScores, normalize_rows
+from api.views import ReciprocalMatchView
+
+
+def _random_matrix(rng, count, users, dim):
+    vectors = normalize_rows(rng.standard_normal((count, dim)).astype(np.float32))
+    user_ids = np.sort(rng.integers(1, users + 1, size=count))
+    return SkillMatrix(user_ids, [f'skill{i}' for i in range(count)], vectors)
+
+
+class Command(BaseCommand):
+    help = (
+        'Time POST /api/match_skills/reciprocal/ end to end against the database, '
+        'or with --synthetic compare reciprocal scoring alone on an in-memory corpus '
+        'with two sequential one-sided match calls merged afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None,
+                            help='Username to match for (default: the first user with skills and desired skills)')
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Time scoring only, on random in-memory matrices; no database or request handling')
+        parser.add_argument('--skills', type=int, default=100_000, help='Size of the --synthetic corpus')
+        parser.add_argument('--users', type=int, default=None, help='Default: skills / 5')
+        parser.add_argument('--desires-per-user', type=float, default=3)
+        parser.add_argument('--wanted', type=int, default=5, help='Skills the seeker wants to learn')
+        parser.add_argument('--offered', type=int, default=5, help='Skills the seeker can teach')
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['synthetic']:
+            self.benchmark_scoring(options)
+        else:
+            self.benchmark_endpoint(options)
+
+    def benchmark_endpoint(self, options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(skills__isnull=False, desired_skills__isnull=False).order_by('id').first()
+        if user is None:
+            raise CommandError('No user with both skills and desired skills; pass --user or generate_synthetic_skills')
+
+        view = ReciprocalMatchView.as_view()
+        factory = APIRequestFactory()
+
+        def request():
+            post = factory.post('/api/match_skills/reciprocal/', {'limit': options['limit']}, format='json')
+            force_authenticate(post, user=user)
+            response = view(post)
+            if response.status_code != 200:
+                raise CommandError(f'Request failed with {response.status_code}: {response.data}')
+
+        # The first request also loads the per-process matrices
+        start = time.perf_counter()
+        request()
+        first = time.perf_counter() - start
+        timings = []
+        for _ in range(options['repeat']):
+            start = time.perf_counter()
+            request()
+            timings.append(time.perf_counter() - start)
+        self.stdout.write(f'Reciprocal matches for {user.username}: first request {1000 * first:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'Later requests: median {1000 * statistics.median(timings):.1f} ms, '
+            f'max {1000 * max(timings):.1f} ms ({len(timings)} requests)'
+        ))
+
+    def benchmark_scoring(self, options):
+        rng = np.random.default_rng(options['seed'])
+        dim = settings.SKILL_EMBEDDING_DIM
+        users = options['users'] or max(1, options['skills'] // 5)
+        skills = _random_matrix(rng, options['skills'], users, dim)
+        desires = _random_matrix(rng, int(users * options['desires_per_user']), users, dim)
+        wanted = rng.standard_normal((options['wanted'], dim)).astype(np.float32)
+        offered = rng.standard_normal((options['offered'], dim)).astype(np.float32)
+        wanted_names = [f'wanted{i}' for i in range(len(wanted))]
+        offered_names = [f'offered{i}' for i in range(len(offered))]
+        # Both variants group candidates by user once, as a long-lived snapshot does
+        skills.grouping, desires.grouping
+
+        def reciprocal():
+            scores = ReciprocalScores(skills, desires, wanted_names, wanted, offered_names, offered)
+            return scores.page(0, options['limit'])
+
+        def sequential():
+            teach = {m['user_id']: m['match_score'] for m in UserScores(skills, wanted_names, wanted).page(0, None)}
+            learn = {m['user_id']: m['match_score'] for m in UserScores(desires, offered_names, offered).page(0, None)}
+            combined = {user: 0.5 * score + 0.5 * learn.get(user, 0.0) for user, score in teach.items()}
+            return sorted(combined.items(), key=lambda item: -item[1])[:options['limit']]
+
+        self.stdout.write(
+            f'{len(skills)} skills, {len(desires)} desired skills, {users} users, '
+            f'{len(wanted)} wanted x {len(offered)} offered, dim {dim}'
+        )
+        timings = {}
+        for name, run in (('reciprocal', reciprocal), ('sequential', sequential)):
+            run()
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                run()
+            timings[name] = (time.perf_counter() - start) / options['repeat']
+            self.stdout.write(f'{name:>11}: {1000 * timings[name]:8.1f} ms/query')
+        self.stdout.write(self.style.SUCCESS(
+            f'Reciprocal scoring is {timings["sequential"] / timings["reciprocal"]:.1f}x faster than two merged match calls'
+        ))
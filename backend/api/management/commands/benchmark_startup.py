@@ -0,0 +1,60 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter: set up Django and import every view module the
+# URLconf pulls in, which is what a web worker does at boot.
+STARTUP_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import api.urls
+elapsed = time.perf_counter() - start
+heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+print(json.dumps({'seconds': elapsed, 'heavy': heavy}))
+"""
+
+HEAVY_MODULES = ('nltk', 'PyPDF2', 'sentence_transformers', 'torch', 'sklearn')
+
+
+class Command(BaseCommand):
+    help = 'Measure worker start-up import time and check that no heavy modules are loaded'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--target-ms', type=float, default=1500,
+            help='Fail if the median start-up time exceeds this many milliseconds',
+        )
+
+    def handle(self, *args, **options):
+        snippet = f'HEAVY_MODULES = {HEAVY_MODULES!r}\n' + STARTUP_SNIPPET
+        timings, heavy = [], set()
+        for _ in range(options['runs']):
+            output = subprocess.run(
+                [sys.executable, '-c', snippet],
+                cwd=settings.BASE_DIR,
+                env=os.environ.copy(),
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            timings.append(result['seconds'] * 1000)
+            heavy.update(result['heavy'])
+
+        median = statistics.median(timings)
+        self.stdout.write(f'Start-up import time: median {median:.0f} ms, '
+                          f'min {min(timings):.0f} ms, max {max(timings):.0f} ms ({len(timings)} runs)')
+
+        if heavy:
+            raise CommandError(f'Heavy modules imported at start-up: {", ".join(sorted(heavy))}')
+        if median > options['target_ms']:
+            raise CommandError(f'Median start-up time {median:.0f} ms exceeds the {options["target_ms"]:.0f} ms target')
+        self.stdout.write(self.style.SUCCESS(f'Within the {options["target_ms"]:.0f} ms target'))
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.embedding_snapshot import build_embedding_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Write a new generation of the memory-mapped skill embedding snapshot, '
+        'reusing the previous one for skills that did not change'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rebuild from scratch instead of incrementally')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running and check for changes every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            start = time.perf_counter()
+            result = build_embedding_snapshot(full=full)
+            elapsed = time.perf_counter() - start
+            if result['changed']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Generation {result["generation"]}: {result["count"]} skills '
+                    f'({result["reused"]} reused, {result["fetched"]} read, {result["removed"]} removed) '
+                    f'in {elapsed:.2f}s ({settings.SKILL_SNAPSHOT_DIR})'
+                ))
+            elif options['interval'] is None:
+                self.stdout.write(f'Generation {result["generation"]} is up to date ({result["count"]} skills)')
+            if options['interval'] is None:
+                return
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.ann_index import build_skill_index, skill_index_path
+
+
+class Command(BaseCommand):
+    help = 'Build the approximate nearest-neighbour index over Skill embeddings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--nlist', type=int, default=None,
+            help='Number of clusters (default: square root of the skill count)',
+        )
+        parser.add_argument(
+            '--type', choices=('ivf', 'pq'), default=settings.SKILL_INDEX_TYPE,
+            help='Index type (default: SKILL_INDEX_TYPE)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        index = build_skill_index(nlist=options['nlist'], index_type=options['type'])
+        path = skill_index_path(options['type'])
+        index.save(path)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index)} skills into {index.nlist} lists in {elapsed:.2f}s, '
+            f'{index.bytes_per_vector():.0f} bytes per skill ({path})'
+        ))
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from api.embedding_backends import EMBEDDING_BACKENDS, create_embedding_backend
+from api.matching import normalize_rows
+from api.skills_data import COMMON_SKILLS
+
+
+class Command(BaseCommand):
+    help = 'Report how closely an embedding backend agrees with the fp32 backend on COMMON_SKILLS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', default='int8', choices=sorted(EMBEDDING_BACKENDS))
+        parser.add_argument('--batch-size', type=int, default=64)
+        parser.add_argument('--min-cosine', type=float, default=0.98,
+                            help='Fail when the mean cosine agreement is below this value')
+
+    def _encode(self, name, texts, batch_size):
+        try:
+            backend = create_embedding_backend(name)
+        except Exception as e:
+            raise CommandError(f'Could not load the {name} embedding backend: {e}')
+        backend.encode(texts[:batch_size], batch_size=batch_size)
+        start = time.perf_counter()
+        vectors = backend.encode(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'{name:>5}: {1000 * elapsed / len(texts):.3f} ms/skill')
+        return normalize_rows(np.array(vectors, dtype=np.float32))
+
+    def handle(self, *args, **options):
+        texts = sorted(COMMON_SKILLS)
+        reference = self._encode('fp32', texts, options['batch_size'])
+        candidate = self._encode(options['backend'], texts, options['batch_size'])
+
+        cosine = np.einsum('ij,ij->i', reference, candidate)
+        # Nearest other skill under each backend: does quantization reorder neighbours?
+        ref_sims, cand_sims = reference @ reference.T, candidate @ candidate.T
+        np.fill_diagonal(ref_sims, -np.inf)
+        np.fill_diagonal(cand_sims, -np.inf)
+        neighbour_agreement = np.mean(ref_sims.argmax(axis=1) == cand_sims.argmax(axis=1))
+
+        worst = np.argsort(cosine)[:5]
+        self.stdout.write(f'Skills compared:       {len(texts)}')
+        self.stdout.write(f'Mean cosine vs fp32:   {cosine.mean():.4f}')
+        self.stdout.write(f'Min cosine vs fp32:    {cosine.min():.4f}')
+        self.stdout.write(f'1st percentile:        {np.percentile(cosine, 1):.4f}')
+        self.stdout.write(f'Nearest-neighbour agreement: {neighbour_agreement:.3f}')
+        self.stdout.write('Least agreeing: ' + ', '.join(f'{texts[i]} ({cosine[i]:.3f})' for i in worst))
+
+        if cosine.mean() < options['min_cosine']:
+            raise CommandError(f'Mean cosine {cosine.mean():.4f} is below {options["min_cosine"]}')
+        self.stdout.write(self.style.SUCCESS(f'{options["backend"]} agrees with fp32'))
@@ -0,0 +1,70 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.skill_extractor import get_skill_extractor, legacy_extract_skills
+from api.skills_data import COMMON_SKILLS
+from api.utils_safe import extract_text_from_pdf
+
+
+class Command(BaseCommand):
+    help = (
+        'Differential check of the skill extractor against the previous regex '
+        'extractor, over resume PDFs/text files and every taxonomy entry'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='PDF or text files to compare (default: every PDF under MEDIA_ROOT/resumes)',
+        )
+
+    def _documents(self, paths):
+        if not paths:
+            paths = sorted(Path(settings.MEDIA_ROOT, 'resumes').glob('*.pdf'))
+        for path in map(Path, paths):
+            if path.suffix.lower() == '.pdf':
+                with open(path, 'rb') as f:
+                    yield path.name, extract_text_from_pdf(f)
+            else:
+                yield path.name, path.read_text(errors='ignore')
+
+    def handle(self, *args, **options):
+        extractor = get_skill_extractor()
+        failures = []
+
+        # Every taxonomy entry must be found when it appears in running text.
+        for skill in sorted(COMMON_SKILLS):
+            if skill not in extractor.extract(f'Experienced with {skill.upper()}, among others.'):
+                failures.append(f'taxonomy entry "{skill}" not found')
+
+        documents = legacy_time = new_time = 0
+        extra = {}
+        for name, text in self._documents(options['paths']):
+            documents += 1
+            start = time.perf_counter()
+            expected = set(legacy_extract_skills(text))
+            legacy_time += time.perf_counter() - start
+            start = time.perf_counter()
+            found = set(extractor.extract(text))
+            new_time += time.perf_counter() - start
+
+            # The new extractor may only add skills, never lose any.
+            for skill in sorted(expected - found):
+                failures.append(f'{name}: "{skill}" found by the legacy extractor only')
+            for skill in found - expected:
+                extra[skill] = extra.get(skill, 0) + 1
+
+        self.stdout.write(f'Documents compared: {documents}')
+        self.stdout.write(f'Legacy extractor:   {legacy_time * 1000:.1f} ms total')
+        self.stdout.write(f'Automaton:          {new_time * 1000:.1f} ms total')
+        for skill, count in sorted(extra.items(), key=lambda item: -item[1]):
+            self.stdout.write(f'  additionally found "{skill}" in {count} document(s)')
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'{len(failures)} differences found')
+        self.stdout.write(self.style.SUCCESS('No skills lost relative to the legacy extractor'))
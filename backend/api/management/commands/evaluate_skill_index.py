@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ann_index import get_skill_index, load_skill_index, skill_index_path
+from api.matching import rank_users
+
+
+class Command(BaseCommand):
+    help = 'Report recall and latency of the skill index against exact brute-force matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=100, help='Number of sampled query skills')
+        parser.add_argument('--k', type=int, default=10, help='Cut-off for recall@k')
+        parser.add_argument('--nprobe', type=int, default=settings.SKILL_INDEX_NPROBE)
+        parser.add_argument('--candidates', type=int, default=settings.SKILL_INDEX_CANDIDATES)
+        parser.add_argument('--type', choices=('ivf', 'pq'), default=None,
+                            help='Index to evaluate (default: SKILL_INDEX_TYPE)')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['type']:
+            try:
+                index = load_skill_index(options['type'])
+            except OSError:
+                index = None
+        else:
+            index = get_skill_index()
+        if index is None or not len(index):
+            raise CommandError(f'No skill index found at {skill_index_path(options["type"])}. '
+                               'Run "manage.py build_skill_index" first.')
+
+        k = options['k']
+        matrix = index.matrix
+        rng = np.random.default_rng(options['seed'])
+        sample = rng.choice(len(matrix), size=min(options['queries'], len(matrix)), replace=False)
+
+        skill_recall, user_recall = [], []
+        exact_time = approx_time = 0.0
+        for row in sample:
+            query = matrix.vectors[row:row + 1]
+            name = matrix.names[row]
+
+            start = time.perf_counter()
+            exact_skills = np.argsort(-matrix.similarities(query)[0], kind='stable')[:k]
+            exact_users = rank_users(matrix, [name], query, limit=k)
+            exact_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            candidates = index.search(query, options['candidates'], options['nprobe'])[0]
+            approx_users = rank_users(matrix.subset(np.sort(candidates)), [name], query, limit=k)
+            approx_time += time.perf_counter() - start
+
+            skill_recall.append(len(set(exact_skills) & set(candidates[:k])) / len(exact_skills))
+            expected = {m['user_id'] for m in exact_users}
+            found = {m['user_id'] for m in approx_users}
+            user_recall.append(len(expected & found) / len(expected) if expected else 1.0)
+
+        n = len(sample)
+        self.stdout.write(f'Skills indexed:        {len(index)} in {index.nlist} lists')
+        self.stdout.write(f'Memory per skill:      {index.bytes_per_vector():.0f} bytes '
+                          f'(float32 vector: {4 * matrix.dim} bytes)')
+        self.stdout.write(f'Queries:               {n} (nprobe={options["nprobe"]}, candidates={options["candidates"]})')
+        self.stdout.write(f'Skill recall@{k}:       {np.mean(skill_recall):.3f}')
+        self.stdout.write(f'User recall@{k}:        {np.mean(user_recall):.3f}')
+        self.stdout.write(f'Exact latency:         {1000 * exact_time / n:.2f} ms/query')
+        self.stdout.write(f'Approximate latency:   {1000 * approx_time / n:.2f} ms/query')
@@ -0,0 +1,84 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exchange_cycles import build_teach_graph, find_cycles, load_matching_corpus, store_exchange_cycles
+from api.matching import SkillMatrix, normalize_rows
+
+
+def _clustered_matrix(rng, centroids, count, users, noise):
+    """Random skills around topic centroids, so that users share topics."""
+    topics = rng.integers(0, len(centroids), size=count)
+    vectors = centroids[topics] + noise * rng.standard_normal((count, centroids.shape[1])).astype(np.float32)
+    user_ids = np.sort(rng.integers(1, users + 1, size=count))
+    return SkillMatrix(user_ids, [f'topic{t}' for t in topics], normalize_rows(vectors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Find multi-party skill exchanges (A teaches B, B teaches C, C teaches A) '
+        'and store each user\'s best ones for /api/exchange_cycles/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=settings.SKILL_CYCLE_THRESHOLD)
+        parser.add_argument('--max-teachers', type=int, default=settings.SKILL_CYCLE_MAX_TEACHERS,
+                            help='Closest skills considered per desired skill')
+        parser.add_argument('--max-out-degree', type=int, default=settings.SKILL_CYCLE_MAX_OUT_DEGREE,
+                            help='Strongest "can teach" edges kept per user')
+        parser.add_argument('--nprobe', type=int, default=settings.SKILL_CYCLE_NPROBE,
+                            help='IVF lists scanned per desired skill')
+        parser.add_argument('--exact', action='store_true', help='Scan every skill instead of using an IVF index')
+        parser.add_argument('--max-length', type=int, default=4, choices=(3, 4))
+        parser.add_argument('--cycles-per-user', type=int, default=settings.SKILL_CYCLES_PER_USER)
+        parser.add_argument('--synthetic', type=int, default=None, metavar='USERS',
+                            help='Time the search on a random corpus of USERS users instead; nothing is stored')
+        parser.add_argument('--skills-per-user', type=float, default=5)
+        parser.add_argument('--desires-per-user', type=float, default=3)
+        parser.add_argument('--topics', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['synthetic']:
+            users = options['synthetic']
+            rng = np.random.default_rng(options['seed'])
+            centroids = normalize_rows(
+                rng.standard_normal((options['topics'], settings.SKILL_EMBEDDING_DIM)).astype(np.float32)
+            )
+            # Noise of 0.03 per dimension puts same-topic skills at ~0.7 similarity
+            skills = _clustered_matrix(rng, centroids, int(users * options['skills_per_user']), users, 0.03)
+            desires = _clustered_matrix(rng, centroids, int(users * options['desires_per_user']), users, 0.03)
+        else:
+            skills, desires = load_matching_corpus()
+        if not len(skills) or not len(desires):
+            raise CommandError('Exchange cycles need both skills and desired skills')
+        loaded = time.perf_counter()
+
+        graph = build_teach_graph(
+            skills, desires,
+            threshold=options['threshold'],
+            max_teachers=options['max_teachers'],
+            max_out_degree=options['max_out_degree'],
+            nprobe=None if options['exact'] else options['nprobe'],
+        )
+        built = time.perf_counter()
+        cycles = find_cycles(graph, max_length=options['max_length'], cycles_per_user=options['cycles_per_user'])
+        searched = time.perf_counter()
+
+        self.stdout.write(
+            f'{len(skills)} skills, {len(desires)} desired skills, {len(graph.user_ids)} users: '
+            f'{len(graph)} edges in {built - loaded:.1f}s, {len(cycles)} cycles in {searched - built:.1f}s '
+            f'(loaded in {loaded - start:.1f}s)'
+        )
+        if options['synthetic']:
+            covered = len(np.unique(cycles.members[cycles.members >= 0]))
+            self.stdout.write(f'{covered} users are in at least one cycle; nothing stored')
+            return
+
+        stored = store_exchange_cycles(graph, cycles, skills, desires)
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} exchange cycles in {time.perf_counter() - start:.1f}s'
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.embedding_backends import SentenceTransformerBackend
+from api.utils_safe import ensure_nltk_data, get_model
+
+
+class Command(BaseCommand):
+    help = (
+        'Download and cache the embedding model ahead of time, so that no '
+        'network access happens while serving requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nltk', action='store_true', help='Also download the NLTK data packages')
+        parser.add_argument(
+            '--save-dir', nargs='?', const=settings.SKILL_EMBEDDING_MODEL_DIR,
+            help='Save a local copy of the model for the int8 backend (default: SKILL_EMBEDDING_MODEL_DIR)',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['save_dir']:
+            try:
+                backend = SentenceTransformerBackend(settings.SKILL_EMBEDDING_MODEL)
+                backend.model.save(options['save_dir'])
+            except Exception as e:
+                raise CommandError(f'Could not save the embedding model to {options["save_dir"]}: {e}')
+            self.stdout.write(self.style.SUCCESS(f'Saved {settings.SKILL_EMBEDDING_MODEL} to {options["save_dir"]}'))
+
+        if get_model() is None:
+            raise CommandError(
+                f'Could not load the {settings.SKILL_EMBEDDING_BACKEND} embedding backend for {settings.SKILL_EMBEDDING_MODEL}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Embedding model {settings.SKILL_EMBEDDING_MODEL} ({settings.SKILL_EMBEDDING_BACKEND}) ready in {time.perf_counter() - start:.1f}s'
+        ))
+
+        if options['nltk']:
+            ensure_nltk_data()
+            self.stdout.write(self.style.SUCCESS('NLTK data ready'))
@@ -0,0 +1,38 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.match_recommendations import refresh_skill_matches
+
+
+class Command(BaseCommand):
+    help = (
+        'Precompute the best matches for every saved desired skill (SkillMatch), '
+        'rescoring only what changed since the last refresh'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Rescore every desired skill')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Scoring processes (default: one per CPU)')
+        parser.add_argument('--top-n', type=int, default=None, help='Matches kept per desired skill')
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running and refresh every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            start = time.perf_counter()
+            result = refresh_skill_matches(full=full, workers=options['workers'], top_n=options['top_n'])
+            elapsed = time.perf_counter() - start
+            if result['refreshed'] or result['removed'] or options['interval'] is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{"Full" if result["full"] else "Incremental"} refresh: {result["refreshed"]} of '
+                    f'{result["desired"]} desired skills rescored, {result["stored"]} matches stored, '
+                    f'{result["removed"]} removed in {elapsed:.2f}s'
+                ))
+            if options['interval'] is None:
+                return
+            full = False
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.embedding_server import EmbeddingServer, MicroBatcher
+from api.utils_safe import get_model, warm_up_model
+
+
+class Command(BaseCommand):
+    help = 'Serve skill embeddings to all local web workers from a single model over a Unix socket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.SKILL_EMBEDDING_SERVER_SOCKET,
+                            help='Socket path (default: SKILL_EMBEDDING_SERVER_SOCKET)')
+        parser.add_argument('--window-ms', type=float, default=settings.SKILL_EMBEDDING_BATCH_WINDOW_MS)
+        parser.add_argument('--max-batch', type=int, default=settings.SKILL_EMBEDDING_MAX_BATCH)
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError('No socket path given and SKILL_EMBEDDING_SERVER_SOCKET is not set')
+        if not warm_up_model():
+            raise CommandError(f'Could not load the embedding model {settings.SKILL_EMBEDDING_MODEL}')
+
+        model = get_model()
+        batcher = MicroBatcher(
+            lambda texts: model.encode(texts, batch_size=len(texts)),
+            max_batch=options['max_batch'],
+            window=options['window_ms'] / 1000,
+        )
+        server = EmbeddingServer(options['socket'], batcher)
+        self.stdout.write(self.style.SUCCESS(f'Serving embeddings on {options["socket"]}'))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,69 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.resume_jobs import claim_resume_job, run_resume_job
+
+
+def _ignore_interrupts():
+    # Ctrl-C stops the poller, which then terminates the workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Command(BaseCommand):
+    help = (
+        'Process resume jobs from the database on a pool of worker processes, polling '
+        'for new ones; jobs whose runner died are picked up again after RESUME_JOB_TIMEOUT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.RESUME_JOB_WORKERS,
+                            help='Worker processes, each running one job at a time')
+        parser.add_argument('--poll-seconds', type=float, default=settings.RESUME_JOB_POLL_SECONDS,
+                            help='How long to wait before looking again when no job is runnable')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is runnable instead of polling')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be positive')
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(options['workers'], initializer=_ignore_interrupts)
+        running = []
+        processed = failed = 0
+        try:
+            while True:
+                for job_id, result in running:
+                    if result.ready() and not result.successful():
+                        failed += 1
+                        self._report_failure(job_id, result)
+                running = [(job_id, result) for job_id, result in running if not result.ready()]
+                job_id = claim_resume_job() if len(running) < options['workers'] else None
+                if job_id is not None:
+                    running.append((job_id, pool.apply_async(run_resume_job, (job_id,))))
+                    processed += 1
+                    continue
+                if options['once'] and not running:
+                    break
+                time.sleep(options['poll_seconds'] if len(running) < options['workers'] else 0.1)
+        except KeyboardInterrupt:
+            pool.terminate()
+            self.stdout.write('Stopped; interrupted jobs are picked up again after RESUME_JOB_TIMEOUT')
+        else:
+            pool.close()
+        pool.join()
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Processed {processed} resume jobs, {failed} of them raised'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} resume jobs'))
+
+    def _report_failure(self, job_id, result):
+        try:
+            result.get()
+        except Exception as e:
+            # The job stays processing and is retried after RESUME_JOB_TIMEOUT
+            self.stderr.write(f'Resume job {job_id} raised {type(e).__name__}: {e}')
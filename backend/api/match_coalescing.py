@@ -0,0 +1,141 @@
+"""
+Shared scoring of identical match queries.
+
+Queries are keyed by everything the scores depend on: the normalized desired
+skills, the scoring mode, the proficiency filter and the excluded users
+(the seeker among them). Exclusions are applied while scoring, so that on
+the approximate path excluded users never take up the index shortlist;
+repeated or concurrent requests with the same query and exclusions, such
+as retries and pages fetched in parallel, share one scoring pass.
+
+`SingleFlight` lets the first request for a key compute it while concurrent
+requests for the same key wait for that result instead of scoring again. A
+small LRU (`SharedMatchScores`) keeps finished results for
+SKILL_MATCH_RESULT_TTL seconds and is emptied as soon as the corpus
+generation changes: a new snapshot, new SkillChanges applied by this worker
+or a rebuilt index. Both are per process, like the match page cache.
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Callable, List, Optional
+
+from django.conf import settings
+
+from .embeddings import normalize_skill_text
+from .match_pages import MatchPageCache
+
+
+def normalize_query(desired_skills: List[str]) -> List[str]:
+    """Desired skills in canonical form: normalized texts, deduplicated and
+    sorted, since neither order nor case changes the scores."""
+    return sorted({normalize_skill_text(skill) for skill in desired_skills})
+
+
+def shared_query_key(desired_skills: List[str], mode: str, min_proficiency: Optional[str],
+                     excluded_user_ids=()) -> str:
+    """Identifier of a query's scores (see normalize_query)."""
+    payload = json.dumps([mode, min_proficiency or '', normalize_query(desired_skills),
+                          sorted(excluded_user_ids)])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def corpus_generation(index=None) -> tuple:
+    """Identifies the candidate skills a query scores right now: the index
+    file when `index` is used, else the live snapshot generation and the
+    SkillChanges applied on top of it, else the last SkillChange."""
+    from django.db.models import Max
+
+    from .models import SkillChange
+    from .skill_changes import live_skill_generation
+
+    if index is not None:
+        from .ann_index import skill_index_path
+        try:
+            return ('index', os.stat(skill_index_path()).st_mtime_ns)
+        except OSError:
+            return ('index', id(index))
+    live = live_skill_generation() if settings.SKILL_MATCH_USE_SNAPSHOT else None
+    if live is not None:
+        return ('snapshot',) + live
+    return ('db', SkillChange.objects.aggregate(last=Max('id'))['last'] or 0)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """At most one running computation per key; callers that arrive while it
+    runs wait for it and get the same result (or exception)."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, compute: Callable):
+        """compute() for the first caller of `key`, its result for the rest.
+        Returns (result, shared), `shared` being True for callers that waited."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = compute()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class SharedMatchScores:
+    """Scored queries shared between requests: coalesced while running,
+    cached for `ttl` seconds within one corpus generation."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.results = MatchPageCache(maxsize, ttl)
+        self.flight = SingleFlight()
+        self.generation = None
+        self._lock = threading.Lock()
+
+    def get_or_score(self, key: str, generation, score: Callable):
+        """The scores of `key` in `generation`, computing them with score()
+        only if no other request has or is computing them."""
+        with self._lock:
+            if generation != self.generation:
+                self.results.clear()
+                self.generation = generation
+        scores = self.results.get(key)
+        if scores is not None:
+            return scores
+
+        def compute():
+            scores = score()
+            with self._lock:
+                if generation == self.generation:
+                    self.results.put(key, scores)
+            return scores
+
+        return self.flight.do((generation, key), compute)[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self.results.clear()
+            self.generation = None
+
+
+shared_match_scores = SharedMatchScores(settings.SKILL_MATCH_RESULT_CACHE_SIZE, settings.SKILL_MATCH_RESULT_TTL)
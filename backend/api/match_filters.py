@@ -0,0 +1,134 @@
+"""
+Filters for skill matching, applied to the candidates before any scoring.
+
+A match query can ask for a minimum proficiency level, leave out users the
+seeker already has a connection with (by connection status) and leave out
+explicit user ids. On the database path the filters become part of the Skill
+query; on the snapshot and index paths they become a row mask over the
+candidate skills, so stricter queries score fewer vectors. A snapshot or
+index built without proficiency levels can't apply a proficiency filter;
+callers check `can_filter` and fall back to the database path instead.
+"""
+import logging
+from dataclasses import dataclass
+from typing import FrozenSet, Optional, Set
+
+import numpy as np
+from django.db.models import Q
+
+from .models import Connection, Skill
+
+logger = logging.getLogger(__name__)
+
+PROFICIENCY_LEVELS = [value for value, _ in Skill.PROFICIENCY_CHOICES]
+CONNECTION_STATES = [value for value, _ in Connection.STATUS_CHOICES]
+
+
+def proficiency_rank(level: str) -> int:
+    """Position of a proficiency level, from 0 (beginner) upwards."""
+    try:
+        return PROFICIENCY_LEVELS.index(level)
+    except ValueError:
+        return 0
+
+
+class InvalidFilter(ValueError):
+    """A match filter parameter that could not be parsed."""
+
+
+def _as_list(value):
+    if value in (None, '', False):
+        return []
+    if isinstance(value, str):
+        return [part.strip() for part in value.split(',') if part.strip()]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+
+@dataclass(frozen=True)
+class MatchFilters:
+    min_proficiency: Optional[str] = None
+    exclude_connections: FrozenSet[str] = frozenset()
+    exclude_user_ids: FrozenSet[int] = frozenset()
+
+    @classmethod
+    def from_request_data(cls, data) -> 'MatchFilters':
+        """Parse `min_proficiency`, `exclude_connections` (statuses, or true for
+        all of them) and `exclude_user_ids` from request data."""
+        min_proficiency = data.get('min_proficiency') or None
+        if min_proficiency is not None and min_proficiency not in PROFICIENCY_LEVELS:
+            raise InvalidFilter(f'min_proficiency must be one of {", ".join(PROFICIENCY_LEVELS)}')
+
+        exclude_connections = data.get('exclude_connections')
+        if exclude_connections is True or exclude_connections in ('true', '1'):
+            states = list(CONNECTION_STATES)
+        else:
+            states = _as_list(exclude_connections)
+        unknown = [state for state in states if state not in CONNECTION_STATES]
+        if unknown:
+            raise InvalidFilter(f'exclude_connections must only contain {", ".join(CONNECTION_STATES)}')
+
+        try:
+            user_ids = [int(user_id) for user_id in _as_list(data.get('exclude_user_ids'))]
+        except (TypeError, ValueError):
+            raise InvalidFilter('exclude_user_ids must be a list of user ids')
+
+        return cls(min_proficiency, frozenset(states), frozenset(user_ids))
+
+    @property
+    def min_rank(self) -> int:
+        return proficiency_rank(self.min_proficiency) if self.min_proficiency else 0
+
+    def cache_key(self) -> str:
+        """Canonical form, for caching results per filter combination."""
+        return '|'.join([
+            self.min_proficiency or '',
+            ','.join(sorted(self.exclude_connections)),
+            ','.join(map(str, sorted(self.exclude_user_ids))),
+        ])
+
+    def excluded_user_ids(self, user) -> Set[int]:
+        """The seeker, the explicitly excluded users and, per `exclude_connections`,
+        everyone the seeker has a connection with in one of those states."""
+        excluded = set(self.exclude_user_ids) | {user.id}
+        if self.exclude_connections:
+            connections = Connection.objects.filter(
+                Q(requester=user) | Q(receiver=user), status__in=self.exclude_connections
+            ).values_list('requester_id', 'receiver_id')
+            for requester_id, receiver_id in connections:
+                excluded.add(receiver_id if requester_id == user.id else requester_id)
+        return excluded
+
+    def filter_queryset(self, queryset, excluded_user_ids):
+        """Restrict a Skill queryset to the candidates that pass the filters."""
+        queryset = queryset.exclude(user_id__in=excluded_user_ids)
+        if self.min_rank:
+            queryset = queryset.filter(proficiency_level__in=PROFICIENCY_LEVELS[self.min_rank:])
+        return queryset
+
+    def can_filter(self, matrix) -> bool:
+        """Whether `row_mask` can apply these filters to `matrix`: a proficiency
+        filter needs its levels."""
+        if self.min_rank and matrix.levels is None:
+            logger.warning('Skill matrix has no proficiency levels; rebuild it to filter by proficiency. '
+                           'Filtering in the database instead.')
+            return False
+        return True
+
+    def row_mask(self, matrix, excluded_user_ids) -> Optional[np.ndarray]:
+        """Boolean mask of the candidate rows of a SkillMatrix, or None when the
+        filters only exclude users.
+
+        Excluding a handful of users removes a negligible share of rows, so
+        unless rows are restricted for a proficiency filter anyway, those users
+        are dropped from the ranking instead of copying the candidate matrix.
+        """
+        if not self.min_rank:
+            return None
+        if matrix.levels is None:
+            raise ValueError('skill matrix has no proficiency levels; check can_filter() first')
+        mask = matrix.levels >= self.min_rank
+        if excluded_user_ids:
+            mask &= ~np.isin(matrix.user_ids, list(excluded_user_ids))
+        return mask
@@ -0,0 +1,101 @@
+"""
+Paging for skill match results.
+
+The first page of a match query scores the corpus once and keeps the
+resulting UserScores in a short-lived per-process cache. Later pages are
+requested with an opaque cursor and only select their slice of that ranking.
+If the entry has expired (or the request lands on another worker), the query
+is scored again and the page is served from the same offset.
+
+A cursor is bound to the user and skills of the query that produced it, so
+it can't be replayed against a different query.
+"""
+import base64
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from django.conf import settings
+
+
+class InvalidCursor(ValueError):
+    """A cursor that is malformed or belongs to a different query."""
+
+
+def query_key(user_id: int, desired_skills: List[str], mode: str) -> str:
+    """Stable identifier of a match query."""
+    payload = json.dumps([user_id, mode, list(desired_skills)])
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def encode_cursor(key: str, offset: int) -> str:
+    payload = json.dumps({'q': key, 'o': offset}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, key: str) -> int:
+    """Offset stored in `cursor`. Raises InvalidCursor unless it was issued for `key`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        offset = int(payload['o'])
+        issued_for = payload['q']
+    except (ValueError, TypeError, KeyError, UnicodeEncodeError):
+        raise InvalidCursor('Malformed cursor')
+    if issued_for != key or offset < 0:
+        raise InvalidCursor('Cursor does not belong to this query')
+    return offset
+
+
+class MatchPageCache:
+    """LRU of scored match queries, each kept for `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, scores = entry
+            if time.monotonic() > expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return scores
+
+    def put(self, key: str, scores) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, scores)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+match_page_cache = MatchPageCache(settings.SKILL_MATCH_PAGE_CACHE_SIZE, settings.SKILL_MATCH_PAGE_TTL)
+
+
+def parse_limit(value) -> Optional[int]:
+    """Page size from a request value, or None when it is not a valid size."""
+    if value in (None, ''):
+        return settings.SKILL_MATCH_PAGE_SIZE
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    if not 1 <= limit <= settings.SKILL_MATCH_MAX_PAGE_SIZE:
+        return None
+    return limit
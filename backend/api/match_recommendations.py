@@ -0,0 +1,235 @@
+"""
+Precomputed "recommended for you" matches, stored as SkillMatch rows.
+
+For every saved DesiredSkill, `refresh_skill_matches()` keeps the
+SKILL_RECOMMENDATIONS_PER_SKILL users whose skills are most similar to it
+(a user's score is their best skill, as in live matching). Desired skills are
+scored in chunks across a process pool: workers are forked after the skill
+matrix is loaded, so they share the memory-mapped snapshot instead of loading
+their own copy.
+
+Refreshes are incremental. The state file (SKILL_RECOMMENDATIONS_STATE)
+records the last SkillChange applied and when the refresh ran; the next run
+only rescores desired skills that are new since then, whose stored matches
+include a user whose skills changed, or for which such a user now scores
+above the weakest stored match. Snapshot builds never prune SkillChange
+rows the last refresh hasn't applied.
+"""
+import json
+import multiprocessing
+import os
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .matching import SkillMatrix, normalize_rows, stack_embeddings
+
+
+def read_refresh_state(path=None) -> Optional[dict]:
+    """{change_id, refreshed_at} of the last refresh, or None before the first."""
+    try:
+        with open(path or settings.SKILL_RECOMMENDATIONS_STATE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_refresh_state(state: dict, path=None) -> None:
+    path = str(path or settings.SKILL_RECOMMENDATIONS_STATE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(state, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def load_candidate_skills() -> SkillMatrix:
+    """Every current skill: the live snapshot when there is one, else the Skill table."""
+    from .embedding_snapshot import fetch_skill_arrays
+    from .models import Skill
+    from .skill_changes import get_live_skill_matrix
+
+    matrix = get_live_skill_matrix() if settings.SKILL_MATCH_USE_SNAPSHOT else None
+    if matrix is not None and matrix.dim == settings.SKILL_EMBEDDING_DIM:
+        return matrix
+    _, user_ids, names, vectors, levels = fetch_skill_arrays(Skill.objects.all())
+    return SkillMatrix(user_ids, names.tolist(), vectors, levels)
+
+
+def top_providers(skills: SkillMatrix, queries: np.ndarray, seeker_ids: np.ndarray, top_n: int):
+    """For each normalized query row, the `top_n` users with the best positive
+    similarity, leaving out the query's seeker.
+
+    Returns (query_rows, provider_ids, scores), best first within each query.
+    """
+    order, starts, _, _ = skills.grouping
+    group_users = skills.user_ids[order[starts]]
+    per_user = np.maximum.reduceat(skills.similarities(queries)[:, order], starts, axis=1)
+    # Tombstoned rows (see api.skill_changes) and the seeker never match
+    per_user[:, group_users < 0] = -np.inf
+    per_user[group_users[None, :] == seeker_ids[:, None]] = -np.inf
+
+    k = min(top_n, per_user.shape[1])
+    if k < per_user.shape[1]:
+        top = np.argpartition(-per_user, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(per_user.shape[1]), per_user.shape)
+    top_scores = np.take_along_axis(per_user, top, axis=1)
+    rank = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, rank, axis=1)
+    top_scores = np.take_along_axis(top_scores, rank, axis=1)
+    rows, cols = np.nonzero(top_scores > 0.0)
+    return rows, group_users[top[rows, cols]], top_scores[rows, cols]
+
+
+# Set in the parent before the pool forks, so workers inherit it
+_pool_state = None
+
+
+def _score_desires(rows: np.ndarray) -> List[tuple]:
+    skills, desires, top_n = _pool_state
+    query_rows, providers, scores = top_providers(
+        skills, desires.vectors[rows], desires.user_ids[rows], top_n
+    )
+    return [
+        (int(desires.user_ids[rows[q]]), desires.names[rows[q]], int(provider), float(score))
+        for q, provider, score in zip(query_rows, providers, scores)
+    ]
+
+
+def score_desires(skills: SkillMatrix, desires: SkillMatrix, rows, top_n: int,
+                  workers: int = 1, chunk_size: int = 64) -> List[tuple]:
+    """(seeker_id, desired_skill, provider_id, score) rows for the given desire rows."""
+    global _pool_state
+    rows = np.asarray(rows, dtype=np.int64)
+    chunks = [rows[start:start + chunk_size] for start in range(0, len(rows), chunk_size)]
+    _pool_state = (skills, desires, top_n)
+    try:
+        if workers <= 1 or len(chunks) <= 1:
+            return [match for chunk in chunks for match in _score_desires(chunk)]
+        from django.db import connections
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return [match for part in pool.imap_unordered(_score_desires, chunks) for match in part]
+    finally:
+        _pool_state = None
+
+
+def _changed_users(state: dict):
+    """Users whose skills changed since the refresh recorded in `state`."""
+    from .models import Skill, SkillChange
+
+    users = set(SkillChange.objects.filter(id__gt=state['change_id']).values_list('user_id', flat=True))
+    since = datetime.fromisoformat(state['refreshed_at'])
+    users.update(Skill.objects.filter(updated_at__gte=since).values_list('user_id', flat=True))
+    return users
+
+
+def _rows_to_refresh(skills: SkillMatrix, desires: SkillMatrix, desire_created, state: dict, top_n: int):
+    """Desire rows whose stored matches may be out of date."""
+    from django.db.models import Count, Min
+
+    from .models import SkillMatch
+
+    since = datetime.fromisoformat(state['refreshed_at'])
+    refresh = np.array([created >= since for created in desire_created], dtype=bool)
+    changed = _changed_users(state)
+    if not changed:
+        return np.flatnonzero(refresh)
+
+    row_of = {(int(user_id), name): row for row, (user_id, name) in enumerate(zip(desires.user_ids, desires.names))}
+    changed = list(changed)
+    # Stored matches that include a changed user
+    for start in range(0, len(changed), 500):
+        for seeker_id, name in SkillMatch.objects.filter(provider_id__in=changed[start:start + 500]).values_list(
+            'seeker_id', 'desired_skill'
+        ).iterator():
+            row = row_of.get((seeker_id, name))
+            if row is not None:
+                refresh[row] = True
+
+    # Would a changed user now enter the stored matches? Only positive scores are stored.
+    best = np.full(len(desires), -np.inf)
+    changed_rows = np.flatnonzero(np.isin(skills.user_ids, changed))
+    if len(changed_rows):
+        changed_skills = skills.subset(changed_rows)
+        for start in range(0, len(desires), 1024):
+            stop = min(start + 1024, len(desires))
+            sims = changed_skills.similarities(desires.vectors[start:stop])
+            sims[changed_skills.user_ids[None, :] == desires.user_ids[start:stop, None]] = -np.inf
+            best[start:stop] = sims.max(axis=1)
+    candidate = (best > 0.0) & ~refresh
+    if not candidate.any():
+        return np.flatnonzero(refresh)
+
+    # Compare against the weakest stored match, read only for those seekers
+    # (a desire with fewer than top_n matches has room for anyone)
+    refresh |= candidate
+    seekers = np.unique(desires.user_ids[candidate]).tolist()
+    for start in range(0, len(seekers), 500):
+        for seeker_id, name, weakest, count in SkillMatch.objects.filter(
+            seeker_id__in=seekers[start:start + 500]
+        ).order_by().values('seeker_id', 'desired_skill').annotate(
+            weakest=Min('similarity_score'), count=Count('id')
+        ).values_list('seeker_id', 'desired_skill', 'weakest', 'count'):
+            row = row_of.get((seeker_id, name))
+            if row is not None and candidate[row] and count >= top_n and best[row] <= weakest:
+                refresh[row] = False
+    return np.flatnonzero(refresh)
+
+
+def refresh_skill_matches(full: bool = False, workers: int = 1, top_n: Optional[int] = None) -> dict:
+    """Bring the stored SkillMatch rows up to date.
+
+    Returns a summary: {desired, refreshed, stored, removed, full}.
+    """
+    from django.db import transaction
+    from django.db.models import Exists, Max, OuterRef, Q
+
+    from .embeddings import embedding_rows
+    from .models import DesiredSkill, SkillChange, SkillMatch
+
+    top_n = top_n or settings.SKILL_RECOMMENDATIONS_PER_SKILL
+    state = None if full else read_refresh_state()
+    # Read before scoring, so changes made while scoring are picked up next time
+    next_state = {
+        'change_id': SkillChange.objects.aggregate(last=Max('id'))['last'] or 0,
+        'refreshed_at': timezone.now().isoformat(),
+    }
+
+    skills = load_candidate_skills()
+    rows = embedding_rows(DesiredSkill.objects.order_by('id'), 'user_id', 'name', 'created_at')
+    desires = SkillMatrix(
+        [row[0] for row in rows],
+        [row[1] for row in rows],
+        normalize_rows(stack_embeddings([row[3] for row in rows], dim=settings.SKILL_EMBEDDING_DIM)),
+    )
+    if state is None:
+        refresh = np.arange(len(desires))
+    else:
+        refresh = _rows_to_refresh(skills, desires, [row[2] for row in rows], state, top_n)
+    matches = score_desires(skills, desires, refresh, top_n, workers=workers) if len(skills) else []
+
+    with transaction.atomic():
+        if state is None:
+            SkillMatch.objects.all().delete()
+        else:
+            # Matches of desired skills that were removed
+            removed = SkillMatch.objects.exclude(Exists(DesiredSkill.objects.filter(
+                user_id=OuterRef('seeker_id'), name=OuterRef('desired_skill')
+            ))).delete()[0]
+            pairs = [(int(desires.user_ids[row]), desires.names[row]) for row in refresh]
+            for start in range(0, len(pairs), 500):
+                query = Q()
+                for seeker_id, name in pairs[start:start + 500]:
+                    query |= Q(seeker_id=seeker_id, desired_skill=name)
+                SkillMatch.objects.filter(query).delete()
+        SkillMatch.objects.bulk_create([
+            SkillMatch(seeker_id=seeker_id, provider_id=provider_id, desired_skill=name, similarity_score=score)
+            for seeker_id, name, provider_id, score in matches
+        ], batch_size=1000)
+    _write_refresh_state(next_state)
+    return {'desired': len(desires), 'refreshed': len(refresh), 'stored': len(matches),
+            'removed': 0 if state is None else removed, 'full': state is None}
@@ -0,0 +1,304 @@
+"""
+Vectorized scoring engine for skill matching.
+
+Candidate skill embeddings are stacked into a single L2-normalized float32
+matrix so that every desired skill is scored against the whole corpus with one
+matrix product, instead of one sklearn call per (skill, desired skill) pair.
+"""
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .embeddings import decode_embedding
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize each row of `vectors` in place. All-zero rows stay zero."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def stack_embeddings(embeddings: Sequence, dim: Optional[int] = None) -> np.ndarray:
+    """Stack embeddings into an (n, dim) float32 matrix.
+
+    Embeddings may be float sequences or stored float32 bytes. Missing
+    embeddings (None or empty) and embeddings whose length differs from `dim`
+    become zero rows, which score 0.0 against everything - the same result
+    `calculate_skill_similarity` gives for a missing embedding.
+    """
+    embeddings = [
+        decode_embedding(e) if isinstance(e, (bytes, bytearray, memoryview)) else e
+        for e in embeddings
+    ]
+    if dim is None:
+        dim = next((len(e) for e in embeddings if e is not None and len(e)), 0)
+    matrix = np.zeros((len(embeddings), dim), dtype=np.float32)
+    for i, embedding in enumerate(embeddings):
+        if embedding is not None and len(embedding) == dim and dim:
+            matrix[i] = embedding
+    return matrix
+
+
+class SkillMatrix:
+    """Candidate skills as parallel arrays plus a normalized embedding matrix.
+
+    `levels`, when known, holds each skill's proficiency rank (see
+    api.match_filters) so candidates can be filtered before scoring.
+    """
+
+    def __init__(self, user_ids, names: List[str], vectors: np.ndarray, levels=None):
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.names = list(names)
+        self.vectors = vectors
+        self.levels = None if levels is None else np.asarray(levels, dtype=np.int8)
+        self._grouping = None
+
+    @classmethod
+    def from_rows(cls, rows) -> 'SkillMatrix':
+        """Build from (user_id, skill_name, embedding) rows."""
+        rows = list(rows)
+        vectors = stack_embeddings([row[2] for row in rows])
+        return cls(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            normalize_rows(vectors),
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    def subset(self, rows) -> 'SkillMatrix':
+        """A new SkillMatrix holding only the given row indices, in that order."""
+        rows = np.asarray(rows, dtype=np.int64)
+        levels = None if self.levels is None else self.levels[rows]
+        return SkillMatrix(self.user_ids[rows], [self.names[i] for i in rows], self.vectors_for(rows), levels)
+
+    def vectors_for(self, rows) -> np.ndarray:
+        """Normalized vectors of the given row indices, as a (len(rows), dim) array."""
+        return self.vectors[rows]
+
+    @property
+    def grouping(self):
+        """group_rows_by_user(self.user_ids), computed once per matrix."""
+        if self._grouping is None:
+            self._grouping = group_rows_by_user(self.user_ids)
+        return self._grouping
+
+    def similarities(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of each normalized query row against every candidate.
+
+        Returns a (n_queries, n_candidates) float32 matrix.
+        """
+        return queries @ self.vectors.T
+
+
+def group_rows_by_user(user_ids: np.ndarray):
+    """Group candidate rows by user.
+
+    Returns (order, starts, counts, first_seen): `order` sorts rows so each
+    user's rows are contiguous, `starts`/`counts` delimit each user's slice of
+    `order`, and `first_seen` is the row index where each user first appears.
+    """
+    _, first_seen, inverse, counts = np.unique(
+        user_ids, return_index=True, return_inverse=True, return_counts=True
+    )
+    order = np.argsort(inverse, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return order, starts, counts, first_seen
+
+
+def top_order(scores: np.ndarray, tiebreak: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """Indices of the `k` best entries, by descending score then ascending
+    `tiebreak`, found by partial selection instead of a full sort.
+
+    np.partition finds the k-th best score in linear time; only entries at
+    least that good (k plus any ties at the boundary) are then sorted.
+    """
+    n = len(scores)
+    if k is not None and k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k is None or k >= n:
+        candidates = np.arange(n)
+    else:
+        threshold = np.partition(-scores, k - 1)[k - 1]
+        candidates = np.flatnonzero(-scores <= threshold)
+    ranked = candidates[np.lexsort((tiebreak[candidates], -scores[candidates]))]
+    return ranked if k is None else ranked[:k]
+
+
+class UserScores:
+    """Per-user scores of one query against a SkillMatrix.
+
+    Scoring happens once, in the constructor; `page` then only has to select
+    and format the requested slice of the ranking, so successive pages of the
+    same query don't rescore the corpus. Only per-user scores and the user
+    grouping are retained, not the query-by-skill similarity matrix: `page`
+    recomputes similarities for the rows of the users it returns, reading
+    their vectors through `matrix.vectors_for`.
+
+    A user's score for one desired skill is the best similarity among their
+    skills (never below 0.0); the overall `match_score` is the mean over the
+    desired skills. `matching_skills` lists the user's skills with a positive
+    similarity to, or the same name as, any desired skill. Ties keep the
+    order in which users first appear in the matrix.
+
+    Skills without a comparable embedding (missing, or still from another
+    model while api.embedding_backfill catches up) are zero rows; they score
+    1.0 against a desired skill of the same name, as in find_matching_users,
+    instead of dropping out of the ranking.
+    """
+
+    def __init__(self, matrix: SkillMatrix, desired_skills: List[str], desired_embeddings: Sequence,
+                 exclude_user_ids=()):
+        self.user_ids = matrix.user_ids
+        self.names = matrix.names
+        self.desired_names = {s.lower() for s in desired_skills if isinstance(s, str)}
+        self.matrix = matrix
+        if len(matrix) == 0:
+            self.queries = np.zeros((0, 0), dtype=np.float32)
+            self.order = self.starts = self.counts = np.empty(0, dtype=np.int64)
+            self.scores = np.empty(0, dtype=np.float64)
+            self.appearance = np.empty(0, dtype=np.int64)
+            return
+
+        self.queries = normalize_rows(stack_embeddings(desired_embeddings, dim=matrix.dim))
+        sims = matrix.similarities(self.queries)
+        self._match_by_name(sims, desired_skills)
+
+        self.order, self.starts, self.counts, first_seen = matrix.grouping
+        if len(desired_skills):
+            per_skill = np.maximum.reduceat(sims[:, self.order], self.starts, axis=1)
+            np.maximum(per_skill, 0.0, out=per_skill)
+            self.scores = per_skill.mean(axis=0, dtype=np.float64)
+        else:
+            self.scores = np.zeros(len(self.starts), dtype=np.float64)
+        self.appearance = first_seen
+
+        # Drop whole users, e.g. the one asking, from the ranking. Negative
+        # user ids mark tombstoned rows (see api.skill_changes).
+        group_users = matrix.user_ids[self.order[self.starts]]
+        keep = group_users >= 0
+        if len(exclude_user_ids):
+            keep &= ~np.isin(group_users, list(exclude_user_ids))
+        if not keep.all():
+            self._keep_groups(keep)
+
+    def _match_by_name(self, sims: np.ndarray, desired_skills: List[str]) -> None:
+        embedded = self.queries.any(axis=1)
+        if not embedded.any():
+            return
+        # Only a zero row scores exactly 0.0 against every embedded query
+        rows = np.flatnonzero(~sims[embedded].any(axis=0))
+        wanted = {}
+        for q, name in enumerate(desired_skills):
+            if isinstance(name, str):
+                wanted.setdefault(name.lower(), []).append(q)
+        for row in rows:
+            name = self.names[row]
+            for q in (wanted.get(name.lower(), ()) if isinstance(name, str) else ()):
+                sims[q, row] = 1.0
+
+    def __len__(self) -> int:
+        """Number of distinct users."""
+        return len(self.scores)
+
+    def _keep_groups(self, keep: np.ndarray) -> None:
+        self.starts, self.counts = self.starts[keep], self.counts[keep]
+        self.scores, self.appearance = self.scores[keep], self.appearance[keep]
+
+    def page(self, offset: int = 0, limit: Optional[int] = 10) -> List[dict]:
+        """Users ranked offset..offset+limit, as dicts with user_id, match_score
+        and matching_skills. `limit=None` returns the rest of the ranking."""
+        k = None if limit is None else offset + limit
+        return [self._result(group) for group in top_order(self.scores, self.appearance, k)[offset:]]
+
+    def _result(self, group: int) -> dict:
+        rows = self.order[self.starts[group]:self.starts[group] + self.counts[group]]
+        # Zero rows matched by name are covered by the desired_names check
+        relevant = (self.queries @ self.matrix.vectors_for(rows).T > 0.0).any(axis=0)
+        names = set()
+        for row, is_relevant in zip(rows, relevant):
+            name = self.names[row]
+            if is_relevant or (name and name.lower() in self.desired_names):
+                names.add(name)
+        return {
+            'user_id': int(self.user_ids[rows[0]]),
+            'match_score': float(self.scores[group]),
+            'matching_skills': sorted(names),
+        }
+
+
+def rank_users(matrix: SkillMatrix, desired_skills: List[str], desired_embeddings: Sequence,
+               limit: Optional[int] = 10) -> List[dict]:
+    """Rank the users in `matrix` against a list of desired skills (see UserScores)."""
+    return UserScores(matrix, desired_skills, desired_embeddings).page(0, limit)
+
+
+class ReciprocalScores(UserScores):
+    """Scores for a skill swap: how well each user can teach the seeker what
+    they want to learn, and how well the seeker can teach them in return.
+
+    `teaches_me` is the UserScores score of the user's skills against the
+    seeker's wanted skills. `learns_from_me` is, averaged over the user's
+    desired skills, the best similarity (never below 0.0) to any skill the
+    seeker offers; users without desired skills get 0.0. Both sides are
+    computed in the same pass over the candidates, and `match_score` is
+    `weight * teaches_me + (1 - weight) * learns_from_me`.
+    """
+
+    def __init__(self, skills: SkillMatrix, desires: SkillMatrix, wanted_skills: List[str],
+                 wanted_embeddings: Sequence, offered_skills: List[str], offered_embeddings: Sequence,
+                 exclude_user_ids=(), weight: float = 0.5):
+        super().__init__(skills, wanted_skills, wanted_embeddings, exclude_user_ids)
+        self.desires = desires
+        self.offered_names = {s.lower() for s in offered_skills if isinstance(s, str)}
+        group_users = skills.user_ids[self.order[self.starts]] if len(skills) else np.empty(0, dtype=np.int64)
+
+        self.learn_scores = np.zeros(len(self.scores), dtype=np.float64)
+        self.desire_group = np.full(len(self.scores), -1, dtype=np.int64)
+        if len(desires) and len(offered_skills):
+            self.offers = normalize_rows(stack_embeddings(offered_embeddings, dim=desires.dim))
+            # Best similarity of each desired skill to anything the seeker offers
+            desire_best = np.maximum(desires.similarities(self.offers).max(axis=0), 0.0)
+        else:
+            self.offers = None
+            desire_best = np.zeros(len(desires), dtype=np.float32)
+        if len(desires):
+            order, starts, counts, _ = desires.grouping
+            per_user = np.add.reduceat(desire_best[order].astype(np.float64), starts) / counts
+            desire_users = desires.user_ids[order[starts]]
+            position = np.searchsorted(desire_users, group_users)
+            found = position < len(desire_users)
+            found[found] = desire_users[position[found]] == group_users[found]
+            self.desire_group[found] = position[found]
+            self.learn_scores[found] = per_user[position[found]]
+
+        self.teach_scores = self.scores
+        self.scores = weight * self.teach_scores + (1.0 - weight) * self.learn_scores
+
+    def _desire_best(self, rows: np.ndarray) -> np.ndarray:
+        """desire_best of the constructor, recomputed for these desire rows only."""
+        if self.offers is None:
+            return np.zeros(len(rows), dtype=np.float32)
+        return np.maximum((self.offers @ self.desires.vectors_for(rows).T).max(axis=0), 0.0)
+
+    def _result(self, group: int) -> dict:
+        result = super()._result(group)
+        wanted = []
+        desire_group = self.desire_group[group]
+        if desire_group >= 0:
+            order, starts, counts, _ = self.desires.grouping
+            rows = order[starts[desire_group]:starts[desire_group] + counts[desire_group]]
+            for row, best in zip(rows, self._desire_best(rows)):
+                name = self.desires.names[row]
+                if best > 0.0 or (name and name.lower() in self.offered_names):
+                    wanted.append(name)
+        result['teaches_me_score'] = float(self.teach_scores[group])
+        result['learns_from_me_score'] = float(self.learn_scores[group])
+        result['skills_they_want'] = sorted(set(wanted))
+        return result
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+import numpy as np
+from django.db import migrations, models
+
+EMBEDDING_MODEL = 'paraphrase-MiniLM-L6-v2'
+
+
+def json_to_binary(apps, schema_editor):
+    Skill = apps.get_model('api', 'Skill')
+    batch = []
+    for skill in Skill.objects.exclude(embedding=None).only('id', 'embedding').iterator(chunk_size=2000):
+        if not skill.embedding:
+            continue
+        skill.embedding_blob = np.asarray(skill.embedding, dtype='<f4').tobytes()
+        skill.embedding_dim = len(skill.embedding)
+        skill.embedding_model = EMBEDDING_MODEL
+        batch.append(skill)
+        if len(batch) >= 2000:
+            Skill.objects.bulk_update(batch, ['embedding_blob', 'embedding_dim', 'embedding_model'])
+            batch = []
+    Skill.objects.bulk_update(batch, ['embedding_blob', 'embedding_dim', 'embedding_model'])
+
+
+def binary_to_json(apps, schema_editor):
+    Skill = apps.get_model('api', 'Skill')
+    batch = []
+    for skill in Skill.objects.exclude(embedding_blob=None).only('id', 'embedding_blob').iterator(chunk_size=2000):
+        skill.embedding = np.frombuffer(skill.embedding_blob, dtype='<f4').tolist()
+        batch.append(skill)
+        if len(batch) >= 2000:
+            Skill.objects.bulk_update(batch, ['embedding'])
+            batch = []
+    Skill.objects.bulk_update(batch, ['embedding'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_remove_userprofile_profile_picture_dailylogin'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skill',
+            name='embedding_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='embedding_dim',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='skill',
+            name='embedding_model',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_skill_embedding_binary'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='skill',
+            name='embedding',
+        ),
+        migrations.RenameField(
+            model_name='skill',
+            old_name='embedding_blob',
+            new_name='embedding',
+        ),
+    ]
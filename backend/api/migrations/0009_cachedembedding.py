@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_remove_skill_json_embedding'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedEmbedding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=255)),
+                ('model', models.CharField(max_length=100)),
+                ('embedding', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('text', 'model')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_resumejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='original_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='resume',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.CreateModel(
+            name='CachedResumeExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('extractor_version', models.PositiveSmallIntegerField()),
+                ('skills', models.JSONField(default=list)),
+                ('text_length', models.PositiveIntegerField(default=0)),
+                ('pages_read', models.PositiveIntegerField(default=0)),
+                ('total_pages', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('sha256', 'extractor_version')},
+            },
+        ),
+    ]
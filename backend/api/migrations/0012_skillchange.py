@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_resume_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skill_id', models.BigIntegerField(blank=True, null=True)),
+                ('user_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Created or updated'), ('delete', 'Deleted'), ('delete_user', 'User deleted')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 05:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_skillchange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['proficiency_level'], name='api_skill_profici_7d3837_idx'),
+        ),
+    ]
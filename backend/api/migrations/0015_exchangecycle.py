@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_desiredskill'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField(db_index=True)),
+                ('steps', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-score'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExchangeCycleMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='api.exchangecycle')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exchange_cycles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-score'], name='api_exchang_user_id_0edf41_idx')],
+                'unique_together': {('cycle', 'user')},
+            },
+        ),
+    ]
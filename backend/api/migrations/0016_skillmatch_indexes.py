@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 06:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_exchangecycle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='skillmatch',
+            index=models.Index(fields=['seeker', '-similarity_score'], name='api_skillma_seeker__e01774_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skillmatch',
+            index=models.Index(fields=['seeker', 'desired_skill'], name='api_skillma_seeker__c52f43_idx'),
+        ),
+    ]
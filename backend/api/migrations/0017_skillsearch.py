@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_skillmatch_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.CharField(max_length=255, unique=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('last_searched_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-count'], name='api_skillse_count_7c54e9_idx')],
+            },
+        ),
+    ]
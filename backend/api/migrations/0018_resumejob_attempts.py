@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_skillsearch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumejob',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='resumejob',
+            index=models.Index(fields=['status', 'created_at'], name='api_resumej_status_640c28_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_resumejob_attempts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='desiredskill',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
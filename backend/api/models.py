@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 class UserProfile(models.Model):
@@ -36,20 +36,123 @@ class Skill(models.Model):
         choices=PROFICIENCY_CHOICES,
         default='beginner'
     )
-    # Store the BERT embedding as a JSON array
-    embedding = models.JSONField(null=True, blank=True)
+    # BERT embedding as raw float32 bytes (see api.embeddings), tagged with
+    # its dimension and the model that produced it
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dim = models.PositiveSmallIntegerField(default=0)
+    embedding_model = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['user', 'name']
+        indexes = [models.Index(fields=['proficiency_level'])]
 
     def __str__(self):
         return f"{self.name} - {self.user.username}"
 
+class CachedEmbedding(models.Model):
+    """Embedding of a normalized skill text, shared by every user and request"""
+    text = models.CharField(max_length=255)
+    model = models.CharField(max_length=100)
+    embedding = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('text', 'model')
+
+    def __str__(self):
+        return f"{self.text} ({self.model})"
+
+class DesiredSkill(models.Model):
+    """A skill a user wants to learn, used for reciprocal (skill swap) matching"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='desired_skills')
+    name = models.CharField(max_length=100)
+    # Stored like Skill.embedding
+    embedding = models.BinaryField(null=True, blank=True)
+    embedding_dim = models.PositiveSmallIntegerField(default=0)
+    embedding_model = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Indexed so workers can cheaply find rows changed since their last read
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        unique_together = ['user', 'name']
+
+    def __str__(self):
+        return f"{self.user.username} wants to learn {self.name}"
+
+
+class ExchangeCycle(models.Model):
+    """A multi-party skill exchange found by api.exchange_cycles: each step's
+    teacher teaches the learner one of the skills the learner wants."""
+    length = models.PositiveSmallIntegerField()
+    # Similarity of the weakest step
+    score = models.FloatField(db_index=True)
+    # [{teacher_id, learner_id, skill, desired_skill, similarity}, ...]
+    steps = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-score']
+
+    def __str__(self):
+        return f"{self.length}-way exchange ({self.score:.2f})"
+
+
+class ExchangeCycleMember(models.Model):
+    cycle = models.ForeignKey(ExchangeCycle, on_delete=models.CASCADE, related_name='members')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='exchange_cycles')
+    # Copy of cycle.score, so a user's best cycles are one index scan
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('cycle', 'user')
+        indexes = [models.Index(fields=['user', '-score'])]
+
+    def __str__(self):
+        return f"{self.user.username} in {self.cycle}"
+
+
+class SkillChange(models.Model):
+    """Append-only log of Skill changes, replayed by api.skill_changes to keep
+    in-memory matching structures current. Ids are not foreign keys since the
+    rows outlive deleted skills and users."""
+    ACTION_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+        ('delete_user', 'User deleted'),
+    ]
+
+    skill_id = models.BigIntegerField(null=True, blank=True)
+    user_id = models.BigIntegerField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.action} skill {self.skill_id} of user {self.user_id}"
+
+
+class SkillSearch(models.Model):
+    """How often a normalized skill text was searched for, counted by
+    api.skill_searches; used to re-embed popular skills first."""
+    text = models.CharField(max_length=255, unique=True)
+    count = models.PositiveIntegerField(default=0)
+    last_searched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-count'])]
+
+    def __str__(self):
+        return f"{self.text} ({self.count} searches)"
+
+
 class Resume(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='resume')
     file = models.FileField(upload_to='resumes/')
+    # Files are stored by content hash (see api.resume_storage)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    original_name = models.CharField(max_length=255, blank=True)
     processed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -57,6 +160,49 @@ class Resume(models.Model):
     def __str__(self):
         return f"{self.user.username}'s resume"
 
+class CachedResumeExtraction(models.Model):
+    """Skills extracted from a resume file, keyed by its content hash"""
+    sha256 = models.CharField(max_length=64)
+    extractor_version = models.PositiveSmallIntegerField()
+    skills = models.JSONField(default=list)
+    text_length = models.PositiveIntegerField(default=0)
+    pages_read = models.PositiveIntegerField(default=0)
+    total_pages = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('sha256', 'extractor_version')
+
+    def __str__(self):
+        return f"{self.sha256[:12]} (v{self.extractor_version}, {len(self.skills)} skills)"
+
+class ResumeJob(models.Model):
+    """Background processing of an uploaded resume, polled by the client"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resume_jobs')
+    resume = models.ForeignKey(Resume, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    # Times a runner claimed the job; reclaimed jobs count again
+    attempts = models.PositiveSmallIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        # Runners look for the oldest runnable job
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.user.username}'s resume job ({self.status})"
+
 class SkillMatch(models.Model):
     seeker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='skill_matches_as_seeker')
     provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='skill_matches_as_provider')
@@ -66,6 +212,11 @@ class SkillMatch(models.Model):
 
     class Meta:
         ordering = ['-similarity_score']
+        # Rows are written by api.match_recommendations and read per seeker
+        indexes = [
+            models.Index(fields=['seeker', '-similarity_score']),
+            models.Index(fields=['seeker', 'desired_skill']),
+        ]
 
     def __str__(self):
         return f"{self.seeker.username} -> {self.provider.username} ({self.desired_skill})"
@@ -122,4 +273,19 @@ class DailyLogin(models.Model):
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+@receiver(post_save, sender=Skill)
+def log_skill_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        SkillChange.objects.create(skill_id=instance.id, user_id=instance.user_id, action='upsert')
+
+
+@receiver(post_delete, sender=Skill)
+def log_skill_deleted(sender, instance, **kwargs):
+    SkillChange.objects.create(skill_id=instance.id, user_id=instance.user_id, action='delete')
+
+
+@receiver(post_delete, sender=User)
+def log_user_deleted(sender, instance, **kwargs):
+    SkillChange.objects.create(user_id=instance.id, action='delete_user')
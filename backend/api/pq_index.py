@@ -0,0 +1,210 @@
+"""
+Product-quantized skill index for corpora too large to keep as float32.
+
+`PQIndex` keeps the coarse lists of an IVF index (api.ann_index) and, for
+every skill, only `m` one-byte codes: the residual between the embedding and
+its list centroid is split into `m` sub-vectors and each is replaced by the
+nearest of 256 trained sub-centroids. With the default m=48 that is 48 bytes
+per skill instead of 1536.
+
+A query is scored against the codes with asymmetric distance computation:
+the query itself is not quantized; one (m, 256) table of sub-vector dot
+products turns each skill's approximate similarity into m table lookups.
+The best `rerank` x k candidates are then re-scored exactly against the
+full-precision vectors, which stay in a .npy file opened with
+`mmap_mode='r'`, so only the re-ranked rows are ever paged in.
+
+Built with `python manage.py build_skill_index --type pq` and loaded by
+`get_skill_index()` when SKILL_INDEX_TYPE = 'pq'.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+
+from .ann_index import IVFIndex, _top_k
+from .matching import SkillMatrix
+
+CODEBOOK_SIZE = 256
+
+
+def vectors_path(path) -> str:
+    """Where the full-precision vectors of the index saved at `path` live."""
+    path = str(path)
+    return f'{path[:-4] if path.endswith(".npz") else path}.vectors.npy'
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (Euclidean) of every row."""
+    return np.argmin((centroids * centroids).sum(axis=1) - 2 * vectors @ centroids.T, axis=1)
+
+
+def train_codebooks(residuals: np.ndarray, m: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """k-means codebooks, one per sub-space: an (m, 256, dim // m) array."""
+    rng = np.random.default_rng(seed)
+    dsub = residuals.shape[1] // m
+    ksub = min(CODEBOOK_SIZE, len(residuals))
+    codebooks = np.zeros((m, CODEBOOK_SIZE, dsub), dtype=np.float32)
+    for sub in range(m):
+        data = residuals[:, sub * dsub:(sub + 1) * dsub]
+        centroids = data[rng.choice(len(data), size=ksub, replace=False)].copy()
+        for _ in range(iterations):
+            labels = _nearest(data, centroids)
+            sums = np.stack([np.bincount(labels, weights=data[:, d], minlength=ksub) for d in range(dsub)], axis=1)
+            counts = np.bincount(labels, minlength=ksub)
+            empty = counts == 0
+            # Restart empty clusters from random points
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()))]
+            counts[empty] = 1
+            centroids = sums / counts[:, None]
+        codebooks[sub, :ksub] = centroids
+        codebooks[sub, ksub:] = np.inf
+    return codebooks
+
+
+def encode(residuals: np.ndarray, codebooks: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """(n, m) uint8 codes of `residuals`."""
+    m, _, dsub = codebooks.shape
+    codes = np.empty((len(residuals), m), dtype=np.uint8)
+    for start in range(0, len(residuals), chunk_size):
+        chunk = residuals[start:start + chunk_size]
+        for sub in range(m):
+            books = codebooks[sub][np.isfinite(codebooks[sub, :, 0])]
+            codes[start:start + chunk_size, sub] = _nearest(chunk[:, sub * dsub:(sub + 1) * dsub], books)
+    return codes
+
+
+class PQIndex:
+    """IVF lists of product-quantized residuals, re-ranked with exact vectors.
+
+    `list_codes` holds the codes of `list_rows`, in the same (list) order, so
+    each probed list is one contiguous slice. `matrix.vectors` may be a
+    memory map; it is only read for re-ranking.
+    """
+    # Embedding model of the indexed vectors, set by build_skill_index()
+    model_id = ''
+
+    def __init__(self, matrix: SkillMatrix, skill_ids, centroids: np.ndarray, list_rows: np.ndarray,
+                 list_offsets: np.ndarray, codebooks: np.ndarray, list_codes: np.ndarray, rerank: int = 8):
+        self.matrix = matrix
+        self.skill_ids = np.asarray(skill_ids, dtype=np.int64)
+        self.centroids = centroids
+        self.list_rows = list_rows
+        self.list_offsets = list_offsets
+        self.codebooks = codebooks
+        self.list_codes = list_codes
+        self.rerank = rerank
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def m(self) -> int:
+        return self.codebooks.shape[0]
+
+    def bytes_per_vector(self) -> float:
+        """Resident bytes per skill: its codes and list entry, not counting the
+        memory-mapped full vectors or the per-skill metadata every index keeps."""
+        if not len(self):
+            return 0.0
+        shared = self.centroids.nbytes + self.codebooks.nbytes + self.list_offsets.nbytes
+        return (self.list_codes.nbytes + self.list_rows.nbytes + shared) / len(self)
+
+    @classmethod
+    def build(cls, matrix: SkillMatrix, skill_ids, nlist: Optional[int] = None, m: int = 48,
+              train_size: int = 32768, iterations: int = 10, seed: int = 0) -> 'PQIndex':
+        """Cluster `matrix` into IVF lists and quantize every residual."""
+        if matrix.dim % m:
+            raise ValueError(f'Embedding dimension {matrix.dim} is not divisible by m={m}')
+        ivf = IVFIndex.build(matrix, skill_ids, nlist=nlist, seed=seed)
+        if not len(matrix):
+            return cls(matrix, skill_ids, ivf.centroids, ivf.list_rows, ivf.list_offsets,
+                       np.zeros((m, CODEBOOK_SIZE, matrix.dim // m), dtype=np.float32),
+                       np.empty((0, m), dtype=np.uint8))
+
+        labels = np.repeat(np.arange(ivf.nlist), np.diff(ivf.list_offsets))
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(len(matrix), size=min(train_size, len(matrix)), replace=False))
+        row_labels = np.empty(len(matrix), dtype=np.int64)
+        row_labels[ivf.list_rows] = labels
+        residuals = matrix.vectors[sample] - ivf.centroids[row_labels[sample]]
+        codebooks = train_codebooks(residuals, m, iterations=iterations, seed=seed)
+
+        list_codes = np.empty((len(matrix), m), dtype=np.uint8)
+        for start in range(0, len(matrix), 65536):
+            rows = ivf.list_rows[start:start + 65536]
+            list_codes[start:start + 65536] = encode(
+                matrix.vectors[rows] - ivf.centroids[labels[start:start + 65536]], codebooks
+            )
+        return cls(matrix, skill_ids, ivf.centroids, ivf.list_rows, ivf.list_offsets, codebooks, list_codes)
+
+    def approximate_scores(self, query: np.ndarray, lists) -> np.ndarray:
+        """Approximate similarity of `query` to every skill in `lists`, in
+        list order: q.centroid plus one table lookup per sub-space."""
+        m, _, dsub = self.codebooks.shape
+        table = np.einsum('md,mcd->mc', query.reshape(m, dsub), self.codebooks)
+        codes = np.concatenate([self.list_codes[self.list_offsets[c]:self.list_offsets[c + 1]] for c in lists])
+        sizes = [self.list_offsets[c + 1] - self.list_offsets[c] for c in lists]
+        scores = np.repeat(self.centroids[lists] @ query, sizes)
+        for sub in range(m):
+            scores += table[sub, codes[:, sub]]
+        return scores
+
+    def search(self, queries: np.ndarray, k: int, nprobe: int,
+               row_mask: Optional[np.ndarray] = None) -> List[np.ndarray]:
+        """Same contract as IVFIndex.search: up to k candidate rows per
+        normalized query, best first, skipping rows where `row_mask` is False."""
+        if not len(self):
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        nprobe = max(1, min(nprobe, self.nlist))
+        results = []
+        for query, centroid_sims in zip(queries, queries @ self.centroids.T):
+            probes = _top_k(centroid_sims, nprobe)
+            rows = np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probes
+            ])
+            scores = self.approximate_scores(query, probes)
+            if row_mask is not None:
+                keep = row_mask[rows]
+                rows, scores = rows[keep], scores[keep]
+            # Exact re-rank of the best candidates, read in row order
+            shortlist = np.sort(rows[_top_k(scores, k * self.rerank)])
+            exact = np.asarray(self.matrix.vectors[shortlist]) @ query
+            results.append(shortlist[_top_k(exact, k)])
+        return results
+
+    def save(self, path) -> None:
+        path = str(path)
+        tmp_vectors = f'{vectors_path(path)}.tmp.npy'
+        np.save(tmp_vectors, np.asarray(self.matrix.vectors, dtype=np.float32))
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            user_ids=self.matrix.user_ids,
+            names=np.array(self.matrix.names, dtype=str),
+            levels=self.matrix.levels if self.matrix.levels is not None else np.empty(0, dtype=np.int8),
+            skill_ids=self.skill_ids,
+            centroids=self.centroids,
+            list_rows=self.list_rows,
+            list_offsets=self.list_offsets,
+            codebooks=self.codebooks,
+            list_codes=self.list_codes,
+            model_id=np.array(self.model_id),
+        )
+        os.replace(tmp_vectors, vectors_path(path))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, rerank: int = 8) -> 'PQIndex':
+        vectors = np.load(vectors_path(path), mmap_mode='r')
+        with np.load(path) as data:
+            levels = data['levels'] if len(data['levels']) else None
+            matrix = SkillMatrix(data['user_ids'], data['names'].tolist(), vectors, levels)
+            index = cls(matrix, data['skill_ids'], data['centroids'], data['list_rows'], data['list_offsets'],
+                        data['codebooks'], data['list_codes'], rerank=rerank)
+            index.model_id = str(data['model_id']) if 'model_id' in data.files else ''
+            return index
@@ -0,0 +1,230 @@
+"""
+Resume processing as background jobs, with the database as the queue.
+
+Every upload to ResumeUploadView stores the file, creates a pending
+ResumeJob and returns 202; clients poll /api/resume/jobs/<id>/ or
+/api/resume/current/ for its status and the extracted skills.
+
+Jobs are run by `python manage.py run_resume_jobs`, a long-running poller
+that claims jobs with a conditional UPDATE (so several pollers never run the
+same job) and hands them to a process pool. While a job runs, its runner
+refreshes `updated_at` every quarter of RESUME_JOB_TIMEOUT, so a job whose
+`updated_at` is older than RESUME_JOB_TIMEOUT has lost its runner; it is
+claimed again, up to RESUME_JOB_MAX_ATTEMPTS times.
+"""
+import threading
+import traceback
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework import status
+
+from .embeddings import embedding_fields
+from .models import CachedResumeExtraction, ResumeJob, Skill, SkillChange
+from .resume_storage import release_resume_file
+from .skill_extractor import EXTRACTOR_VERSION
+from .utils_safe import ResumeExtraction, extract_skills_from_pdf, get_skill_embeddings
+
+PDF_READ_ERROR = 'Could not read the PDF file. Please ensure it is not corrupted or password protected.'
+PROCESSING_ERROR = 'An error occurred while processing the resume. Please try again.'
+
+
+class ResumeProcessingError(Exception):
+    """A resume that could not be processed, with the HTTP status to report."""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def _discard(resume):
+    name = resume.file.name
+    resume.delete()
+    release_resume_file(name)
+
+
+def extract_resume_skills(resume) -> ResumeExtraction:
+    """Skills of a resume, served from the content-hash cache when possible.
+
+    Truncated extractions are not cached since they depend on the budgets
+    (and, for the time budget, on machine load).
+    """
+    if resume.sha256:
+        cached = CachedResumeExtraction.objects.filter(
+            sha256=resume.sha256, extractor_version=EXTRACTOR_VERSION
+        ).first()
+        if cached:
+            return ResumeExtraction(
+                skills=cached.skills,
+                text_length=cached.text_length,
+                pages_read=cached.pages_read,
+                total_pages=cached.total_pages,
+                truncated=False,
+            )
+
+    extraction = extract_skills_from_pdf(resume.file)
+    if resume.sha256 and not extraction.truncated:
+        CachedResumeExtraction.objects.bulk_create([CachedResumeExtraction(
+            sha256=resume.sha256,
+            extractor_version=EXTRACTOR_VERSION,
+            skills=extraction.skills,
+            text_length=extraction.text_length,
+            pages_read=extraction.pages_read,
+            total_pages=extraction.total_pages,
+        )], ignore_conflicts=True)
+    return extraction
+
+
+def process_resume(resume) -> dict:
+    """Extract the skills of an uploaded resume and save them on its user.
+
+    Returns the response payload. On failure the resume and its file are
+    deleted and ResumeProcessingError is raised.
+    """
+    from PyPDF2.errors import EmptyFileError, PdfReadError
+
+    user = resume.user
+    try:
+        # Stream the PDF text into the skill extractor, page by page, unless
+        # the same file has been processed before
+        extraction = extract_resume_skills(resume)
+        skills = extraction.skills
+        if not skills:
+            raise ResumeProcessingError('No skills could be extracted from the resume')
+
+        # Save extracted skills, avoiding duplicates. Only skills the
+        # user doesn't have yet are embedded, in a single batch.
+        existing = set(Skill.objects.filter(
+            user=user, name__in=skills
+        ).values_list('name', flat=True))
+        new_names = [name for name in skills if name not in existing]
+        embeddings = get_skill_embeddings(new_names) if new_names else []
+
+        with transaction.atomic():
+            Skill.objects.bulk_create([
+                Skill(user=user, name=name, **embedding_fields(embedding))
+                for name, embedding in zip(new_names, embeddings)
+            ], ignore_conflicts=True)
+            skill_ids = dict(Skill.objects.filter(
+                user=user, name__in=skills
+            ).values_list('name', 'id'))
+            # bulk_create sends no post_save, so log the new skills here
+            SkillChange.objects.bulk_create([
+                SkillChange(skill_id=skill_ids[name], user_id=user.id, action='upsert')
+                for name in new_names if name in skill_ids
+            ])
+
+        saved_skills = [{
+            'name': skill_name,
+            'id': skill_ids.get(skill_name),
+            'isNew': skill_name not in existing
+        } for skill_name in skills]
+
+        resume.processed = True
+        resume.save()
+
+        return {
+            'message': 'Resume processed successfully',
+            'skills_extracted': saved_skills,
+            'total_skills': len(saved_skills),
+            'pages_read': extraction.pages_read,
+            'truncated': extraction.truncated
+        }
+
+    except ResumeProcessingError:
+        _discard(resume)
+        raise
+    except (PdfReadError, EmptyFileError):
+        # Clean up the invalid file
+        _discard(resume)
+        raise ResumeProcessingError(PDF_READ_ERROR)
+    except Exception as e:
+        # Clean up on error
+        _discard(resume)
+        print('Resume processing error:', str(e))
+        print(traceback.format_exc())
+        raise ResumeProcessingError(PROCESSING_ERROR, status.HTTP_500_INTERNAL_SERVER_ERROR) from e
+
+
+def claim_resume_job() -> Optional[int]:
+    """Mark the oldest runnable job as processing and return its id, or None.
+
+    Runnable means pending, or processing for longer than RESUME_JOB_TIMEOUT.
+    The UPDATE repeats that condition, so of several runners racing for a
+    job only one changes the row.
+    """
+    now = timezone.now()
+    runnable = Q(status='pending') | Q(
+        status='processing', updated_at__lt=now - timedelta(seconds=settings.RESUME_JOB_TIMEOUT)
+    )
+    candidates = ResumeJob.objects.filter(runnable).order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in candidates:
+        claimed = ResumeJob.objects.filter(runnable, id=job_id).update(
+            status='processing', attempts=F('attempts') + 1, updated_at=now
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes a processing job's `updated_at` until stopped, so it isn't
+    mistaken for one whose runner died. Only touches the job while it is
+    still on the same attempt, i.e. not reclaimed by another runner."""
+
+    def __init__(self, job: ResumeJob):
+        super().__init__(name=f'resume-job-{job.id}-heartbeat', daemon=True)
+        self.job_id = job.id
+        self.attempts = job.attempts
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = settings.RESUME_JOB_TIMEOUT / 4
+        try:
+            while not self.stopped.wait(interval):
+                try:
+                    ResumeJob.objects.filter(id=self.job_id, status='processing', attempts=self.attempts).update(
+                        updated_at=timezone.now()
+                    )
+                except DatabaseError as e:
+                    print(f"Warning: could not refresh resume job {self.job_id}: {e}")
+        finally:
+            close_old_connections()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_resume_job(job_id: int) -> None:
+    """Process a job claimed with claim_resume_job()."""
+    close_old_connections()
+    heartbeat = None
+    try:
+        job = ResumeJob.objects.select_related('resume', 'resume__user').get(id=job_id)
+        if job.status != 'processing':
+            return
+        heartbeat = _Heartbeat(job)
+        heartbeat.start()
+        if job.resume is None:
+            job.status, job.error = 'failed', 'The resume was deleted before it could be processed'
+        elif job.attempts > settings.RESUME_JOB_MAX_ATTEMPTS:
+            job.status, job.error = 'failed', 'Processing was interrupted too many times'
+        else:
+            try:
+                job.result = process_resume(job.resume)
+                job.status = 'completed'
+            except ResumeProcessingError as e:
+                job.status, job.error = 'failed', e.message
+        job.save(update_fields=['status', 'result', 'error', 'updated_at'])
+    except ResumeJob.DoesNotExist:
+        pass
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
+        close_old_connections()
@@ -0,0 +1,86 @@
+"""
+Content-addressed storage for uploaded resumes.
+
+Uploads are stored as `resumes/<sha256>.pdf`, so identical files share one
+blob on disk no matter how many users or re-uploads reference them. A blob is
+only removed once no Resume points at it any more.
+
+An upload hashes the file while writing it to a temporary name, then renames
+it into place. Storing and releasing the same blob can race: the upload's
+Resume row may not exist yet when a release finds the blob unreferenced. A
+release therefore moves the blob aside before checking for references once
+more (putting it back if one appeared), and the upload checks the blob still
+exists once its row is created (`ensure_resume_file`), so one side always
+sees the other. Both rely on the atomic renames of the filesystem storage.
+"""
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .models import Resume
+
+INCOMING_DIR = 'resumes/incoming'
+
+
+class _HashingFile(File):
+    """Wraps an upload so its SHA-256 is computed as storage reads it."""
+
+    def __init__(self, upload):
+        super().__init__(upload, name=upload.name)
+        self.digest = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        for chunk in self.file.chunks(chunk_size):
+            self.digest.update(chunk)
+            yield chunk
+
+
+def _save_incoming(upload):
+    """Write an upload to a temporary name. Returns (storage name, sha256)."""
+    upload.seek(0)
+    hashing = _HashingFile(upload)
+    name = default_storage.save(f'{INCOMING_DIR}/{uuid.uuid4().hex}.pdf', hashing)
+    return name, hashing.digest.hexdigest()
+
+
+def store_resume_file(upload):
+    """Store an upload under its content hash. Returns (storage name, sha256)."""
+    incoming, sha256 = _save_incoming(upload)
+    name = f'resumes/{sha256}.pdf'
+    # Replacing an existing blob is harmless: it holds the same bytes
+    os.replace(default_storage.path(incoming), default_storage.path(name))
+    return name, sha256
+
+
+def ensure_resume_file(name: str, upload) -> None:
+    """Call once a Resume references `name`: restores the blob if a
+    concurrent release removed it before the row existed."""
+    if not default_storage.exists(name):
+        incoming, _ = _save_incoming(upload)
+        os.replace(default_storage.path(incoming), default_storage.path(name))
+
+
+def release_resume_file(name: str) -> None:
+    """Delete a stored resume blob unless another Resume still references it."""
+    if not name or Resume.objects.filter(file=name).exists():
+        return
+    path = default_storage.path(name)
+    released = f'{path}.{uuid.uuid4().hex}.released'
+    try:
+        os.replace(path, released)
+    except FileNotFoundError:
+        return
+    except PermissionError as pe:
+        print(f"Warning: Could not delete resume file (may be locked): {pe}")
+        return
+    if Resume.objects.filter(file=name).exists():
+        # Referenced by an upload that raced us: put it back
+        os.replace(released, path)
+        return
+    try:
+        os.remove(released)
+    except PermissionError as pe:
+        print(f"Warning: Could not delete resume file (may be locked): {pe}")
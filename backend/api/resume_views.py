@@ -3,34 +3,37 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.db import transaction
 from django.shortcuts import get_object_or_404
-import PyPDF2.errors
-import nltk
+from django.urls import reverse
 import os
-from .models import UserProfile, Skill, Resume, SkillMatch
+from .models import UserProfile, Skill, Resume, ResumeJob, SkillMatch
 from .serializers import (
     UserProfileSerializer,
     SkillSerializer,
     ResumeSerializer,
+    ResumeJobSerializer,
     SkillMatchSerializer
 )
 from .utils_safe import (
     extract_text_from_pdf,
     extract_skills_from_text,
-    get_skill_embedding,
     find_matching_users
 )
+from .resume_storage import ensure_resume_file, release_resume_file, store_resume_file
 
 class ResumeUploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        """Get current user's resume"""
+        """Get current user's resume, with the status and result of its processing job"""
         try:
             resume = Resume.objects.get(user=request.user)
-            serializer = ResumeSerializer(resume)
-            return Response(serializer.data)
+            data = dict(ResumeSerializer(resume).data)
+            job = resume.jobs.order_by('-created_at').first()
+            data['job'] = ResumeJobSerializer(job).data if job else None
+            return Response(data)
         except Resume.DoesNotExist:
             return Response({
                 'message': 'No resume found'
@@ -40,8 +43,9 @@ class ResumeUploadView(APIView):
         """Delete current user's resume"""
         try:
             resume = Resume.objects.get(user=request.user)
-            resume.file.delete()
+            name = resume.file.name
             resume.delete()
+            release_resume_file(name)
             return Response({
                 'message': 'Resume deleted successfully'
             }, status=status.HTTP_204_NO_CONTENT)
@@ -71,91 +75,57 @@ class ResumeUploadView(APIView):
                     'error': 'File size cannot exceed 5MB'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Check if user already has a resume
-            try:
-                existing_resume = Resume.objects.get(user=request.user)
-                # Delete old resume file (with error handling for file locks)
-                try:
-                    existing_resume.file.delete()
-                except PermissionError as pe:
-                    print(f"Warning: Could not delete old resume file (may be locked): {pe}")
-                    # Continue anyway - the database entry will be deleted and new file will be saved
-                except Exception as e:
-                    print(f"Warning: Error deleting old resume file: {e}")
-                existing_resume.delete()
-            except Resume.DoesNotExist:
-                pass
-
-            # Create a new Resume instance
+            # Validate the upload
             serializer = ResumeSerializer(data={'file': file})
             if not serializer.is_valid():
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            # Save the resume
-            resume = serializer.save(user=request.user)
+            # Store the file by content hash; identical uploads share one blob
+            name, sha256 = store_resume_file(file)
+
+            # Replace the user's previous resume, if any, in one transaction so
+            # a failed create keeps it. Its file is only released once the new
+            # resume is committed.
+            with transaction.atomic():
+                previous = Resume.objects.select_for_update().filter(user=request.user).first()
+                previous_name = previous.file.name if previous else None
+                if previous:
+                    previous.delete()
+                resume = Resume.objects.create(
+                    user=request.user,
+                    file=name,
+                    sha256=sha256,
+                    original_name=file.name
+                )
+                # Processed by `manage.py run_resume_jobs`; the client polls for the result
+                job = ResumeJob.objects.create(user=request.user, resume=resume)
+            # A concurrent release may have removed the blob before this row existed
+            ensure_resume_file(name, file)
+            if previous_name and previous_name != name:
+                try:
+                    release_resume_file(previous_name)
+                except Exception as e:
+                    print(f"Warning: Error deleting old resume file: {e}")
+            return Response({
+                'message': 'Resume uploaded, processing queued',
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': reverse('resume_job', args=[job.id])
+            }, status=status.HTTP_202_ACCEPTED)
 
-            try:
-                # Extract text from PDF
-                pdf_text = extract_text_from_pdf(resume.file)
-                
-                # Extract skills from text
-                skills = extract_skills_from_text(pdf_text)
-                
-                if not skills:
-                    resume.file.delete()
-                    resume.delete()
-                    return Response({
-                        'error': 'No skills could be extracted from the resume'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Save extracted skills, avoiding duplicates
-                saved_skills = []
-                for skill_name in skills:
-                    skill, created = Skill.objects.get_or_create(
-                        user=request.user,
-                        name=skill_name,
-                        defaults={
-                            'embedding': get_skill_embedding(skill_name)
-                        }
-                    )
-                    saved_skills.append({
-                        'name': skill.name,
-                        'id': skill.id,
-                        'isNew': created
-                    })
-                
-                resume.processed = True
-                resume.save()
-                
-                return Response({
-                    'message': 'Resume processed successfully',
-                    'skills_extracted': saved_skills,
-                    'total_skills': len(saved_skills)
-                }, status=status.HTTP_200_OK)
-                
-            except (PyPDF2.errors.PdfReadError, PyPDF2.errors.EmptyFileError):
-                # Clean up the invalid file
-                resume.file.delete()
-                resume.delete()
-                return Response({
-                    'error': 'Could not read the PDF file. Please ensure it is not corrupted or password protected.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-                
-            except Exception as e:
-                # Clean up on error
-                resume.file.delete()
-                resume.delete()
-                import traceback
-                print('Resume processing error:', str(e))
-                print(traceback.format_exc())
-                return Response({
-                    'error': 'An error occurred while processing the resume. Please try again.'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                
         except Exception as e:
             import traceback
             print('Resume upload error:', str(e))
             print(traceback.format_exc())
             return Response({
                 'error': 'An error occurred while uploading the resume. Please try again.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ResumeJobView(APIView):
+    """Poll the status of a background resume processing job."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ResumeJob, id=job_id, user=request.user)
+        return Response(ResumeJobSerializer(job).data)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import UserProfile, Skill, Resume, SkillMatch
+from .models import UserProfile, Skill, DesiredSkill, Resume, ResumeJob, SkillMatch
 from .models import Connection, Message
 
 class UserSerializer(serializers.ModelSerializer):
@@ -14,6 +14,12 @@ class SkillSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'description', 'proficiency_level', 'created_at')
         read_only_fields = ('user',)
 
+class DesiredSkillSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = DesiredSkill
+        fields = ('id', 'name', 'created_at')
+        read_only_fields = ('user',)
+
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     skills = SkillSerializer(many=True, read_only=True, source='user.skills.all')
@@ -36,6 +42,8 @@ class ResumeSerializer(serializers.ModelSerializer):
         return obj.file.url if obj.file else None
 
     def get_filename(self, obj):
+        if obj.original_name:
+            return obj.original_name
         return obj.file.name.split('/')[-1] if obj.file else None
 
     def get_skills(self, obj):
@@ -43,6 +51,12 @@ class ResumeSerializer(serializers.ModelSerializer):
         skills = obj.user.skills.all()
         return SkillSerializer(skills, many=True).data
 
+class ResumeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumeJob
+        fields = ('id', 'status', 'result', 'error', 'created_at', 'updated_at')
+        read_only_fields = fields
+
 class SkillMatchSerializer(serializers.ModelSerializer):
     provider = UserSerializer(read_only=True)
     
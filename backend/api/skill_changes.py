@@ -0,0 +1,231 @@
+"""
+Keep the in-memory matching structures current between snapshot builds.
+
+Every Skill save/delete (and User delete) appends a SkillChange row; resume
+uploads, which use bulk_create, log their new skills explicitly. Each worker
+keeps a LiveSkillMatrix over the memory-mapped snapshot (api.embedding_snapshot)
+and, at most every SKILL_CHANGE_POLL_SECONDS, compacts the changes logged
+since: replaced or deleted snapshot rows are tombstoned and the current
+version of each changed skill is read into a small overlay matrix. The cost
+of a compaction depends on the number of changes, not on the corpus size, so
+new skills become matchable within seconds without a rebuild.
+
+Desired skills, which reciprocal matching scores against, are kept the same
+way by `get_live_desired_skills()`: each worker holds them as one matrix and,
+at most every SKILL_CHANGE_POLL_SECONDS, reads only the rows created or
+updated since (by the indexed `updated_at`). A row count that no longer adds
+up means rows were deleted, and the matrix is read again in full.
+"""
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+from django.conf import settings
+
+from .embedding_snapshot import EmbeddingSnapshot, fetch_skill_arrays, get_embedding_snapshot
+from .matching import SkillMatrix
+
+TOMBSTONE = -1
+
+
+class OverlaySkillMatrix(SkillMatrix):
+    """A snapshot matrix plus an overlay of changed skills, scored as one.
+
+    Snapshot rows that were deleted or replaced keep their place but carry
+    user_id TOMBSTONE, which UserScores leaves out of the ranking. Overlay
+    rows follow the snapshot rows.
+
+    There is no single `vectors` array (building one would copy the whole
+    snapshot): read rows with `vectors_for`, or score with `similarities`.
+    """
+
+    def __init__(self, base: SkillMatrix, base_alive: np.ndarray, overlay: SkillMatrix):
+        self.user_ids = np.concatenate((np.where(base_alive, base.user_ids, TOMBSTONE), overlay.user_ids))
+        self.names = base.names + overlay.names
+        self.levels = np.concatenate((base.levels, overlay.levels))
+        self._grouping = None
+        self.base = base
+        self.overlay = overlay
+
+    @property
+    def vectors(self) -> np.ndarray:
+        raise TypeError('OverlaySkillMatrix has no vectors array; use vectors_for(rows) or similarities()')
+
+    @property
+    def dim(self) -> int:
+        return self.base.dim
+
+    def vectors_for(self, rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        in_base = rows < len(self.base)
+        vectors = np.empty((len(rows), self.dim), dtype=np.float32)
+        vectors[in_base] = self.base.vectors[rows[in_base]]
+        vectors[~in_base] = self.overlay.vectors[rows[~in_base] - len(self.base)]
+        return vectors
+
+    def similarities(self, queries: np.ndarray) -> np.ndarray:
+        return np.concatenate((self.base.similarities(queries), self.overlay.similarities(queries)), axis=1)
+
+
+class LiveSkillMatrix:
+    """A snapshot generation with the SkillChange log applied on top."""
+
+    def __init__(self, snapshot: EmbeddingSnapshot):
+        self.snapshot = snapshot
+        self.change_id = snapshot.change_id
+        self.matrix = snapshot.matrix
+        self.compacted_at = 0.0
+        self._alive = np.ones(len(snapshot), dtype=bool)
+        # skill_id -> (user_id, name, normalized vector, level) for changed skills
+        self._overlay = {}
+        self._lock = threading.Lock()
+
+    def _tombstone(self, skill_id: int) -> None:
+        row = np.searchsorted(self.snapshot.skill_ids, skill_id)
+        if row < len(self.snapshot) and self.snapshot.skill_ids[row] == skill_id:
+            self._alive[row] = False
+        self._overlay.pop(skill_id, None)
+
+    def compact(self) -> int:
+        """Apply the changes logged since the last compaction. Returns their number."""
+        from .models import Skill, SkillChange
+
+        with self._lock:
+            self.compacted_at = time.monotonic()
+            changes = list(SkillChange.objects.filter(id__gt=self.change_id).order_by('id').values_list(
+                'id', 'skill_id', 'user_id', 'action'
+            ))
+            if not changes:
+                return 0
+
+            touched = set()
+            for _, skill_id, user_id, action in changes:
+                if action == 'delete_user':
+                    self._alive[self.snapshot.user_ids == user_id] = False
+                    for overlay_id in [k for k, v in self._overlay.items() if v[0] == user_id]:
+                        del self._overlay[overlay_id]
+                else:
+                    self._tombstone(skill_id)
+                    touched.add(skill_id)
+
+            # The current version of every touched skill; deleted ones are gone
+            arrays = fetch_skill_arrays(Skill.objects.filter(id__in=touched))
+            for skill_id, user_id, name, vector, level in zip(*arrays):
+                self._overlay[int(skill_id)] = (int(user_id), str(name), vector, int(level))
+
+            overlay_ids = sorted(self._overlay)
+            entries = [self._overlay[k] for k in overlay_ids]
+            overlay = SkillMatrix(
+                [e[0] for e in entries],
+                [e[1] for e in entries],
+                np.array([e[2] for e in entries], dtype=np.float32).reshape(len(entries), self.snapshot.vectors.shape[1]),
+                [e[3] for e in entries],
+            )
+            self.matrix = OverlaySkillMatrix(self.snapshot.matrix, self._alive.copy(), overlay)
+            self.change_id = changes[-1][0]
+            return len(changes)
+
+
+_live = None
+_live_lock = threading.Lock()
+
+
+def get_live_skill_matrix() -> Optional[SkillMatrix]:
+    """Matrix of every current skill: the snapshot plus recent changes.
+
+    Returns None when no snapshot has been built.
+    """
+    global _live
+    snapshot = get_embedding_snapshot()
+    if snapshot is None:
+        return None
+    with _live_lock:
+        if _live is None or _live.snapshot is not snapshot:
+            _live = LiveSkillMatrix(snapshot)
+        live = _live
+    if time.monotonic() - live.compacted_at >= settings.SKILL_CHANGE_POLL_SECONDS:
+        live.compact()
+    return live.matrix
+
+
+def live_skill_generation() -> Optional[tuple]:
+    """(snapshot generation, last applied SkillChange id) of the matrix
+    `get_live_skill_matrix()` currently returns, or None without a snapshot."""
+    if get_live_skill_matrix() is None:
+        return None
+    live = _live
+    return live.snapshot.generation, live.change_id
+
+
+class LiveDesiredSkills:
+    """Every DesiredSkill as a SkillMatrix, kept current incrementally."""
+
+    def __init__(self):
+        self.matrix = None
+        self.checked_at = 0.0
+        self._ids = np.empty(0, dtype=np.int64)
+        self._watermark = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _fetch(queryset):
+        from .embeddings import embedding_rows
+        from .matching import normalize_rows, stack_embeddings
+
+        rows = embedding_rows(queryset.order_by('id'), 'id', 'user_id', 'name')
+        vectors = normalize_rows(stack_embeddings([row[3] for row in rows], dim=settings.SKILL_EMBEDDING_DIM))
+        return (np.array([row[0] for row in rows], dtype=np.int64),
+                np.array([row[1] for row in rows], dtype=np.int64), [row[2] for row in rows], vectors)
+
+    def refresh(self) -> None:
+        from django.db.models import Count, Max
+
+        from .models import DesiredSkill
+
+        with self._lock:
+            self.checked_at = time.monotonic()
+            stats = DesiredSkill.objects.aggregate(count=Count('id'), last=Max('id'), latest=Max('updated_at'))
+            if self.matrix is not None and (stats['latest'] == self._watermark and len(self._ids) == stats['count']
+                                            and (not len(self._ids) or self._ids[-1] == stats['last'])):
+                return
+
+            ids = None
+            if self.matrix is not None and self._watermark is not None:
+                # auto_now stamps inserts too, so this also picks up new rows
+                new_ids, new_users, new_names, new_vectors = self._fetch(
+                    DesiredSkill.objects.filter(updated_at__gte=self._watermark))
+                pos = np.searchsorted(self._ids, new_ids)
+                known = pos < len(self._ids)
+                known[known] = self._ids[pos[known]] == new_ids[known]
+                added = ~known
+                # Any deletion, or an insert landing below the last id, makes the count or order
+                # disagree; fall back to a full read then
+                if (len(self._ids) + int(added.sum()) == stats['count']
+                        and (not added.any() or not len(self._ids) or new_ids[added][0] > self._ids[-1])):
+                    # concatenate always copies, so requests still scoring the old matrix are unaffected
+                    ids = np.concatenate((self._ids, new_ids[added]))
+                    user_ids = np.concatenate((self.matrix.user_ids, new_users[added]))
+                    vectors = np.concatenate((self.matrix.vectors, new_vectors[added]))
+                    names = list(self.matrix.names) + [n for n, a in zip(new_names, added) if a]
+                    user_ids[pos[known]] = new_users[known]
+                    vectors[pos[known]] = new_vectors[known]
+                    for i, name, k in zip(pos, new_names, known):
+                        if k:
+                            names[i] = name
+            if ids is None:
+                ids, user_ids, names, vectors = self._fetch(DesiredSkill.objects.all())
+            self._ids = ids
+            self._watermark = stats['latest']
+            self.matrix = SkillMatrix(user_ids, names, vectors)
+
+
+_live_desires = LiveDesiredSkills()
+
+
+def get_live_desired_skills() -> SkillMatrix:
+    """Matrix of every desired skill, at most SKILL_CHANGE_POLL_SECONDS old."""
+    if (_live_desires.matrix is None
+            or time.monotonic() - _live_desires.checked_at >= settings.SKILL_CHANGE_POLL_SECONDS):
+        _live_desires.refresh()
+    return _live_desires.matrix
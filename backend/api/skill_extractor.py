@@ -0,0 +1,157 @@
+"""
+Single-pass skill extraction.
+
+`SkillExtractor` compiles the skill taxonomy into an Aho-Corasick automaton
+once, then finds every single- and multi-word skill - including ones with
+punctuation such as `c++`, `node.js` or `ci/cd` - in one linear scan of the
+text. Text can be fed as a stream of chunks (e.g. PDF pages); matches that
+span a chunk boundary are still found.
+
+A match only counts on token boundaries: a skill that starts (ends) with a
+word character must not be preceded (followed) by one, so `java` is not found
+inside `javascript` while `c++` is found in `c++11`. Runs of whitespace are
+treated as a single space, so multi-word skills survive line breaks.
+"""
+from collections import deque
+from typing import Iterable, List
+
+# Bump whenever extraction results can change, to invalidate cached results.
+EXTRACTOR_VERSION = 2
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class SkillExtractor:
+    """Aho-Corasick automaton over a set of lower-case skill names."""
+
+    def __init__(self, skills: Iterable[str]):
+        self.skills = sorted({skill.lower() for skill in skills if skill})
+        self.max_length = max((len(skill) for skill in self.skills), default=0)
+        # Word-boundary requirements at each end of every pattern.
+        self._starts_with_word = [_is_word_char(skill[0]) for skill in self.skills]
+        self._ends_with_word = [_is_word_char(skill[-1]) for skill in self.skills]
+
+        self._goto = [{}]
+        self._outputs = [[]]
+        for index, skill in enumerate(self.skills):
+            state = 0
+            for char in skill:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._outputs.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._outputs[state].append(index)
+
+        # Breadth-first construction of failure links; each state's outputs
+        # are extended with those of its failure state.
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if state else 0
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def extract(self, text: str) -> List[str]:
+        """Sorted list of the skills found in `text`."""
+        return self.extract_stream([text])
+
+    def extract_stream(self, chunks: Iterable[str]) -> List[str]:
+        """Sorted list of the skills found in the concatenation of `chunks`."""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        lengths = [len(skill) for skill in self.skills]
+
+        found = set()
+        state = 0
+        previous_space = False
+        # Whether each of the most recent characters is a word character;
+        # history[-1] is the current character.
+        history = deque([False], maxlen=self.max_length + 2)
+        pending = []  # matches waiting for the next character to close them
+
+        for chunk in chunks:
+            for char in chunk.lower():
+                if char.isspace():
+                    if previous_space:
+                        continue
+                    char = ' '
+                    previous_space = True
+                else:
+                    previous_space = False
+
+                is_word = _is_word_char(char)
+                if pending:
+                    if not is_word:
+                        found.update(pending)
+                    pending = []
+                history.append(is_word)
+
+                while state and char not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(char, 0)
+
+                for index in outputs[state]:
+                    if self.skills[index] in found:
+                        continue
+                    if self._starts_with_word[index] and history[-1 - lengths[index]]:
+                        continue
+                    if self._ends_with_word[index]:
+                        pending.append(self.skills[index])
+                    else:
+                        found.add(self.skills[index])
+
+        found.update(pending)
+        return sorted(found)
+
+
+_default_extractor = None
+
+
+def get_skill_extractor() -> SkillExtractor:
+    """The extractor for the built-in COMMON_SKILLS taxonomy, built on first use."""
+    global _default_extractor
+    if _default_extractor is None:
+        from .skills_data import COMMON_SKILLS
+        _default_extractor = SkillExtractor(COMMON_SKILLS)
+    return _default_extractor
+
+
+def legacy_extract_skills(text: str) -> List[str]:
+    """The previous regex-based extractor.
+
+    Kept as the reference for `manage.py check_skill_extractor`; it only
+    finds skills made of word characters.
+    """
+    from .skills_data import COMMON_SKILLS
+    import re
+
+    text = text.lower()
+    found_skills = set()
+
+    for skill in COMMON_SKILLS:
+        if ' ' in skill:
+            pattern = r'\b' + re.escape(skill) + r'\b'
+            if re.search(pattern, text):
+                found_skills.add(skill)
+
+    words = re.findall(r'\b\w+\b', text)
+    for word in words:
+        if word in COMMON_SKILLS:
+            found_skills.add(word)
+
+    text_with_boundaries = ' ' + text + ' '
+    for i in range(len(words) - 1):
+        two_words = ' ' + words[i] + ' ' + words[i + 1] + ' '
+        if two_words in text_with_boundaries:
+            compound = (words[i] + ' ' + words[i + 1]).lower()
+            if compound in COMMON_SKILLS:
+                found_skills.add(compound)
+
+    return sorted(list(found_skills))
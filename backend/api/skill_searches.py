@@ -0,0 +1,70 @@
+"""
+How often each skill text is searched for.
+
+Match requests call `record_skill_searches()`, which only bumps an
+in-process counter. The counts are added to the SkillSearch table at most
+every SKILL_SEARCH_FLUSH_SECONDS, with one UPDATE per distinct text, so a
+trending skill doesn't turn every request into a write. Counts still in
+memory when a process exits are lost; they only rank work such as
+re-embedding after a model change (api.embedding_backfill), so that is fine.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Iterable
+
+from django.conf import settings
+
+from .embeddings import normalize_skill_text
+
+
+class SearchCounter:
+    """Buffered per-text search counts, flushed to SkillSearch."""
+
+    # Longest text that is counted, as SkillSearch.text
+    MAX_TEXT_LENGTH = 255
+
+    def __init__(self, flush_seconds: float):
+        self.flush_seconds = flush_seconds
+        self._counts = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, texts: Iterable[str]) -> None:
+        normalized = (normalize_skill_text(text) for text in texts if isinstance(text, str))
+        with self._lock:
+            self._counts.update(text for text in normalized if text and len(text) <= self.MAX_TEXT_LENGTH)
+            due = time.monotonic() - self._flushed_at >= self.flush_seconds
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Add the buffered counts to the table. Returns the number of texts written."""
+        from django.db import DatabaseError, transaction
+        from django.db.models import F
+        from django.utils import timezone
+
+        from .models import SkillSearch
+
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return 0
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                SkillSearch.objects.bulk_create([SkillSearch(text=text) for text in counts], ignore_conflicts=True)
+                for text, count in counts.items():
+                    SkillSearch.objects.filter(text=text).update(count=F('count') + count, last_searched_at=now)
+        except DatabaseError as e:
+            print(f"Warning: could not record {len(counts)} skill searches: {e}")
+            return 0
+        return len(counts)
+
+
+search_counter = SearchCounter(settings.SKILL_SEARCH_FLUSH_SECONDS)
+
+
+def record_skill_searches(texts: Iterable[str]) -> None:
+    search_counter.record(texts)
@@ -0,0 +1,25 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.match_filters import MatchFilters
+from api.matching import SkillMatrix
+
+
+class RowMaskTests(SimpleTestCase):
+    def setUp(self):
+        self.vectors = np.eye(3, dtype=np.float32)
+
+    def test_proficiency_and_exclusions(self):
+        matrix = SkillMatrix([1, 2, 3], ['a', 'b', 'c'], self.vectors, [0, 2, 3])
+        filters = MatchFilters(min_proficiency='intermediate')
+        self.assertTrue(filters.can_filter(matrix))
+        self.assertEqual(filters.row_mask(matrix, {3}).tolist(), [False, True, False])
+
+    def test_missing_levels_are_not_silently_ignored(self):
+        matrix = SkillMatrix([1, 2, 3], ['a', 'b', 'c'], self.vectors)
+        filters = MatchFilters(min_proficiency='advanced')
+        with self.assertLogs('api.match_filters', level='WARNING'):
+            self.assertFalse(filters.can_filter(matrix))
+        with self.assertRaises(ValueError):
+            filters.row_mask(matrix, set())
+        self.assertTrue(MatchFilters().can_filter(matrix))
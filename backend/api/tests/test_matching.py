@@ -0,0 +1,113 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from api.matching import ReciprocalScores, SkillMatrix, UserScores, rank_users
+from api.skill_changes import OverlaySkillMatrix
+
+
+def unit(*values):
+    vector = np.array(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class UserScoresTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        user_ids = rng.integers(0, 40, 300)
+        vectors = rng.standard_normal((300, 8)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        matrix = SkillMatrix(user_ids, [f's{i}' for i in range(300)], vectors)
+        queries = rng.standard_normal((3, 8)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        page = rank_users(matrix, ['a', 'b', 'c'], list(queries), limit=None)
+        sims = queries @ vectors.T
+        expected = {}
+        for user in np.unique(user_ids):
+            rows = np.flatnonzero(user_ids == user)
+            expected[int(user)] = float(np.maximum(sims[:, rows].max(axis=1), 0.0).mean())
+        self.assertEqual(len(page), len(expected))
+        for result in page:
+            self.assertAlmostEqual(result['match_score'], expected[result['user_id']], places=5)
+        scores = [result['match_score'] for result in page]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_pages_are_slices_of_the_ranking(self):
+        matrix = SkillMatrix([1, 2, 3, 4, 5], ['a', 'b', 'c', 'd', 'e'],
+                             np.stack([unit(1, 0), unit(1, 1), unit(0, 1), unit(1, 2), unit(2, 1)]))
+        scores = UserScores(matrix, ['x'], [unit(1, 0).tolist()])
+        self.assertEqual(scores.page(0, 2) + scores.page(2, 2) + scores.page(4, 2), scores.page(0, None))
+
+    def test_ties_keep_first_appearance(self):
+        matrix = SkillMatrix([9, 4, 7], ['a', 'b', 'c'], np.stack([unit(1, 0)] * 3))
+        page = rank_users(matrix, ['x'], [unit(1, 0).tolist()], limit=None)
+        self.assertEqual([r['user_id'] for r in page], [9, 4, 7])
+
+    def test_unembedded_skill_matches_by_name(self):
+        vectors = np.stack([unit(0, 1), np.zeros(2, dtype=np.float32)])
+        matrix = SkillMatrix([1, 2], ['Go', 'Python'], vectors)
+        page = rank_users(matrix, ['python'], [unit(1, 0).tolist()], limit=None)
+        self.assertEqual(page[0], {'user_id': 2, 'match_score': 1.0, 'matching_skills': ['Python']})
+        self.assertEqual(page[1]['match_score'], 0.0)
+
+    def test_excluded_and_tombstoned_users_are_not_ranked(self):
+        matrix = SkillMatrix([1, -1, 2, 3], ['a', 'b', 'c', 'd'], np.stack([unit(1, 0)] * 4))
+        page = UserScores(matrix, ['x'], [unit(1, 0).tolist()], exclude_user_ids=[2]).page(0, None)
+        self.assertEqual([r['user_id'] for r in page], [1, 3])
+
+    def test_reciprocal_score_combines_both_sides(self):
+        skills = SkillMatrix([1, 2], ['Python', 'Go'], np.stack([unit(1, 0), unit(0, 1)]))
+        desires = SkillMatrix([1, 1], ['SQL', 'Rust'], np.stack([unit(0, 1), unit(-1, 0)]))
+        scores = ReciprocalScores(skills, desires, ['Python'], [unit(1, 0).tolist()],
+                                  ['Go'], [unit(0, 1).tolist()], weight=0.75)
+        first, second = scores.page(0, None)
+        self.assertEqual(first['user_id'], 1)
+        self.assertAlmostEqual(first['teaches_me_score'], 1.0, places=5)
+        self.assertAlmostEqual(first['learns_from_me_score'], 0.5, places=5)
+        self.assertAlmostEqual(first['match_score'], 0.75 + 0.25 * 0.5, places=5)
+        self.assertEqual(first['skills_they_want'], ['SQL'])
+        self.assertEqual((second['user_id'], second['match_score']), (2, 0.0))
+
+
+class OverlayScoresTests(SimpleTestCase):
+    """Scores over an OverlaySkillMatrix match those over the equivalent plain matrix."""
+
+    def setUp(self):
+        self.base = SkillMatrix(
+            [1, 1, 2, 3, 4],
+            ['Python', 'Django', 'Go', 'Java', 'Rust'],
+            np.stack([unit(1, 0, 0), unit(1, 1, 0), unit(0, 1, 0), unit(0, 0, 1), unit(1, 0, 1)]),
+            [1, 2, 3, 1, 2],
+        )
+        # User 3's Java was replaced by Flask, and user 5 joined
+        alive = np.array([True, True, True, False, True])
+        overlay = SkillMatrix([3, 5], ['Flask', 'Python'], np.stack([unit(1, 1, 1), unit(1, 0, 0)]), [2, 3])
+        self.matrix = OverlaySkillMatrix(self.base, alive, overlay)
+        self.plain = SkillMatrix(
+            [1, 1, 2, 4, 3, 5],
+            ['Python', 'Django', 'Go', 'Rust', 'Flask', 'Python'],
+            np.stack([unit(1, 0, 0), unit(1, 1, 0), unit(0, 1, 0), unit(1, 0, 1), unit(1, 1, 1), unit(1, 0, 0)]),
+            [1, 2, 3, 2, 2, 3],
+        )
+
+    def test_page_over_overlay(self):
+        queries = [unit(1, 0, 0).tolist()]
+        page = UserScores(self.matrix, ['Python'], queries).page(0, None)
+        self.assertEqual(page, UserScores(self.plain, ['Python'], queries).page(0, None))
+        by_user = {r['user_id']: r['matching_skills'] for r in page}
+        self.assertEqual(by_user[3], ['Flask'])
+        self.assertEqual(page[0]['matching_skills'], ['Django', 'Python'])
+
+    def test_vectors_for_reads_base_and_overlay(self):
+        np.testing.assert_allclose(self.matrix.vectors_for([5, 0]), np.stack([unit(1, 1, 1), unit(1, 0, 0)]))
+
+    def test_vectors_attribute_fails_loudly(self):
+        with self.assertRaises(TypeError):
+            self.matrix.vectors
+
+    def test_reciprocal_page_over_overlay(self):
+        desires = SkillMatrix([2, 5], ['Python', 'Go'], np.stack([unit(1, 0, 0), unit(0, 1, 0)]))
+        args = (desires, ['Python'], [unit(1, 0, 0).tolist()], ['Python'], [unit(1, 0, 0).tolist()])
+        page = ReciprocalScores(self.matrix, *args, exclude_user_ids=[1]).page(0, None)
+        self.assertEqual(page, ReciprocalScores(self.plain, *args, exclude_user_ids=[1]).page(0, None))
+        self.assertEqual({r['user_id'] for r in page}, {2, 3, 4, 5})
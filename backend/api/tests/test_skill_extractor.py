@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase
+
+from api.skill_extractor import SkillExtractor, get_skill_extractor, legacy_extract_skills
+from api.skills_data import COMMON_SKILLS
+
+RESUMES = {
+    'backend': (
+        'Senior Backend Engineer\n'
+        'Built REST API services in Python and Go on AWS, deployed with Docker and\n'
+        'Kubernetes. Maintained CI/CD pipelines in Git. Wrote SQL for reporting.'
+    ),
+    'frontend': (
+        'Frontend developer - JavaScript, React, Node.js and some C++11 tooling.\n'
+        'Worked closely with UI/UX designers in Adobe XD; not a Java developer.'
+    ),
+    'data': (
+        'Data analyst: data analysis and business intelligence with R, Python and\n'
+        'scikit-learn. Market   research,\tdigital marketing and time management.'
+    ),
+    'manager': (
+        'PROJECT MANAGEMENT and product management for a C# shop; problem solving,\n'
+        'content strategy. Interests: after effects (video), go-karting.'
+    ),
+    'none': 'Gardener. Enjoys hiking, cooking and woodwork.',
+}
+
+
+class SkillExtractorTests(SimpleTestCase):
+    def test_finds_everything_the_legacy_extractor_found(self):
+        # The differential check of `manage.py check_skill_extractor`, on fixed resumes
+        extractor = get_skill_extractor()
+        for name, text in RESUMES.items():
+            with self.subTest(resume=name):
+                self.assertLessEqual(set(legacy_extract_skills(text)), set(extractor.extract(text)))
+
+    def test_expected_skills(self):
+        extractor = get_skill_extractor()
+        self.assertEqual(extractor.extract(RESUMES['none']), [])
+        frontend = extractor.extract(RESUMES['frontend'])
+        # Punctuated skills the legacy extractor could not find
+        self.assertTrue({'c++', 'node.js', 'ui/ux', 'adobe xd'} <= set(frontend))
+        self.assertNotIn('c++', legacy_extract_skills(RESUMES['frontend']))
+        self.assertIn('java', frontend)
+        self.assertIn('market research', extractor.extract(RESUMES['data']))
+
+    def test_token_boundaries(self):
+        extractor = SkillExtractor(['java', 'c++', 'go'])
+        self.assertEqual(extractor.extract('javascript, gopher'), [])
+        self.assertEqual(extractor.extract('c++11 and Java.'), ['c++', 'java'])
+
+    def test_every_taxonomy_entry_is_found(self):
+        extractor = get_skill_extractor()
+        for skill in sorted(COMMON_SKILLS):
+            with self.subTest(skill=skill):
+                self.assertIn(skill, extractor.extract(f'Experienced with {skill.upper()}, among others.'))
+
+    def test_stream_matches_across_chunks(self):
+        extractor = get_skill_extractor()
+        text = RESUMES['data'] + '\n' + RESUMES['backend']
+        chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+        self.assertEqual(extractor.extract_stream(chunks), extractor.extract(text))
@@ -5,9 +5,11 @@ from . import auth_views
 from . import search_views
 from . import resume_views
 from . import message_views
+from . import health_views
 
 router = DefaultRouter()
 router.register(r'skills', views.SkillViewSet, basename='skills')
+router.register(r'desired-skills', views.DesiredSkillViewSet, basename='desired-skills')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -19,7 +21,11 @@ urlpatterns = [
     path('auth/check-username/<str:username>/', auth_views.check_username, name='check_username'),
     path('upload_resume/', resume_views.ResumeUploadView.as_view(), name='upload_resume'),
     path('resume/current/', resume_views.ResumeUploadView.as_view(), name='current_resume'),
+    path('resume/jobs/<int:job_id>/', resume_views.ResumeJobView.as_view(), name='resume_job'),
     path('match_skills/', views.SkillMatchView.as_view(), name='match_skills'),
+    path('match_skills/reciprocal/', views.ReciprocalMatchView.as_view(), name='match_skills_reciprocal'),
+    path('match_skills/recommended/', views.RecommendedMatchesView.as_view(), name='match_skills_recommended'),
+    path('exchange_cycles/', views.ExchangeCycleView.as_view(), name='exchange_cycles'),
     path('users/search/', search_views.search_users, name='search_users'),
     path('users/profile/<str:username>/', search_views.get_profile_by_username, name='get_profile_by_username'),
     path('connections/request/<int:user_id>/', views.ConnectionRequestView.as_view(), name='connection_request'),
@@ -30,4 +36,5 @@ urlpatterns = [
     path('conversations/', message_views.ConversationsListView.as_view(), name='conversations'),
     path('realtime/token/', message_views.AblyTokenView.as_view(), name='ably_token'),
     path('streaks/', views.LoginStreakView.as_view(), name='login_streaks'),
+    path('health/ready/', health_views.readiness, name='readiness'),
 ]
\ No newline at end of file
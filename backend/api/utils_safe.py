@@ -1,13 +1,20 @@
-import PyPDF2
-import nltk
 import json
-from typing import List, Tuple
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+from django.conf import settings
 
-# Heavy ML libraries are imported lazily inside functions to avoid import-time
-# failures when running management commands (migrate, collectstatic, etc.).
+# Heavy libraries (nltk, PyPDF2, sentence_transformers, sklearn) are imported
+# lazily inside functions, so importing this module - and therefore starting a
+# worker or running a management command - loads and downloads nothing.
+# `python manage.py prepare_models` fetches model weights and NLTK data ahead
+# of time.
 
 def ensure_nltk_data():
     """Ensure all required NLTK data is downloaded"""
+    import nltk
+
     # Try to download essential packages
     try:
         nltk.download('punkt', quiet=True)
@@ -29,103 +36,212 @@ def ensure_nltk_data():
             print("Warning: Could not load punkt tokenizer. Using fallback methods.")
 
 
-# Initialize NLTK data
-ensure_nltk_data()
+# Initialize the BERT model lazily. A lock makes sure concurrent first
+# requests load it only once; `_model_state` backs the readiness endpoint.
+_model = None
+_model_lock = threading.Lock()
+_model_state = {'status': 'not_loaded', 'error': None, 'load_seconds': None, 'warm': False}
+_model_failed_at = None
 
+# Seconds to wait before retrying a failed model load.
+MODEL_RETRY_SECONDS = 60
 
-# Initialize the BERT model lazily
-_model = None
 
 def get_model():
-    """Lazily load the SentenceTransformer model. If the package isn't
-    available in the environment (for example on CI or when running simple
-    management commands), this will return None and the caller should handle
-    the fallback behavior gracefully.
+    """Lazily load the embedding backend selected by SKILL_EMBEDDING_BACKEND
+    (see api.embedding_backends). If its dependencies aren't available in the
+    environment (for example on CI or when running simple management
+    commands), this will return None and the caller should handle the
+    fallback behavior gracefully.
     """
-    global _model
-    if _model is None:
+    global _model, _model_failed_at
+    if _model is not None:
+        return _model
+    with _model_lock:
+        if _model is not None:
+            return _model
+        if _model_failed_at is not None and time.monotonic() - _model_failed_at < MODEL_RETRY_SECONDS:
+            return None
+        _model_state.update(status='loading', error=None)
+        start = time.perf_counter()
         try:
-            from sentence_transformers import SentenceTransformer
-            _model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+            from .embedding_backends import create_embedding_backend
+            _model = create_embedding_backend()
         except Exception as e:
             # Do not raise here — allow the application to continue without
             # embeddings. Log a warning so developers know heavy deps are
             # unavailable.
-            print(f"Warning: could not load SentenceTransformer model: {e}")
-            _model = None
+            print(f"Warning: could not load {settings.SKILL_EMBEDDING_BACKEND} embedding backend: {e}")
+            _model_failed_at = time.monotonic()
+            _model_state.update(status='failed', error=str(e))
+            return None
+        _model_failed_at = None
+        _model_state.update(status='ready', load_seconds=round(time.perf_counter() - start, 3))
     return _model
 
 
+def warm_up_model(batch_size: int = 8) -> bool:
+    """Load the model and run a dummy batch through it, so the first real
+    request doesn't pay for lazy initialisation. Returns True when warm."""
+    global _warm_up_failed_at
+    model = get_model()
+    if model is None:
+        _warm_up_failed_at = time.monotonic()
+        return False
+    try:
+        model.encode(['warm up'] * batch_size)
+    except Exception as e:
+        print(f"Warning: model warm-up failed: {e}")
+        _warm_up_failed_at = time.monotonic()
+        _model_state['error'] = str(e)
+        return False
+    _warm_up_failed_at = None
+    _model_state['warm'] = True
+    return True
+
+
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+_warm_up_failed_at = None
+
+
+def start_model_warm_up() -> Optional[threading.Thread]:
+    """Warm the model up in a background thread (used at worker start, and
+    by the readiness probe to retry a failed warm-up). Returns None when the
+    model is already warm, a warm-up is running, or the last one failed less
+    than MODEL_RETRY_SECONDS ago."""
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _model_state['warm'] or (_warm_up_thread is not None and _warm_up_thread.is_alive()):
+            return None
+        if _warm_up_failed_at is not None and time.monotonic() - _warm_up_failed_at < MODEL_RETRY_SECONDS:
+            return None
+        _warm_up_thread = threading.Thread(target=warm_up_model, name='model-warm-up', daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def get_model_state() -> dict:
+    """Snapshot of the model loading state, for health checks."""
+    from .embedding_backends import embedding_model_id
+    return dict(_model_state, model=embedding_model_id(), backend=settings.SKILL_EMBEDDING_BACKEND)
+
+
+class PdfTextStream:
+    """
+    Iterate over the text of a PDF one page at a time, within budgets.
+    Reading stops after `max_pages` pages, `max_chars` characters (the last
+    page is cut short) or `max_seconds` of wall-clock time, which is checked
+    between pages. `pages_read`, `chars_read` and `truncated` describe what
+    was actually consumed.
+    """
+
+    def __init__(self, pdf_file, max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                 max_seconds: Optional[float] = None):
+        import PyPDF2
+        self.reader = PyPDF2.PdfReader(pdf_file)
+        self.total_pages = len(self.reader.pages)
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self.max_seconds = max_seconds
+        self.pages_read = 0
+        self.chars_read = 0
+        self.truncated = False
+
+    def __iter__(self) -> Iterator[str]:
+        deadline = time.monotonic() + self.max_seconds if self.max_seconds else None
+        for page in self.reader.pages:
+            if (self.max_pages is not None and self.pages_read >= self.max_pages) or \
+                    (deadline is not None and time.monotonic() > deadline):
+                self.truncated = True
+                return
+            text = page.extract_text() or ''
+            self.pages_read += 1
+            if self.max_chars is not None and self.chars_read + len(text) > self.max_chars:
+                text = text[:self.max_chars - self.chars_read]
+                self.truncated = True
+            self.chars_read += len(text)
+            yield text
+            if self.truncated:
+                return
+
+
+@dataclass
+class ResumeExtraction:
+    """Outcome of extracting skills from a resume PDF."""
+    skills: List[str]
+    text_length: int
+    pages_read: int
+    total_pages: int
+    truncated: bool
+
+
 def extract_text_from_pdf(pdf_file) -> str:
     """Extract text from uploaded PDF file."""
-    reader = PyPDF2.PdfReader(pdf_file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+    return ''.join(PdfTextStream(pdf_file))
+
+
+def extract_skills_from_pdf(pdf_file) -> ResumeExtraction:
+    """
+    Extract skills from a PDF, feeding each page to the skill extractor as it
+    is read. Reading is bounded by the RESUME_PDF_MAX_* settings.
+    """
+    from .skill_extractor import get_skill_extractor
+
+    stream = PdfTextStream(
+        pdf_file,
+        max_pages=settings.RESUME_PDF_MAX_PAGES,
+        max_chars=settings.RESUME_PDF_MAX_CHARS,
+        max_seconds=settings.RESUME_PDF_MAX_SECONDS,
+    )
+    skills = get_skill_extractor().extract_stream(stream)
+    return ResumeExtraction(
+        skills=skills,
+        text_length=stream.chars_read,
+        pages_read=stream.pages_read,
+        total_pages=stream.total_pages,
+        truncated=stream.truncated,
+    )
 
 
 def extract_skills_from_text(text: str) -> List[str]:
-    """Extract skills from text using regex and a predefined skills list."""
-    from .skills_data import COMMON_SKILLS
-    import re
-    
-    # Clean and normalize text
-    text = text.lower()
-    found_skills = set()
-    
-    # First, look for exact matches of multi-word skills
-    for skill in COMMON_SKILLS:
-        if ' ' in skill:
-            # Look for the skill with word boundaries
-            pattern = r'\b' + re.escape(skill) + r'\b'
-            if re.search(pattern, text):
-                found_skills.add(skill)
-    
-    # Split text into words using regex
-    # This will match any sequence of word characters (letters, numbers, underscores)
-    words = re.findall(r'\b\w+\b', text)
-    
-    # Check single words against skills list
-    for word in words:
-        if word in COMMON_SKILLS:
-            found_skills.add(word)
-    
-    # Look for technical patterns
-    for word in words:
-        # Check for common technical patterns
-        if len(word) > 2:  # Ignore very short words
-            # Common technical patterns
-            if (any(char.isdigit() for char in word) or  # Contains numbers (e.g., sql2019)
-                word.endswith(('js', 'db', 'ml', 'ai', 'ui', 'ux', 'py')) or  # Common technical suffixes
-                word.startswith(('py', 'js', 'ng', 'rx'))):  # Common technical prefixes
-                if word in COMMON_SKILLS:
-                    found_skills.add(word)
-    
-    # Look for consecutive words that might form skills
-    text_with_boundaries = ' ' + text + ' '
-    for i in range(len(words) - 1):
-        two_words = ' ' + words[i] + ' ' + words[i + 1] + ' '
-        if two_words in text_with_boundaries:
-            compound = (words[i] + ' ' + words[i + 1]).lower()
-            if compound in COMMON_SKILLS:
-                found_skills.add(compound)
-    
-    return sorted(list(found_skills))
+    """Extract skills from text in one pass over a precompiled skill automaton."""
+    from .skill_extractor import get_skill_extractor
+    return get_skill_extractor().extract(text)
 
 
 def get_skill_embedding(skill_text: str) -> List[float]:
-    """Get BERT embedding for a skill."""
+    """Get BERT embedding for a skill, reading through the shared embedding cache."""
+    return get_skill_embeddings([skill_text])[0]
+
+
+def get_skill_embeddings(skill_texts: List[str]) -> List[List[float]]:
+    """Get BERT embeddings for several skills. Cache misses are encoded in one batch."""
+    from .embeddings import embedding_cache
+    return embedding_cache.get_many_or_compute(skill_texts, _encode_skill_texts)
+
+
+def _encode_skill_texts(skill_texts: List[str]) -> List[List[float]]:
+    """Run the model once over a batch of skill texts. The shared embedding
+    server is used when configured; the in-process model is the fallback,
+    also when the server runs another model than `embedding_model_id()`."""
+    from .embedding_server import get_embedding_client
+
+    client = get_embedding_client()
+    if client is not None:
+        vectors = client.encode(skill_texts)
+        if vectors is not None:
+            return [vector.tolist() for vector in vectors]
+
     model = get_model()
     if model is None:
-        # Fallback: return an empty list to indicate embedding unavailable.
-        return []
+        # Fallback: return empty lists to indicate embeddings unavailable.
+        return [[] for _ in skill_texts]
     try:
-        embedding = model.encode([skill_text])[0]
-        return embedding.tolist()
+        return [embedding.tolist() for embedding in model.encode(list(skill_texts))]
     except Exception as e:
-        print(f"Warning: failed to encode skill '{skill_text}': {e}")
-        return []
+        print(f"Warning: failed to encode {len(skill_texts)} skills: {e}")
+        return [[] for _ in skill_texts]
 
 
 def calculate_skill_similarity(skill_embedding: List[float], target_embedding: List[float]) -> float:
@@ -148,79 +264,118 @@ def calculate_skill_similarity(skill_embedding: List[float], target_embedding: L
             return 0.0
 
 
-def find_matching_users(desired_skill: str, all_skills: List[Tuple[int, str, List[float]]]) -> List[Tuple[int, float]]:
+def find_matching_users(desired_skill: str, all_skills: List[Tuple[int, str, List[float]]],
+                        limit: int = 10) -> List[Tuple[int, float]]:
     """
     Find users with similar skills using cosine similarity.
-    Returns list of (user_id, similarity_score) tuples.
+    Returns the best `limit` (user_id, similarity_score) tuples, one per skill.
     """
+    import numpy as np
+    from .matching import normalize_rows, stack_embeddings, top_order
+
     desired_embedding = get_skill_embedding(desired_skill)
-    
-    matches = []
-    for user_id, skill_name, embedding in all_skills:
-        similarity = 0.0
+    if not all_skills:
+        return []
+
+    similarities = np.zeros(len(all_skills), dtype=np.float64)
+    has_embedding = np.array([bool(len(embedding)) if embedding is not None else False
+                              for _, _, embedding in all_skills])
+    if desired_embedding:
         # If we have embeddings, use cosine similarity
-        if embedding and desired_embedding:
-            similarity = calculate_skill_similarity(embedding, desired_embedding)
-        else:
-            # Fallback: give a high score for exact name matches (case-insensitive)
-            try:
-                if skill_name and skill_name.lower() == desired_skill.lower():
-                    similarity = 1.0
-            except Exception:
-                similarity = 0.0
+        # float64, like the per-pair cosine it replaces, so equal scores tie exactly
+        stacked = stack_embeddings([e for _, _, e in all_skills], dim=len(desired_embedding))
+        vectors = normalize_rows(stacked.astype(np.float64))
+        query = normalize_rows(np.array([desired_embedding], dtype=np.float64))[0]
+        similarities[has_embedding] = (vectors[has_embedding] @ query)
+    # Fallback: give a high score for exact name matches (case-insensitive)
+    fallback = ~has_embedding if desired_embedding else np.ones(len(all_skills), dtype=bool)
+    desired_name = desired_skill.lower() if isinstance(desired_skill, str) else None
+    for i in np.flatnonzero(fallback):
+        skill_name = all_skills[i][1]
+        if skill_name and isinstance(skill_name, str) and skill_name.lower() == desired_name:
+            similarities[i] = 1.0
+
+    # Partial selection of the best matches instead of a full sort
+    ranked = top_order(similarities, np.arange(len(all_skills)), limit)
+    return [(all_skills[i][0], float(similarities[i])) for i in ranked]
+
 
-        matches.append((user_id, similarity))
+def score_users_for_skills(desired_skills: List[str], all_skills, exclude_user_ids=(), row_mask=None):
+    """Score every user in `all_skills` against a list of desired skills.
+    `all_skills` is a SkillMatrix (e.g. the shared embedding snapshot) or
+    a list of (user_id, name, embedding) rows; only rows where `row_mask`
+    is True are scored. Returns a UserScores that can be paged without
+    rescoring."""
+    import numpy as np
+    from .matching import SkillMatrix, UserScores
 
-    # Sort by similarity score in descending order
-    matches.sort(key=lambda x: x[1], reverse=True)
-    return matches[:10]  # Return top 10 matches
+    desired_skills = list(dict.fromkeys(desired_skills))
+    desired_embeddings = get_skill_embeddings(desired_skills)
+    matrix = all_skills if isinstance(all_skills, SkillMatrix) else SkillMatrix.from_rows(all_skills)
+    if row_mask is not None:
+        matrix = matrix.subset(np.flatnonzero(row_mask))
+    return UserScores(matrix, desired_skills, desired_embeddings, exclude_user_ids)
 
 
-def find_matching_users_for_skills(desired_skills: List[str], all_skills: List[Tuple[int, str, List[float]]]) -> List[dict]:
+def score_reciprocal_matches(wanted_skills: List[str], offered_skills: List[Tuple[str, bytes]], all_skills,
+                             all_desires: List[Tuple[int, str, bytes]], exclude_user_ids=(), row_mask=None,
+                             weight: float = 0.5):
+    """
+    Score users for a skill swap: `wanted_skills` is what the seeker wants to
+    learn, `offered_skills` their own (name, embedding) skills, `all_skills`
+    the candidates (as for score_users_for_skills) and `all_desires` every
+    candidate's desired skills, as a SkillMatrix or (user_id, name, embedding)
+    rows.
+    Returns a ReciprocalScores that can be paged without rescoring.
+    """
+    import numpy as np
+    from .matching import ReciprocalScores, SkillMatrix
+
+    wanted_skills = list(dict.fromkeys(wanted_skills))
+    wanted_embeddings = get_skill_embeddings(wanted_skills)
+    matrix = all_skills if isinstance(all_skills, SkillMatrix) else SkillMatrix.from_rows(all_skills)
+    if row_mask is not None:
+        matrix = matrix.subset(np.flatnonzero(row_mask))
+    return ReciprocalScores(
+        matrix,
+        all_desires if isinstance(all_desires, SkillMatrix) else SkillMatrix.from_rows(all_desires),
+        wanted_skills,
+        wanted_embeddings,
+        [name for name, _ in offered_skills],
+        [embedding for _, embedding in offered_skills],
+        exclude_user_ids=exclude_user_ids,
+        weight=weight,
+    )
+
+
+def find_matching_users_for_skills(desired_skills: List[str], all_skills: List[Tuple[int, str, List[float]]],
+                                   limit: int = 10) -> List[dict]:
     """
     Find users that best match a list of desired skills.
     Returns a list of dicts with keys: user_id, match_score, matching_skills
     """
-    # Precompute embeddings for desired skills
-    desired_embeddings = {s: get_skill_embedding(s) for s in desired_skills}
-
-    # Map user_id -> desired_skill -> max similarity observed
-    user_skill_max = {}
-    user_matching_names = {}
-
-    for user_id, skill_name, embedding in all_skills:
-        user_skill_max.setdefault(user_id, {s: 0.0 for s in desired_skills})
-        user_matching_names.setdefault(user_id, set())
-
-        for ds in desired_skills:
-            ds_embed = desired_embeddings.get(ds) or []
-            try:
-                sim = calculate_skill_similarity(embedding, ds_embed)
-            except Exception:
-                sim = 0.0
-
-            # update max similarity for this desired skill for this user
-            if sim > user_skill_max[user_id][ds]:
-                user_skill_max[user_id][ds] = sim
-
-            # If similarity indicates a relevant match (non-zero or exact name), record the skill name
-            try:
-                if sim > 0.0 or (skill_name and skill_name.lower() == ds.lower()):
-                    user_matching_names[user_id].add(skill_name)
-            except Exception:
-                pass
-
-    # Aggregate scores per user (average of per-desired-skill max similarities)
-    results = []
-    for user_id, per_ds in user_skill_max.items():
-        scores = list(per_ds.values()) if per_ds else [0.0]
-        avg_score = sum(scores) / len(scores) if scores else 0.0
-        results.append({
-            'user_id': user_id,
-            'match_score': avg_score,
-            'matching_skills': sorted(list(user_matching_names.get(user_id, [])))
-        })
-
-    # Sort by match_score desc and return top 10
-    results.sort(key=lambda x: x['match_score'], reverse=True)
-    return results[:10]
+    return score_users_for_skills(desired_skills, all_skills).page(0, limit)
+
+
+def score_users_for_skills_approximate(desired_skills: List[str], index, exclude_user_ids=(),
+                                       candidates: int = 200, nprobe: int = 8, row_mask=None):
+    """
+    Approximate variant of score_users_for_skills backed by an IVFIndex.
+    Only the top `candidates` skills per desired skill are aggregated, so the
+    cost no longer grows linearly with the number of stored skills. Rows
+    outside `row_mask` and rows of excluded users are skipped while probing
+    the index, so they never take up the shortlist.
+    """
+    import numpy as np
+    from .matching import UserScores, normalize_rows, stack_embeddings
+
+    desired_skills = list(dict.fromkeys(desired_skills))
+    desired_embeddings = get_skill_embeddings(desired_skills)
+    queries = normalize_rows(stack_embeddings(desired_embeddings, dim=index.matrix.dim))
+
+    if len(exclude_user_ids):
+        allowed = ~np.isin(index.matrix.user_ids, list(exclude_user_ids))
+        row_mask = allowed if row_mask is None else row_mask & allowed
+    hits = index.search(queries, candidates, nprobe, row_mask=row_mask)
+    rows = np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+    return UserScores(index.matrix.subset(rows), desired_skills, desired_embeddings)
@@ -2,28 +2,33 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
-import PyPDF2.errors
-import nltk
+from django.conf import settings
 from django.db import models
 from django.db.models import Q
-from .models import UserProfile, Skill, Resume, SkillMatch
+from .models import UserProfile, Skill, DesiredSkill, SkillMatch, ExchangeCycleMember
 from .models import Connection, Message
 from .serializers import (
     UserProfileSerializer,
     SkillSerializer,
-    ResumeSerializer,
+    DesiredSkillSerializer,
     SkillMatchSerializer
 )
 from .serializers import ConnectionSerializer, MessageSerializer
 from .utils_safe import (
-    extract_text_from_pdf,
-    extract_skills_from_text,
     get_skill_embedding,
     find_matching_users,
-    find_matching_users_for_skills
+    score_reciprocal_matches,
+    score_users_for_skills,
+    score_users_for_skills_approximate
 )
+from .ann_index import get_skill_index
+from .embeddings import embedding_fields, embedding_rows
+from .skill_changes import get_live_desired_skills, get_live_skill_matrix
+from .match_filters import InvalidFilter, MatchFilters
+from .match_pages import InvalidCursor, decode_cursor, encode_cursor, match_page_cache, parse_limit, query_key
+from .match_coalescing import corpus_generation, normalize_query, shared_match_scores, shared_query_key
+from .skill_searches import record_skill_searches
 
 class UserProfileView(APIView):
     """Handle GET and PATCH/PUT on /api/profile/ for current user"""
@@ -179,104 +184,87 @@ class SkillViewSet(viewsets.ModelViewSet):
         # Get BERT embedding for the skill
         skill_name = serializer.validated_data['name']
         embedding = get_skill_embedding(skill_name)
-        serializer.save(user=self.request.user, embedding=embedding)
+        serializer.save(user=self.request.user, **embedding_fields(embedding))
 
-class ResumeUploadView(APIView):
-    parser_classes = (MultiPartParser, FormParser)
+
+class DesiredSkillViewSet(viewsets.ModelViewSet):
+    """Skills the current user wants to learn"""
+    serializer_class = DesiredSkillSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-    def post(self, request, *args, **kwargs):
-        try:
-            # Check if file was uploaded
-            if 'file' not in request.FILES:
-                return Response({
-                    'error': 'No file uploaded'
-                }, status=status.HTTP_400_BAD_REQUEST)
+    def get_queryset(self):
+        return DesiredSkill.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        skill_name = serializer.validated_data['name']
+        embedding = get_skill_embedding(skill_name)
+        serializer.save(user=self.request.user, **embedding_fields(embedding))
+
+def candidate_skills(filters, excluded_user_ids):
+    """Candidate skills for exact matching, as (skills, row_mask).
+
+    Reads the shared memory-mapped snapshot plus recently changed skills when
+    available and able to apply the filters (`row_mask` then selects the rows
+    that pass them), and otherwise the filtered Skill table as
+    (user_id, name, embedding) rows.
+    """
+    live_matrix = get_live_skill_matrix() if settings.SKILL_MATCH_USE_SNAPSHOT else None
+    if live_matrix is not None and filters.can_filter(live_matrix):
+        return live_matrix, filters.row_mask(live_matrix, excluded_user_ids)
+    # Get the candidate skills of other users
+    return embedding_rows(filters.filter_queryset(Skill.objects.all(), excluded_user_ids), 'user_id', 'name'), None
+
+
+def parse_match_options(request):
+    """Paging and filter options shared by the match endpoints.
+
+    Returns (error response or None, limit, MatchFilters).
+    """
+    # Paging: `limit` users per page
+    limit = parse_limit(request.data.get('limit', request.query_params.get('limit')))
+    if limit is None:
+        return Response({
+            'error': f'limit must be an integer between 1 and {settings.SKILL_MATCH_MAX_PAGE_SIZE}'
+        }, status=status.HTTP_400_BAD_REQUEST), None, None
+    # Candidate filters, applied before any scoring
+    try:
+        filters = MatchFilters.from_request_data(request.data)
+    except InvalidFilter as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST), None, None
+    return None, limit, filters
+
+
+def page_matches(request, key, limit, score, searched=()):
+    """One page of a match query identified by `key`.
+
+    `cursor` comes from a previous response's `next_cursor` for the same
+    query; later pages reuse the scores that `score()` computed for the
+    first one. First pages count as a search for the `searched` skills.
+    Returns (error response or None, matches, next_cursor).
+    """
+    cursor = request.data.get('cursor') or request.query_params.get('cursor')
+    try:
+        offset = decode_cursor(str(cursor), key) if cursor else 0
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST), None, None
+    if not offset:
+        record_skill_searches(searched)
+
+    scores = match_page_cache.get(key) if offset else None
+    if scores is None:
+        scores = score()
+        match_page_cache.put(key, scores)
+    matches = scores.page(offset, limit)
+    next_offset = offset + len(matches)
+    next_cursor = encode_cursor(key, next_offset) if next_offset < len(scores) else None
+    return None, matches, next_cursor
+
+
+def _usernames(matches):
+    from django.contrib.auth.models import User
+    users = User.objects.filter(id__in=[m['user_id'] for m in matches]).values('id', 'username')
+    return {u['id']: u['username'] for u in users}
 
-            file = request.FILES['file']
-            
-            # Validate file type
-            if not file.name.lower().endswith('.pdf'):
-                return Response({
-                    'error': 'Only PDF files are accepted'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            # Validate file size (max 5MB)
-            if file.size > 5 * 1024 * 1024:
-                return Response({
-                    'error': 'File size cannot exceed 5MB'
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            serializer = ResumeSerializer(data=request.data)
-            
-            if not serializer.is_valid():
-                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Save the resume
-            resume = serializer.save(user=request.user)
-            
-            try:
-                # Extract text from PDF
-                pdf_text = extract_text_from_pdf(resume.file)
-                
-                # Extract skills from text
-                skills = extract_skills_from_text(pdf_text)
-                
-                if not skills:
-                    resume.file.delete()
-                    resume.delete()
-                    return Response({
-                        'error': 'No skills could be extracted from the resume'
-                    }, status=status.HTTP_400_BAD_REQUEST)
-                
-                # Save extracted skills, avoiding duplicates
-                saved_skills = []
-                for skill_name in skills:
-                    skill, created = Skill.objects.get_or_create(
-                        user=request.user,
-                        name=skill_name,
-                        defaults={
-                            'embedding': get_skill_embedding(skill_name)
-                        }
-                    )
-                    saved_skills.append({
-                        'name': skill.name,
-                        'id': skill.id,
-                        'isNew': created
-                    })
-                
-                resume.processed = True
-                resume.save()
-                
-                return Response({
-                    'message': 'Resume processed successfully',
-                    'skills_extracted': saved_skills,
-                    'total_skills': len(saved_skills)
-                }, status=status.HTTP_200_OK)
-            
-            except (PyPDF2.errors.PdfReadError, PyPDF2.errors.EmptyFileError):
-                if resume:
-                    resume.file.delete()
-                    resume.delete()
-                return Response({
-                    'error': 'Could not read the PDF file. Please ensure it is not corrupted or password protected.'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                if resume:
-                    resume.file.delete()
-                    resume.delete()
-                import traceback
-                print(traceback.format_exc())  # Log the full error
-                return Response({
-                    'error': 'An error occurred while processing the resume. Please try again.'
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        except Exception as e:
-            import traceback
-            print(traceback.format_exc())  # Log the full error
-            return Response({
-                'error': 'An error occurred while processing your request. Please try again.'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class SkillMatchView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -295,20 +283,47 @@ class SkillMatchView(APIView):
         else:
             desired_skills = list(skills)
 
-        # Get all skills from other users
-        all_skills = list(Skill.objects.exclude(user=request.user).values_list(
-            'user_id', 'name', 'embedding'
-        ))
-
-        # If multiple desired skills provided, compute aggregated matches
-        matches = find_matching_users_for_skills(desired_skills, all_skills)
+        error, limit, filters = parse_match_options(request)
+        if error:
+            return error
+
+        index = get_skill_index() if settings.SKILL_MATCH_MODE == 'approximate' else None
+        if index is not None and not filters.can_filter(index.matrix):
+            index = None
+        mode = 'approximate' if index is not None else 'exact'
+
+        def score():
+            excluded = filters.excluded_user_ids(request.user)
+            query = normalize_query(desired_skills)
+
+            def score_query():
+                if index is not None:
+                    return score_users_for_skills_approximate(
+                        query,
+                        index,
+                        excluded,
+                        candidates=settings.SKILL_INDEX_CANDIDATES,
+                        nprobe=settings.SKILL_INDEX_NPROBE,
+                        row_mask=filters.row_mask(index.matrix, excluded),
+                    )
+                # If multiple desired skills provided, compute aggregated matches
+                all_skills, row_mask = candidate_skills(filters, excluded)
+                return score_users_for_skills(query, all_skills, excluded, row_mask=row_mask)
+
+            # Identical queries running concurrently or just before share one pass
+            return shared_match_scores.get_or_score(
+                shared_query_key(desired_skills, mode, filters.min_proficiency, excluded),
+                corpus_generation(index),
+                score_query,
+            )
+
+        key = query_key(request.user.id, desired_skills, f'{mode}:{filters.cache_key()}')
+        error, matches, next_cursor = page_matches(request, key, limit, score, desired_skills)
+        if error:
+            return error
 
         # Enrich matches with provider username
-        user_ids = [m['user_id'] for m in matches]
-        from django.contrib.auth.models import User
-        users = User.objects.filter(id__in=user_ids).values('id', 'username')
-        user_map = {u['id']: u['username'] for u in users}
-
+        user_map = _usernames(matches)
         response_matches = []
         for m in matches:
             response_matches.append({
@@ -318,7 +333,122 @@ class SkillMatchView(APIView):
                 'matching_skills': m.get('matching_skills', [])
             })
 
-        return Response({'matches': response_matches})
+        return Response({'matches': response_matches, 'next_cursor': next_cursor})
+
+
+class ReciprocalMatchView(APIView):
+    """Skill swap matching: users who can teach me what I want to learn and
+    want to learn what I can teach, ranked by a combined score."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        # What I want to learn: the request's skills, or my saved desired skills
+        skills = request.data.get('skills') or request.data.get('skill')
+        if isinstance(skills, str):
+            wanted_skills = [skills]
+        elif skills:
+            wanted_skills = list(skills)
+        else:
+            wanted_skills = list(DesiredSkill.objects.filter(user=request.user).values_list('name', flat=True))
+        if not wanted_skills:
+            return Response({
+                'error': 'Provide "skills" to learn or add desired skills first'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # What I can teach: my own skills, with their stored embeddings
+        offered_skills = embedding_rows(Skill.objects.filter(user=request.user), 'name')
+        if not offered_skills:
+            return Response({
+                'error': 'Add skills you can teach before looking for a skill swap'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        error, limit, filters = parse_match_options(request)
+        if error:
+            return error
+
+        def score():
+            excluded = filters.excluded_user_ids(request.user)
+            all_skills, row_mask = candidate_skills(filters, excluded)
+            # Desired skills of excluded users are never looked at: those users aren't ranked
+            return score_reciprocal_matches(
+                wanted_skills, offered_skills, all_skills, get_live_desired_skills(),
+                exclude_user_ids=excluded, row_mask=row_mask, weight=settings.SKILL_RECIPROCAL_WEIGHT,
+            )
+
+        key = query_key(request.user.id, wanted_skills, f'reciprocal:{filters.cache_key()}')
+        error, matches, next_cursor = page_matches(request, key, limit, score, wanted_skills)
+        if error:
+            return error
+
+        user_map = _usernames(matches)
+        for m in matches:
+            m['username'] = user_map.get(m['user_id'], 'Unknown')
+        return Response({'matches': matches, 'next_cursor': next_cursor})
+
+
+class ExchangeCycleView(APIView):
+    """The user's best multi-party exchanges, as last found by
+    `manage.py find_exchange_cycles`."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        limit = parse_limit(request.query_params.get('limit'))
+        if limit is None:
+            return Response({
+                'error': f'limit must be between 1 and {settings.SKILL_MATCH_MAX_PAGE_SIZE}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        memberships = ExchangeCycleMember.objects.filter(user=request.user).order_by('-score').select_related('cycle')
+        cycles = [membership.cycle for membership in memberships[:limit]]
+        user_map = _usernames([
+            {'user_id': step[key]} for cycle in cycles for step in cycle.steps for key in ('teacher_id', 'learner_id')
+        ])
+        response_cycles = []
+        for cycle in cycles:
+            steps = [dict(step, teacher=user_map.get(step['teacher_id'], 'Unknown'),
+                          learner=user_map.get(step['learner_id'], 'Unknown')) for step in cycle.steps]
+            response_cycles.append({
+                'id': cycle.id,
+                'length': cycle.length,
+                'score': cycle.score,
+                'steps': steps,
+                'found_at': cycle.created_at,
+            })
+        return Response({'cycles': response_cycles})
+
+
+class RecommendedMatchesView(APIView):
+    """Users recommended for my saved desired skills, read from the SkillMatch
+    rows kept up to date by `manage.py refresh_skill_matches`."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        limit = parse_limit(request.query_params.get('limit'))
+        if limit is None:
+            return Response({
+                'error': f'limit must be between 1 and {settings.SKILL_MATCH_MAX_PAGE_SIZE}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # One entry per provider, scored by their best match, listing every
+        # desired skill they match
+        recommendations = {}
+        rows = SkillMatch.objects.filter(seeker=request.user).order_by('-similarity_score').values_list(
+            'provider_id', 'provider__username', 'desired_skill', 'similarity_score', 'created_at'
+        )
+        for provider_id, username, desired_skill, score, created_at in rows:
+            entry = recommendations.get(provider_id)
+            if entry is None:
+                if len(recommendations) == limit:
+                    continue
+                entry = recommendations[provider_id] = {
+                    'user_id': provider_id,
+                    'username': username,
+                    'match_score': score,
+                    'desired_skills': [],
+                    'computed_at': created_at,
+                }
+            entry['desired_skills'].append({'name': desired_skill, 'similarity': score})
+        return Response({'recommendations': list(recommendations.values())})
 
 
 class ConnectionRequestView(APIView):
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -131,6 +132,20 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB max file size
 FILE_UPLOAD_PERMISSIONS = 0o644
 FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
 
+# Resume processing jobs, run by `manage.py run_resume_jobs` (see
+# api.resume_jobs): worker processes, how often an idle runner polls, and
+# after how long without a heartbeat (runners send one every quarter of it)
+# a job still `processing` is assumed dead and claimed again.
+RESUME_JOB_WORKERS = 2
+RESUME_JOB_POLL_SECONDS = 2
+RESUME_JOB_TIMEOUT = 600
+RESUME_JOB_MAX_ATTEMPTS = 3
+# Budgets for reading an uploaded resume; extraction stops at whichever is hit
+# first and the response reports `truncated: true`.
+RESUME_PDF_MAX_PAGES = 20
+RESUME_PDF_MAX_CHARS = 200_000
+RESUME_PDF_MAX_SECONDS = 10
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -171,3 +186,84 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+
+# Skill embeddings
+SKILL_EMBEDDING_MODEL = 'paraphrase-MiniLM-L6-v2'
+SKILL_EMBEDDING_DIM = 384
+# Inference backend: 'fp32' (SentenceTransformer), 'int8' (dynamically
+# quantized for CPU, loaded from SKILL_EMBEDDING_MODEL_DIR) or 'hashing'
+# (deterministic character n-gram vectors without model weights, for offline
+# tests and benchmarks; SKILL_HASHING_BUCKETS n-gram buckets).
+SKILL_EMBEDDING_BACKEND = os.environ.get('SKILL_EMBEDDING_BACKEND', 'fp32')
+SKILL_HASHING_BUCKETS = 1 << 13
+# Progress of `manage.py backfill_embeddings`, so an interrupted run resumes
+SKILL_BACKFILL_CHECKPOINT = BASE_DIR / 'backfill_embeddings.json'
+# Searched skill texts are counted per process and written to SkillSearch at
+# most this often; the backfill re-embeds the most searched skills first.
+SKILL_SEARCH_FLUSH_SECONDS = 60
+# Local copy of the model written by `manage.py prepare_models --save-dir`.
+SKILL_EMBEDDING_MODEL_DIR = os.environ.get('SKILL_EMBEDDING_MODEL_DIR', str(BASE_DIR / 'models' / SKILL_EMBEDDING_MODEL))
+# Load and warm up the embedding model when a worker starts instead of on the
+# first request. Opt-in so that management commands stay fast; web workers
+# set SKILL_MODEL_PRELOAD=1 and gate traffic on /api/health/ready/.
+SKILL_MODEL_PRELOAD = os.environ.get('SKILL_MODEL_PRELOAD', '') == '1'
+# Unix socket of the shared embedding server (`manage.py run_embedding_server`).
+# Empty means every worker encodes with its own in-process model.
+SKILL_EMBEDDING_SERVER_SOCKET = os.environ.get('SKILL_EMBEDDING_SERVER_SOCKET', '')
+SKILL_EMBEDDING_BATCH_WINDOW_MS = 5
+SKILL_EMBEDDING_MAX_BATCH = 64
+# Entries kept by each process's in-memory embedding LRU
+SKILL_EMBEDDING_CACHE_SIZE = 4096
+
+# Skill matching
+# 'exact' scores every stored skill on each request; 'approximate' only scores
+# the candidates returned by the IVF index built with `manage.py build_skill_index`.
+SKILL_MATCH_MODE = 'exact'
+SKILL_INDEX_PATH = BASE_DIR / 'skill_index.npz'
+SKILL_INDEX_NPROBE = 8
+SKILL_INDEX_CANDIDATES = 200
+# 'ivf' keeps every float32 vector in memory; 'pq' keeps SKILL_PQ_SUBSPACES
+# one-byte codes per skill and re-scores the best SKILL_PQ_RERANK x candidates
+# against the full vectors, which are memory-mapped from disk.
+SKILL_INDEX_TYPE = os.environ.get('SKILL_INDEX_TYPE', 'ivf')
+SKILL_PQ_INDEX_PATH = BASE_DIR / 'skill_pq_index.npz'
+SKILL_PQ_SUBSPACES = 48
+SKILL_PQ_RERANK = 8
+# Exact matching reads the memory-mapped embedding snapshot written by
+# `manage.py build_embedding_snapshot` when one exists, instead of the Skill table.
+SKILL_MATCH_USE_SNAPSHOT = True
+SKILL_SNAPSHOT_DIR = BASE_DIR / 'skill_snapshot'
+# How often each worker applies the SkillChange log on top of the snapshot
+SKILL_CHANGE_POLL_SECONDS = 2
+# Match results are paged: SKILL_MATCH_PAGE_SIZE users per page by default
+# (at most SKILL_MATCH_MAX_PAGE_SIZE). Scored queries are kept per process for
+# SKILL_MATCH_PAGE_TTL seconds so later pages don't rescore the corpus.
+SKILL_MATCH_PAGE_SIZE = 10
+SKILL_MATCH_MAX_PAGE_SIZE = 100
+SKILL_MATCH_PAGE_TTL = 300
+SKILL_MATCH_PAGE_CACHE_SIZE = 64
+# Identical /api/match_skills/ queries share one scoring pass per process
+# (api.match_coalescing); the result is reused for SKILL_MATCH_RESULT_TTL
+# seconds unless the skill corpus changes first. Each entry holds a
+# (skills x corpus) similarity matrix, so keep the cache small.
+SKILL_MATCH_RESULT_TTL = 5
+SKILL_MATCH_RESULT_CACHE_SIZE = 16
+# Reciprocal (skill swap) matching: weight of "they can teach me" against
+# "I can teach them" in the combined score
+SKILL_RECIPROCAL_WEIGHT = 0.5
+# Exchange cycles (`manage.py find_exchange_cycles`): a user can teach another
+# when one of their skills is at least SKILL_CYCLE_THRESHOLD similar to one of
+# the other's desired skills. Each desired skill considers its
+# SKILL_CYCLE_MAX_TEACHERS closest skills and each user keeps their
+# SKILL_CYCLE_MAX_OUT_DEGREE strongest edges, which bounds the search.
+# Candidates come from the SKILL_CYCLE_NPROBE closest IVF lists (None: exact scan).
+SKILL_CYCLE_THRESHOLD = 0.6
+SKILL_CYCLE_MAX_TEACHERS = 50
+SKILL_CYCLE_MAX_OUT_DEGREE = 10
+SKILL_CYCLES_PER_USER = 5
+SKILL_CYCLE_NPROBE = 8
+# Precomputed recommendations (`manage.py refresh_skill_matches`): the best
+# SKILL_RECOMMENDATIONS_PER_SKILL users for each saved desired skill, stored as
+# SkillMatch rows. The state file remembers what the last refresh covered.
+SKILL_RECOMMENDATIONS_PER_SKILL = 10
+SKILL_RECOMMENDATIONS_STATE = BASE_DIR / 'skill_recommendations.json'